@@ -0,0 +1,156 @@
+import json
+import os
+from urllib.parse import parse_qsl, urlsplit
+
+from backend.shared.db import deferred_commits
+from backend.shared.logging import get_logger, log_context
+from backend.shared.metrics import phase, put_metric
+from backend.shared.response import negotiate_encoding, response
+from backend.shared.validation import get_body
+
+logger = get_logger(__name__)
+
+# Upper bound on sub-requests per POST /batch
+BATCH_MAX_REQUESTS = int(os.environ.get("BATCH_MAX_REQUESTS", "25"))
+
+BATCH_METHODS = ("GET", "POST", "PUT", "DELETE")
+
+# Sub-response headers passed through to the client
+_FORWARDED_HEADERS = ("ETag",)
+
+
+def _parse_requests(event):
+    """(list of sub-requests, atomic flag, error message)."""
+    try:
+        with phase("parse"):
+            body = json.loads(get_body(event) or "{}")
+    except ValueError:
+        return None, False, "Invalid JSON body"
+    if not isinstance(body, dict):
+        return None, False, "Invalid JSON body"
+
+    items = body.get("requests")
+    if not isinstance(items, list) or not items:
+        return None, False, "requests must be a non-empty list"
+    if len(items) > BATCH_MAX_REQUESTS:
+        return None, False, f"At most {BATCH_MAX_REQUESTS} requests per batch"
+
+    for item in items:
+        if not isinstance(item, dict):
+            return None, False, "Each request must be an object"
+        if item.get("method") not in BATCH_METHODS:
+            return None, False, f"method must be one of {', '.join(BATCH_METHODS)}"
+        path = item.get("path")
+        if not isinstance(path, str) or not path.startswith("/"):
+            return None, False, "path must be an absolute path"
+        if item.get("headers") is not None and not isinstance(item["headers"], dict):
+            return None, False, "headers must be an object"
+
+    atomic = body.get("atomic", False)
+    if not isinstance(atomic, bool):
+        return None, False, "atomic must be a boolean"
+    return items, atomic, None
+
+
+def _sub_event(event, item, resource, path_params, query):
+    body = item.get("body")
+    return {
+        "resource": resource,
+        "path": item["path"],
+        "httpMethod": item["method"],
+        "headers": {str(name): str(value) for name, value in (item.get("headers") or {}).items()},
+        "queryStringParameters": dict(parse_qsl(query)) or None,
+        "pathParameters": path_params,
+        "body": json.dumps(body) if body is not None else None,
+        "isBase64Encoded": False,
+        # Same caller, so the same authorizer claims
+        "requestContext": event.get("requestContext"),
+    }
+
+
+def _result(item, status, body, headers=None):
+    result = {"status": status, "body": body}
+    if "id" in item:
+        result = {"id": item["id"], **result}
+    forwarded = {name: headers[name] for name in _FORWARDED_HEADERS if name in (headers or {})}
+    if forwarded:
+        result["headers"] = forwarded
+    return result
+
+
+def _dispatch(router, event, item):
+    """Run one sub-request through its route function; returns its batch result."""
+    url = urlsplit(item["path"])
+    resource, path_params = router.match(url.path)
+    endpoint = router.routes.get((resource, item["method"]))
+    if endpoint is None or resource == "/batch":
+        return _result(item, 404, {"error": "Not Found"})
+
+    sub_event = _sub_event(event, item, resource, path_params, url.query)
+    try:
+        # Sub-responses are embedded in the batch body, which is compressed as a
+        # whole, so they are never compressed whatever the item's Accept-Encoding
+        with log_context(batch_route=f"{item['method']} {resource}"), negotiate_encoding({}):
+            result = endpoint(sub_event)
+        with phase("parse"):
+            body = json.loads(result["body"]) if result.get("body") else None
+    except Exception as e:
+        logger.exception(
+            "Batch sub-request exception",
+            extra={"method": item["method"], "resource": resource, "error": str(e)}
+        )
+        put_metric("ErrorCount", 1, unit="Count", dimensions={"Lambda": router.lambda_name})
+        return _result(item, 500, {"error": "Internal server error"})
+    return _result(item, result["statusCode"], body, result.get("headers"))
+
+
+def run_batch(router, event):
+    """
+    POST /batch
+
+    Runs several API requests in one invocation, in order, through the same
+    route functions (and so the same cached connection) as direct calls.
+
+    Body:
+    {
+      "requests": [
+        {"id": "meals", "method": "GET", "path": "/meals?fields=id,name"},
+        {"id": "log", "method": "POST", "path": "/meal-logs",
+         "body": {"meal_id": "uuid", "date": "YYYY-MM-DD"}},
+        {"method": "GET", "path": "/daily-summary?date=YYYY-MM-DD",
+         "headers": {"If-None-Match": "\\"12-ab34\\""}}
+      ],
+      "atomic": false
+    }
+
+    Returns 200 with {"responses": [{"id", "status", "headers", "body"}]} in
+    request order; "id" is echoed when given and "headers" carries the ETag.
+    With "atomic": true the writes commit together only if every request
+    succeeds; after the first failure the remaining requests are not run
+    (424) and the writes before it are rolled back (424).
+    """
+    items, atomic, error = _parse_requests(event)
+    if error:
+        return response(400, {"error": error})
+
+    if not atomic or all(item["method"] == "GET" for item in items):
+        return response(200, {"responses": [_dispatch(router, event, item) for item in items]})
+
+    results = []
+    with deferred_commits() as commit:
+        for item in items:
+            result = _dispatch(router, event, item)
+            results.append(result)
+            if result["status"] >= 400:
+                break
+        else:
+            commit()
+            return response(200, {"responses": results})
+
+    logger.info("Atomic batch rolled back", extra={"failed_index": len(results) - 1})
+    for index, item in enumerate(items[:len(results) - 1]):
+        if item["method"] != "GET":
+            results[index] = _result(item, 424, {"error": "Rolled back: a later request in the batch failed"})
+    for item in items[len(results):]:
+        results.append(_result(item, 424, {"error": "Not run: an earlier request in the batch failed"}))
+    return response(200, {"responses": results})
@@ -0,0 +1,34 @@
+"""
+Single-function ("monolith") entry point that serves every API route.
+
+Optional alternative to deploying meals, meal_logs, summary and users as
+separate Lambdas. All routes share one pool of warm containers, and with it
+one cached DB connection, secret and user-id cache per container, so rarely
+called routes such as GET /users/me stop paying for their own cold starts.
+The per-function handlers keep working unchanged; daily_summaries_batch stays
+a separate scheduled Lambda.
+
+Only this entry point serves POST /batch, which runs several of the routes
+above in one invocation (see batch.py).
+"""
+import functools
+
+from backend.shared.logging import get_logger
+from backend.shared.router import Router
+
+from backend.lambdas.api.batch import run_batch
+from backend.lambdas.meals.handler import router as meals_router
+from backend.lambdas.meal_logs.handler import router as meal_logs_router
+from backend.lambdas.summary.handler import router as summary_router
+from backend.lambdas.users.handler import router as users_router
+
+logger = get_logger(__name__)
+
+router = Router("api", logger)
+router.include(meals_router)
+router.include(meal_logs_router)
+router.include(summary_router)
+router.include(users_router)
+router.add("POST", "/batch", functools.partial(run_batch, router))
+
+handler = router.handler
@@ -34,7 +34,7 @@ def compute_daily_summaries(conn, target_date=None):
             GROUP BY ml.user_id
         """
 
-        cur.execute(query, (target_date,))
+        cur.execute(query, (target_date,), name="compute_daily_summaries.select")
         results = cur.fetchall()
 
         # UPSERT into daily_summaries
@@ -48,9 +48,19 @@ def compute_daily_summaries(conn, target_date=None):
                 computed_at = CURRENT_TIMESTAMP
         """
 
+        if results:
+            # Cached summaries are served by GET /daily-summary, so their ETags
+            # change too. As in every write, the users rows are bumped (and
+            # locked) before any other row; see db.begin_user_write()
+            cur.execute(
+                "UPDATE users SET data_version = data_version + 1 WHERE id = ANY(%s::uuid[])",
+                ([row[0] for row in results],),
+                name="compute_daily_summaries.bump_users"
+            )
+
         count = 0
         for user_id, total_calories, meal_count in results:
-            cur.execute(upsert_query, (user_id, target_date, total_calories, meal_count))
+            cur.execute(upsert_query, (user_id, target_date, total_calories, meal_count), name="compute_daily_summaries.upsert")
             count += 1
 
         conn.commit()
@@ -99,7 +109,7 @@ def compute_weekly_reports(conn, target_date=None):
             GROUP BY user_id
         """
 
-        cur.execute(query, (week_start, week_end))
+        cur.execute(query, (week_start, week_end), name="compute_weekly_reports.select")
         results = cur.fetchall()
 
         # UPSERT into weekly_reports
@@ -120,7 +130,8 @@ def compute_weekly_reports(conn, target_date=None):
         for user_id, avg_cal, min_cal, max_cal, total_meals in results:
             cur.execute(
                 upsert_query,
-                (user_id, week_start, week_end, avg_cal, min_cal, max_cal, total_meals)
+                (user_id, week_start, week_end, avg_cal, min_cal, max_cal, total_meals),
+                name="compute_weekly_reports.upsert"
             )
             count += 1
 
@@ -160,7 +171,7 @@ def detect_anomalies(conn, target_date=None):
             WHERE date = %s
         """
 
-        cur.execute(query, (target_date,))
+        cur.execute(query, (target_date,), name="detect_anomalies.select")
         results = cur.fetchall()
 
         for user_id, daily_calories in results:
@@ -174,7 +185,7 @@ def detect_anomalies(conn, target_date=None):
             """
 
             rolling_start = target_date - timedelta(days=30)
-            cur.execute(rolling_query, (user_id, target_date, rolling_start))
+            cur.execute(rolling_query, (user_id, target_date, rolling_start), name="detect_anomalies.rolling_avg")
             rolling_result = cur.fetchone()
 
             rolling_avg = rolling_result[0] if rolling_result[0] is not None else daily_calories
@@ -194,7 +205,8 @@ def detect_anomalies(conn, target_date=None):
 
                 cur.execute(
                     anomaly_insert,
-                    (user_id, target_date, daily_calories, rolling_avg, deviation_percent)
+                    (user_id, target_date, daily_calories, rolling_avg, deviation_percent),
+                    name="detect_anomalies.insert"
                 )
 
                 anomalies.append({
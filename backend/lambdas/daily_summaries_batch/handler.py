@@ -1,5 +1,6 @@
-from backend.shared.db import get_connection
-from backend.shared.logging import get_logger
+from backend.shared.db import get_connection, track_queries, use_exact_numerics
+from backend.shared.logging import get_logger, queued_logs
+from backend.shared.metrics import buffered_metrics, cold_start_metrics
 from backend.lambdas.daily_summaries_batch.batch import (
     compute_daily_summaries,
     compute_weekly_reports,
@@ -9,6 +10,9 @@ from backend.lambdas.daily_summaries_batch.batch import (
 logger = get_logger(__name__)
 
 
+@queued_logs
+@buffered_metrics
+@cold_start_metrics("daily_summaries_batch")
 def handler(event, context):
     """
     EventBridge scheduled invocation handler.
@@ -36,59 +40,63 @@ def handler(event, context):
         "errors": []
     }
 
-    conn = None
-    try:
-        conn = get_connection()
-
-        # Compute daily summaries
+    # Every statement feeds DatabaseQueryTime and the slow query alarm
+    with track_queries(dimensions={"Lambda": "daily_summaries_batch"}):
+        conn = None
         try:
-            daily_count = compute_daily_summaries(conn)
-            metrics["daily_summaries_count"] = daily_count
-            logger.info("Successfully computed daily summaries", extra={"count": daily_count})
-        except Exception as e:
-            error_msg = f"Failed to compute daily summaries: {str(e)}"
-            logger.error(error_msg)
-            metrics["errors"].append(error_msg)
+            conn = get_connection()
+            # Anomaly detection does Decimal arithmetic on the NUMERIC totals
+            use_exact_numerics(conn)
 
-        # Compute weekly reports
-        try:
-            weekly_count = compute_weekly_reports(conn)
-            metrics["weekly_reports_count"] = weekly_count
-            logger.info("Successfully computed weekly reports", extra={"count": weekly_count})
-        except Exception as e:
-            error_msg = f"Failed to compute weekly reports: {str(e)}"
-            logger.error(error_msg)
-            metrics["errors"].append(error_msg)
+            # Compute daily summaries
+            try:
+                daily_count = compute_daily_summaries(conn)
+                metrics["daily_summaries_count"] = daily_count
+                logger.info("Successfully computed daily summaries", extra={"count": daily_count})
+            except Exception as e:
+                error_msg = f"Failed to compute daily summaries: {str(e)}"
+                logger.error(error_msg)
+                metrics["errors"].append(error_msg)
 
-        # Detect anomalies
-        try:
-            anomalies = detect_anomalies(conn)
-            metrics["anomalies_detected"] = len(anomalies)
-            logger.info("Successfully detected anomalies", extra={"count": len(anomalies)})
-        except Exception as e:
-            error_msg = f"Failed to detect anomalies: {str(e)}"
-            logger.error(error_msg)
-            metrics["errors"].append(error_msg)
+            # Compute weekly reports
+            try:
+                weekly_count = compute_weekly_reports(conn)
+                metrics["weekly_reports_count"] = weekly_count
+                logger.info("Successfully computed weekly reports", extra={"count": weekly_count})
+            except Exception as e:
+                error_msg = f"Failed to compute weekly reports: {str(e)}"
+                logger.error(error_msg)
+                metrics["errors"].append(error_msg)
 
-        status_code = 200 if not metrics["errors"] else 500
-        return {
-            "statusCode": status_code,
-            "metrics": metrics
-        }
+            # Detect anomalies
+            try:
+                anomalies = detect_anomalies(conn)
+                metrics["anomalies_detected"] = len(anomalies)
+                logger.info("Successfully detected anomalies", extra={"count": len(anomalies)})
+            except Exception as e:
+                error_msg = f"Failed to detect anomalies: {str(e)}"
+                logger.error(error_msg)
+                metrics["errors"].append(error_msg)
 
-    except Exception as e:
-        logger.error(f"Handler error: {str(e)}")
-        return {
-            "statusCode": 500,
-            "metrics": {
-                **metrics,
-                "errors": metrics["errors"] + [f"Handler error: {str(e)}"]
+            status_code = 200 if not metrics["errors"] else 500
+            return {
+                "statusCode": status_code,
+                "metrics": metrics
             }
-        }
 
-    finally:
-        if conn:
-            try:
-                conn.close()
-            except Exception as e:
-                logger.warning(f"Error closing connection: {str(e)}")
+        except Exception as e:
+            logger.error(f"Handler error: {str(e)}")
+            return {
+                "statusCode": 500,
+                "metrics": {
+                    **metrics,
+                    "errors": metrics["errors"] + [f"Handler error: {str(e)}"]
+                }
+            }
+
+        finally:
+            if conn:
+                try:
+                    conn.close()
+                except Exception as e:
+                    logger.warning(f"Error closing connection: {str(e)}")
@@ -1,17 +1,79 @@
 import json
+from functools import lru_cache
+
 from backend.shared.auth import get_user_id
-from backend.shared.db import get_connection, get_internal_user_id
+from backend.shared.db import get_connection, release_connection
+from backend.shared.etag import conditional_get, etag_for
 from backend.shared.logging import get_logger
+from backend.shared.metrics import phase
 from backend.shared.response import response
 from backend.shared.validation import (
     is_valid_date,
     is_valid_uuid,
+    get_body,
     get_path_param,
+    parse_fields,
     validate_int_quantity,
 )
 
 logger = get_logger(__name__)
 
+# ?fields= allowlist for GET /meal-logs: API field -> column of the log subquery
+MEAL_LOG_FIELDS = {
+    "id": "id",
+    "meal_id": "meal_id",
+    "date": "date",
+    "quantity": "quantity",
+    "meal_name": "name",
+    "meal_calories": "total_calories",
+}
+
+# Fields that need the join to meals
+_MEAL_COLUMNS = {"meal_name": "m.name", "meal_calories": "m.total_calories"}
+
+
+@lru_cache(maxsize=None)
+def _list_meal_logs_query(fields):
+    """
+    List query selecting only the requested fields, and the row position of
+    each field. l.id is always the second column (NULL when the user has no
+    logs) and the data version the last. meals is only joined when a meal
+    field is requested.
+    """
+    value_fields = [field for field in fields if field != "id"]
+    columns = [MEAL_LOG_FIELDS[field] for field in value_fields]
+    positions = [(field, 2 + index) for index, field in enumerate(value_fields)]
+    if "id" in fields:
+        positions.insert(0, ("id", 1))
+
+    inner = ", ".join(dict.fromkeys(
+        ["ml.id", "ml.date"]
+        + [_MEAL_COLUMNS.get(field, f"ml.{MEAL_LOG_FIELDS[field]}") for field in value_fields]
+    ))
+    join = "JOIN meals m ON m.id = ml.meal_id" if _MEAL_COLUMNS.keys() & set(fields) else ""
+    outer = "".join(f", l.{column}" for column in columns)
+    # Resolve the user in the same statement; a user with no logs still
+    # yields one row with NULL log columns.
+    query = f"""
+        WITH u AS (
+            SELECT id, data_version FROM users WHERE cognito_user_id = %s
+        )
+        SELECT u.id, l.id{outer}, u.data_version
+        FROM u
+        LEFT JOIN LATERAL (
+            SELECT {inner}
+            FROM meal_logs ml
+            {join}
+            WHERE ml.user_id = u.id
+              AND (%s::date IS NULL OR ml.date >= %s::date)
+              AND (%s::date IS NULL OR ml.date <= %s::date)
+            ORDER BY ml.date DESC, ml.id
+            LIMIT %s OFFSET %s
+        ) l ON TRUE
+        ORDER BY l.date DESC, l.id
+    """
+    return query, tuple(positions)
+
 
 def create_meal_log(event):
     """
@@ -25,8 +87,9 @@ def create_meal_log(event):
     """
     cognito_user_id = get_user_id(event)
     try:
-        body = json.loads(event.get("body") or "{}")
-    except json.JSONDecodeError:
+        with phase("parse"):
+            body = json.loads(get_body(event) or "{}")
+    except ValueError:
         return response(400, {"error": "Invalid JSON body"})
 
     meal_id = body.get("meal_id")
@@ -46,32 +109,46 @@ def create_meal_log(event):
         return response(400, {"error": quantity_error})
 
     conn = get_connection()
-    user_id = get_internal_user_id(conn, cognito_user_id)
-    if not user_id:
-        conn.close()
-        return response(404, {"error": "User not found"})
-
     cur = conn.cursor()
     try:
-        cur.execute(
-            "SELECT id FROM meals WHERE id = %s AND user_id = %s",
-            (meal_id, user_id)
-        )
-        if not cur.fetchone():
-            return response(404, {"error": "Meal not found"})
-
+        # Single round trip: resolve the user (bumping its data_version, see
+        # begin_user_write()), check meal ownership and insert. No row means
+        # the user is unknown; a NULL meal id means the meal is not theirs,
+        # in which case the INSERT produced nothing.
         cur.execute(
             """
-            INSERT INTO meal_logs (user_id, meal_id, date, quantity)
-            VALUES (%s, %s, %s, %s)
-            RETURNING id
+            WITH u AS (
+                UPDATE users SET data_version = data_version + 1
+                WHERE cognito_user_id = %s
+                RETURNING id
+            ),
+            m AS (
+                SELECT meals.id FROM meals JOIN u ON meals.user_id = u.id
+                WHERE meals.id = %s
+            ),
+            ins AS (
+                INSERT INTO meal_logs (user_id, meal_id, date, quantity)
+                SELECT u.id, m.id, %s::date, %s::int FROM u, m
+                RETURNING id
+            )
+            SELECT u.id, m.id, ins.id
+            FROM u
+            LEFT JOIN m ON TRUE
+            LEFT JOIN ins ON TRUE
             """,
-            (user_id, meal_id, date, quantity)
+            (cognito_user_id, meal_id, date, quantity),
+            name="create_meal_log.insert"
         )
-        log_id = cur.fetchone()[0]
+        row = cur.fetchone()
+        if not row:
+            return response(404, {"error": "User not found"})
+        if row[1] is None:
+            return response(404, {"error": "Meal not found"})
+
+        log_id = row[2]
         conn.commit()
 
-        logger.info("Created meal log", extra={"user_id": cognito_user_id, "meal_log_id": log_id})
+        logger.info("Created meal log", extra={"meal_log_id": log_id})
         return response(201, {
             "id": log_id,
             "meal_id": meal_id,
@@ -80,13 +157,14 @@ def create_meal_log(event):
         })
     except Exception:
         conn.rollback()
-        logger.exception("Failed to create meal log", extra={"user_id": cognito_user_id})
+        logger.exception("Failed to create meal log")
         return response(500, {"error": "Failed to create meal log"})
     finally:
         cur.close()
-        conn.close()
+        release_connection(conn)
 
 
+@conditional_get
 def list_meal_logs(event):
     """
     GET /meal-logs?from=YYYY-MM-DD&to=YYYY-MM-DD
@@ -108,50 +186,42 @@ def list_meal_logs(event):
         return response(400, {"error": "Invalid date format"})
     if date_to and not is_valid_date(date_to):
         return response(400, {"error": "Invalid date format"})
+    fields, fields_error = parse_fields(params, MEAL_LOG_FIELDS)
+    if fields_error:
+        return response(400, {"error": fields_error})
+    query, positions = _list_meal_logs_query(fields)
 
     conn = get_connection()
-    user_id = get_internal_user_id(conn, cognito_user_id)
-    if not user_id:
-        conn.close()
-        return response(404, {"error": "User not found"})
-
     cur = conn.cursor()
     try:
         cur.execute(
-            """
-            SELECT ml.id, ml.meal_id, ml.date, ml.quantity, m.name, m.total_calories
-            FROM meal_logs ml
-            JOIN meals m ON m.id = ml.meal_id
-            WHERE ml.user_id = %s
-              AND (%s IS NULL OR ml.date >= %s)
-              AND (%s IS NULL OR ml.date <= %s)
-            ORDER BY ml.date DESC, ml.id
-            LIMIT %s OFFSET %s
-            """,
-            (user_id, date_from, date_from, date_to, date_to, limit, offset)
+            query,
+            (cognito_user_id, date_from, date_from, date_to, date_to, limit, offset),
+            name="list_meal_logs.select"
         )
+        rows = cur.fetchall()
+        if not rows:
+            return response(404, {"error": "User not found"})
 
-        meal_logs = [
-            {
-                "id": row[0],
-                "meal_id": row[1],
-                "date": row[2].isoformat(),
-                "quantity": row[3],
-                "meal_name": row[4],
-                "meal_calories": row[5]
-            }
-            for row in cur.fetchall()
-        ]
+        with phase("map"):
+            meal_logs = []
+            for row in rows:
+                if row[1] is None:
+                    continue
+                meal_log = {field: row[index] for field, index in positions}
+                if "date" in meal_log:
+                    meal_log["date"] = meal_log["date"].isoformat()
+                meal_logs.append(meal_log)
 
         return response(200, {
             "meal_logs": meal_logs
-        })
+        }, etag=etag_for(event, rows[0][0], rows[0][-1]))
     except Exception:
-        logger.exception("Failed to list meal logs", extra={"user_id": cognito_user_id})
+        logger.exception("Failed to list meal logs")
         return response(500, {"error": "Failed to list meal logs"})
     finally:
         cur.close()
-        conn.close()
+        release_connection(conn)
 
 
 def delete_meal_log(event):
@@ -164,29 +234,43 @@ def delete_meal_log(event):
         return response(400, {"error": "Invalid ID format"})
 
     conn = get_connection()
-    user_id = get_internal_user_id(conn, cognito_user_id)
-    if not user_id:
-        conn.close()
-        return response(404, {"error": "User not found"})
-
     cur = conn.cursor()
     try:
+        # The users row is bumped (and locked) first, see begin_user_write()
         cur.execute(
-            "DELETE FROM meal_logs WHERE id = %s AND user_id = %s",
-            (log_id, user_id)
+            """
+            WITH u AS (
+                UPDATE users SET data_version = data_version + 1
+                WHERE cognito_user_id = %s
+                RETURNING id
+            ),
+            del AS (
+                DELETE FROM meal_logs
+                WHERE id = %s AND user_id = (SELECT id FROM u)
+                RETURNING id
+            )
+            SELECT u.id, (SELECT COUNT(*) FROM del)
+            FROM u
+            """,
+            (cognito_user_id, log_id),
+            name="delete_meal_log.delete"
         )
-        deleted = cur.rowcount
+        row = cur.fetchone()
+        if not row:
+            return response(404, {"error": "User not found"})
+
+        deleted = row[1]
         conn.commit()
 
         if deleted == 0:
             return response(404, {"error": "Meal log not found"})
 
-        logger.info("Deleted meal log", extra={"user_id": cognito_user_id, "meal_log_id": log_id})
+        logger.info("Deleted meal log", extra={"meal_log_id": log_id})
         return response(204, None)
     except Exception:
         conn.rollback()
-        logger.exception("Failed to delete meal log", extra={"user_id": cognito_user_id, "meal_log_id": log_id})
+        logger.exception("Failed to delete meal log", extra={"meal_log_id": log_id})
         return response(500, {"error": "Failed to delete meal log"})
     finally:
         cur.close()
-        conn.close()
+        release_connection(conn)
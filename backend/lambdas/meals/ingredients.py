@@ -1,11 +1,19 @@
 import json
+import os
+import uuid
+from functools import lru_cache
+
 from backend.shared.auth import get_user_id
-from backend.shared.db import get_connection, get_internal_user_id
+from backend.shared.db import begin_user_write, get_connection, release_connection
+from backend.shared.etag import conditional_get, etag_for
 from backend.shared.logging import get_logger
+from backend.shared.metrics import phase
 from backend.shared.response import response
 from backend.shared.validation import (
     is_valid_uuid,
+    get_body,
     get_path_param,
+    parse_fields,
     validate_string_length,
     validate_calories,
     MAX_NAME_LENGTH,
@@ -14,12 +22,59 @@ from backend.shared.validation import (
 
 logger = get_logger(__name__)
 
+# Upper bound on items per POST /ingredients/bulk
+BULK_MAX_INGREDIENTS = int(os.environ.get("BULK_MAX_INGREDIENTS", "5000"))
+
+# ?fields= allowlist for GET /ingredients: API field -> ingredients column
+INGREDIENT_FIELDS = {
+    "id": "id",
+    "name": "name",
+    "calories_per_unit": "calories_per_unit",
+    "unit": "unit",
+}
+
+
+@lru_cache(maxsize=None)
+def _list_ingredients_query(fields):
+    """
+    List query selecting only the requested fields, and the row position of
+    each field. i.id is always the second column (NULL when the user has no
+    ingredients) and the data version the last.
+    """
+    value_fields = [field for field in fields if field != "id"]
+    columns = [INGREDIENT_FIELDS[field] for field in value_fields]
+    positions = [(field, 2 + index) for index, field in enumerate(value_fields)]
+    if "id" in fields:
+        positions.insert(0, ("id", 1))
+
+    inner = ", ".join(dict.fromkeys(["id", "name", *columns]))
+    outer = "".join(f", i.{column}" for column in columns)
+    # Resolve the user in the same statement; a user with no ingredients
+    # still yields one row with NULL ingredient columns.
+    query = f"""
+        WITH u AS (
+            SELECT id, data_version FROM users WHERE cognito_user_id = %s
+        )
+        SELECT u.id, i.id{outer}, u.data_version
+        FROM u
+        LEFT JOIN LATERAL (
+            SELECT {inner}
+            FROM ingredients
+            WHERE user_id = u.id
+            ORDER BY name
+            LIMIT %s OFFSET %s
+        ) i ON TRUE
+        ORDER BY i.name
+    """
+    return query, tuple(positions)
+
 
 def create_ingredient(event):
     cognito_user_id = get_user_id(event)
     try:
-        body = json.loads(event.get("body") or "{}")
-    except json.JSONDecodeError:
+        with phase("parse"):
+            body = json.loads(get_body(event) or "{}")
+    except ValueError:
         return response(400, {"error": "Invalid JSON body"})
 
     name = body.get("name")
@@ -42,9 +97,9 @@ def create_ingredient(event):
         return response(400, {"error": calories_error})
 
     conn = get_connection()
-    user_id = get_internal_user_id(conn, cognito_user_id)
+    user_id = begin_user_write(conn, cognito_user_id)
     if not user_id:
-        conn.close()
+        release_connection(conn)
         return response(404, {"error": "User not found"})
 
     cur = conn.cursor()
@@ -55,13 +110,14 @@ def create_ingredient(event):
             VALUES (%s, %s, %s, %s)
             RETURNING id
             """,
-            (user_id, name, calories_per_unit, unit)
+            (user_id, name, calories_per_unit, unit),
+            name="create_ingredient.insert"
         )
         ingredient_id = cur.fetchone()[0]
         conn.commit()
     finally:
         cur.close()
-        conn.close()
+        release_connection(conn)
 
     return response(201, {
         "id": ingredient_id,
@@ -70,6 +126,114 @@ def create_ingredient(event):
         "unit": unit
     })
 
+
+def _ingredient_error(item):
+    """Validation error message for one ingredient object, or None."""
+    if not isinstance(item, dict):
+        return "Each ingredient must be an object"
+    return (
+        validate_string_length(item.get("name"), MAX_NAME_LENGTH, "name")
+        or validate_string_length(item.get("unit"), MAX_UNIT_LENGTH, "unit")
+        or validate_calories(item.get("calories_per_unit"))
+    )
+
+
+def bulk_create_ingredients(event):
+    """
+    POST /ingredients/bulk
+
+    Body:
+    {
+      "ingredients": [
+        {"name": "Oats", "calories_per_unit": 3.9, "unit": "g"},
+        ...
+      ]
+    }
+
+    Each item is validated like POST /ingredients. All valid items are
+    inserted with one statement in one transaction; invalid ones are skipped.
+    Returns 201 when every item was created, 207 when some were rejected
+    and 400 when none were valid, with one result per item in request order.
+    """
+    cognito_user_id = get_user_id(event)
+    try:
+        with phase("parse"):
+            body = json.loads(get_body(event) or "{}")
+    except ValueError:
+        return response(400, {"error": "Invalid JSON body"})
+
+    items = body.get("ingredients") if isinstance(body, dict) else None
+    if not isinstance(items, list) or not items:
+        return response(400, {"error": "ingredients must be a non-empty list"})
+    if len(items) > BULK_MAX_INGREDIENTS:
+        return response(400, {"error": f"At most {BULK_MAX_INGREDIENTS} ingredients per request"})
+
+    results = []
+    # Column arrays for the insert; ids are generated here so each result
+    # gets its id without relying on RETURNING order
+    ids, names, calories, units = [], [], [], []
+    for index, item in enumerate(items):
+        error = _ingredient_error(item)
+        if error:
+            results.append({"index": index, "status": 400, "error": error})
+            continue
+        ingredient_id = str(uuid.uuid4())
+        ids.append(ingredient_id)
+        names.append(item["name"])
+        calories.append(item["calories_per_unit"])
+        units.append(item["unit"])
+        results.append({
+            "index": index,
+            "status": 201,
+            "id": ingredient_id,
+            "name": item["name"],
+            "calories_per_unit": item["calories_per_unit"],
+            "unit": item["unit"],
+        })
+
+    created = len(ids)
+    summary = {"created": created, "failed": len(items) - created, "results": results}
+    if not created:
+        return response(400, summary)
+
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        # One statement however many rows: resolve the user (bumping its
+        # data_version, see begin_user_write()) and insert the column arrays.
+        # No row means the user is unknown.
+        cur.execute(
+            """
+            WITH u AS (
+                UPDATE users SET data_version = data_version + 1
+                WHERE cognito_user_id = %s
+                RETURNING id
+            ),
+            ins AS (
+                INSERT INTO ingredients (id, user_id, name, calories_per_unit, unit)
+                SELECT r.id, u.id, r.name, r.calories_per_unit, r.unit
+                FROM u, unnest(%s::uuid[], %s::text[], %s::numeric[], %s::text[])
+                    AS r(id, name, calories_per_unit, unit)
+                RETURNING 1
+            )
+            SELECT u.id, (SELECT count(*) FROM ins) FROM u
+            """,
+            (cognito_user_id, ids, names, calories, units),
+            name="bulk_create_ingredients.insert"
+        )
+        row = cur.fetchone()
+        if not row:
+            return response(404, {"error": "User not found"})
+        conn.commit()
+    finally:
+        cur.close()
+        release_connection(conn)
+
+    logger.info("Bulk created ingredients", extra={"created": created, "failed": len(items) - created})
+    return response(201 if created == len(items) else 207, summary)
+
+
+@conditional_get
 def list_ingredients(event):
     cognito_user_id = get_user_id(event)
     params = event.get("queryStringParameters") or {}
@@ -81,39 +245,89 @@ def list_ingredients(event):
         return response(400, {"error": "Invalid pagination parameters"})
     if limit <= 0 or offset < 0:
         return response(400, {"error": "Invalid pagination parameters"})
+    fields, fields_error = parse_fields(params, INGREDIENT_FIELDS)
+    if fields_error:
+        return response(400, {"error": fields_error})
 
-    conn = get_connection()
-    user_id = get_internal_user_id(conn, cognito_user_id)
-    if not user_id:
-        conn.close()
-        return response(404, {"error": "User not found"})
+    query, positions = _list_ingredients_query(fields)
 
+    conn = get_connection()
     cur = conn.cursor()
     try:
-        cur.execute(
-            """
-            SELECT id, name, calories_per_unit, unit
-            FROM ingredients
-            WHERE user_id = %s
-            ORDER BY name
-            LIMIT %s OFFSET %s
-            """,
-            (user_id, limit, offset)
-        )
-        ingredients = [
-            {
-                "id": row[0],
-                "name": row[1],
-                "calories_per_unit": row[2],
-                "unit": row[3]
-            }
-            for row in cur.fetchall()
-        ]
+        cur.execute(query, (cognito_user_id, limit, offset), name="list_ingredients.select")
+        rows = cur.fetchall()
     finally:
         cur.close()
-        conn.close()
+        release_connection(conn)
+
+    if not rows:
+        return response(404, {"error": "User not found"})
+
+    with phase("map"):
+        ingredients = [
+            {field: row[index] for field, index in positions}
+            for row in rows
+            if row[1] is not None
+        ]
+
+    return response(200, {"ingredients": ingredients}, etag=etag_for(event, rows[0][0], rows[0][-1]))
+
+def _recompute_meal_totals(cur, ingredient_id, user_id):
+    """
+    Recompute meals.total_calories for every meal of the user that uses the
+    ingredient, in one statement, after its calories_per_unit changed.
+
+    Cached daily_summaries rows on dates that log one of those meals are
+    refreshed in the same statement, since GET /daily-summary prefers them
+    over the live total. Returns (meals updated, ISO dates of the summaries
+    refreshed); days without a cached summary are not listed.
+    """
+    cur.execute(
+        """
+        WITH totals AS (
+            SELECT mi.meal_id, ROUND(SUM(mi.quantity * i.calories_per_unit), 2) AS total_calories
+            FROM meal_ingredients mi
+            JOIN ingredients i ON i.id = mi.ingredient_id
+            WHERE mi.meal_id IN (
+                SELECT meal_id FROM meal_ingredients WHERE ingredient_id = %s
+            )
+            GROUP BY mi.meal_id
+        ),
+        updated AS (
+            UPDATE meals m
+            SET total_calories = t.total_calories
+            FROM totals t
+            WHERE m.id = t.meal_id AND m.user_id = %s
+              AND m.total_calories IS DISTINCT FROM t.total_calories
+            RETURNING m.id, m.total_calories
+        ),
+        days AS (
+            -- meals still reads the pre-update snapshot here, hence the COALESCE
+            SELECT ml.date, SUM(ml.quantity * COALESCE(u.total_calories, m.total_calories)) AS total_calories
+            FROM meal_logs ml
+            JOIN meals m ON m.id = ml.meal_id
+            LEFT JOIN updated u ON u.id = ml.meal_id
+            WHERE ml.user_id = %s AND ml.date IN (
+                SELECT l.date FROM meal_logs l JOIN updated ON updated.id = l.meal_id
+                WHERE l.user_id = %s
+            )
+            GROUP BY ml.date
+        ),
+        refreshed AS (
+            UPDATE daily_summaries ds
+            SET total_calories = d.total_calories, computed_at = CURRENT_TIMESTAMP
+            FROM days d
+            WHERE ds.user_id = %s AND ds.date = d.date
+            RETURNING ds.date
+        )
+        SELECT (SELECT COUNT(*) FROM updated), ARRAY(SELECT date FROM refreshed ORDER BY date)
+        """,
+        (ingredient_id, user_id, user_id, user_id, user_id),
+        name="update_ingredient.recompute_totals"
+    )
+    meals_updated, dates = cur.fetchone()
+    return meals_updated, [day.isoformat() for day in dates]
 
-    return response(200, {"ingredients": ingredients})
 
 def update_ingredient(event):
     cognito_user_id = get_user_id(event)
@@ -122,8 +336,9 @@ def update_ingredient(event):
         return response(400, {"error": "Invalid ID format"})
 
     try:
-        body = json.loads(event.get("body") or "{}")
-    except json.JSONDecodeError:
+        with phase("parse"):
+            body = json.loads(get_body(event) or "{}")
+    except ValueError:
         return response(400, {"error": "Invalid JSON body"})
 
     name = body.get("name")
@@ -146,32 +361,40 @@ def update_ingredient(event):
         return response(400, {"error": calories_error})
 
     conn = get_connection()
-    user_id = get_internal_user_id(conn, cognito_user_id)
+    user_id = begin_user_write(conn, cognito_user_id)
     if not user_id:
-        conn.close()
+        release_connection(conn)
         return response(404, {"error": "User not found"})
 
     cur = conn.cursor()
     try:
+        # The self-join exposes the pre-update row, so the statement also
+        # reports whether calories_per_unit actually changed
         cur.execute(
             """
-            UPDATE ingredients
+            UPDATE ingredients i
             SET name = %s, calories_per_unit = %s, unit = %s
-            WHERE id = %s AND user_id = %s
-            RETURNING id
+            FROM ingredients old
+            WHERE i.id = %s AND i.user_id = %s AND old.id = i.id
+            RETURNING i.id, old.calories_per_unit IS DISTINCT FROM i.calories_per_unit
             """,
-            (name, calories_per_unit, unit, ingredient_id, user_id)
+            (name, calories_per_unit, unit, ingredient_id, user_id),
+            name="update_ingredient.update"
         )
         row = cur.fetchone()
+        refresh = _recompute_meal_totals(cur, ingredient_id, user_id) if row and row[1] else None
         conn.commit()
     finally:
         cur.close()
-        conn.close()
+        release_connection(conn)
 
     if not row:
         return response(404, {"error": "Ingredient not found"})
 
-    logger.info("Updated ingredient", extra={"user_id": cognito_user_id, "ingredient_id": ingredient_id})
+    extra = {"ingredient_id": ingredient_id}
+    if refresh:
+        extra["meals_updated"], extra["summary_dates_refreshed"] = refresh
+    logger.info("Updated ingredient", extra=extra)
     return response(200, {
         "id": ingredient_id,
         "name": name,
@@ -189,9 +412,9 @@ def delete_ingredient(event):
     force = str(params.get("force", "false")).lower() in ("1", "true", "yes")
 
     conn = get_connection()
-    user_id = get_internal_user_id(conn, cognito_user_id)
+    user_id = begin_user_write(conn, cognito_user_id)
     if not user_id:
-        conn.close()
+        release_connection(conn)
         return response(404, {"error": "User not found"})
 
     cur = conn.cursor()
@@ -204,7 +427,8 @@ def delete_ingredient(event):
             JOIN ingredients i ON i.id = mi.ingredient_id
             WHERE mi.ingredient_id = %s AND i.user_id = %s
             """,
-            (ingredient_id, user_id)
+            (ingredient_id, user_id),
+            name="delete_ingredient.usage"
         )
         usage_count = cur.fetchone()[0]
         if usage_count > 0 and not force:
@@ -214,16 +438,17 @@ def delete_ingredient(event):
 
         cur.execute(
             "DELETE FROM ingredients WHERE id = %s AND user_id = %s",
-            (ingredient_id, user_id)
+            (ingredient_id, user_id),
+            name="delete_ingredient.delete"
         )
         deleted = cur.rowcount
         conn.commit()
     finally:
         cur.close()
-        conn.close()
+        release_connection(conn)
 
     if deleted == 0:
         return response(404, {"error": "Ingredient not found"})
 
-    logger.info("Deleted ingredient", extra={"user_id": cognito_user_id, "ingredient_id": ingredient_id})
+    logger.info("Deleted ingredient", extra={"ingredient_id": ingredient_id})
     return response(204, None)
@@ -1,11 +1,24 @@
 import json
+from decimal import Decimal
+from functools import lru_cache
+
 from backend.shared.auth import get_user_id
-from backend.shared.db import get_connection, get_internal_user_id
+from backend.shared.db import (
+    begin_user_write,
+    get_connection,
+    get_internal_user_id,
+    release_connection,
+    use_exact_numerics,
+)
+from backend.shared.etag import conditional_get, etag_for
 from backend.shared.logging import get_logger
+from backend.shared.metrics import phase
 from backend.shared.response import response
 from backend.shared.validation import (
     is_valid_uuid,
+    get_body,
     get_path_param,
+    parse_fields,
     validate_string_length,
     validate_quantity,
     MAX_NAME_LENGTH,
@@ -13,32 +26,129 @@ from backend.shared.validation import (
 
 logger = get_logger(__name__)
 
+# A meal's total_calories from its (ingredient ids, quantities) arrays, summed
+# and rounded in SQL exactly as update_ingredient recomputes it
+_MEAL_TOTAL_SQL = """(
+    SELECT ROUND(SUM(r.quantity * i.calories_per_unit), 2)
+    FROM unnest(%s::uuid[], %s::numeric[]) AS r(ingredient_id, quantity)
+    JOIN ingredients i ON i.id = r.ingredient_id
+)"""
+
+# ?fields= allowlist for GET /meals: API field -> meals column
+MEAL_FIELDS = {
+    "id": "id",
+    "name": "name",
+    "total_calories": "total_calories",
+    "created_at": "created_at",
+}
+
+
+@lru_cache(maxsize=None)
+def _list_meals_query(fields):
+    """
+    List query selecting only the requested fields, and the row position of
+    each field. m.id is always the second column (NULL when the user has no
+    meals) and the data version the last.
+    """
+    value_fields = [field for field in fields if field != "id"]
+    columns = [MEAL_FIELDS[field] for field in value_fields]
+    positions = [(field, 2 + index) for index, field in enumerate(value_fields)]
+    if "id" in fields:
+        positions.insert(0, ("id", 1))
+
+    inner = ", ".join(dict.fromkeys(["id", "created_at", *columns]))
+    outer = "".join(f", m.{column}" for column in columns)
+    # Resolve the user in the same statement; a user with no meals still
+    # yields one row with NULL meal columns.
+    query = f"""
+        WITH u AS (
+            SELECT id, data_version FROM users WHERE cognito_user_id = %s
+        )
+        SELECT u.id, m.id{outer}, u.data_version
+        FROM u
+        LEFT JOIN LATERAL (
+            SELECT {inner}
+            FROM meals
+            WHERE user_id = u.id
+            ORDER BY created_at DESC
+            LIMIT %s OFFSET %s
+        ) m ON TRUE
+        ORDER BY m.created_at DESC
+    """
+    return query, tuple(positions)
+
 
-def _get_user_id_or_404(conn, cognito_user_id):
-    user_id = get_internal_user_id(conn, cognito_user_id)
+def _get_user_id_or_404(conn, cognito_user_id, write=False):
+    """Resolve the user, through begin_user_write() for writes; else a 404 response."""
+    user_id = (begin_user_write if write else get_internal_user_id)(conn, cognito_user_id)
     if not user_id:
-        conn.close()
+        release_connection(conn)
         return None, response(404, {"error": "User not found"})
     return user_id, None
 
 
-def _load_ingredient_calories(cur, user_id, ingredient_ids):
+def _load_ingredient_ids(cur, user_id, ingredient_ids, query_name):
+    """
+    The subset of ingredient_ids that are the user's ingredients; the
+    lookup is recorded under the caller's query_name.
+    """
     cur.execute(
         """
-        SELECT id, calories_per_unit
+        SELECT id
         FROM ingredients
         WHERE user_id = %s AND id = ANY(%s::uuid[])
         """,
-        (user_id, ingredient_ids)
+        (user_id, ingredient_ids),
+        name=query_name
     )
-    return {str(row[0]): float(row[1]) for row in cur.fetchall()}
+    return {str(row[0]) for row in cur.fetchall()}
+
+
+def _lock_meal_ingredients(cur, meal_id, user_id):
+    """
+    Lock the user's meal for the rest of the transaction and return its
+    current {ingredient_id: quantity}, or None if there is no such meal.
+    Open cur after use_exact_numerics() so the quantities are exact Decimals.
+    """
+    cur.execute(
+        """
+        SELECT m.id, mi.ingredient_id, mi.quantity
+        FROM meals m
+        LEFT JOIN meal_ingredients mi ON mi.meal_id = m.id
+        WHERE m.id = %s AND m.user_id = %s
+        FOR UPDATE OF m
+        """,
+        (meal_id, user_id),
+        name="update_meal.lock"
+    )
+    rows = cur.fetchall()
+    if not rows:
+        return None
+    return {str(row[1]): row[2] for row in rows if row[1] is not None}
+
+
+def _diff_ingredients(current, ingredients):
+    """
+    Split a meal's new ingredient list against its current {id: quantity}
+    into (removed ids, changed (id, quantity), added (id, quantity)).
+    Quantities compare exactly, so a stored 1.004 differs from a requested 1.
+    """
+    wanted = {item["ingredient_id"]: item["quantity"] for item in ingredients}
+    removed = [ingredient_id for ingredient_id in current if ingredient_id not in wanted]
+    changed = [
+        (ingredient_id, quantity) for ingredient_id, quantity in wanted.items()
+        if ingredient_id in current and Decimal(str(quantity)) != current[ingredient_id]
+    ]
+    added = [(ingredient_id, quantity) for ingredient_id, quantity in wanted.items() if ingredient_id not in current]
+    return removed, changed, added
 
 
 def create_meal(event):
     cognito_user_id = get_user_id(event)
     try:
-        body = json.loads(event.get("body") or "{}")
-    except json.JSONDecodeError:
+        with phase("parse"):
+            body = json.loads(get_body(event) or "{}")
+    except ValueError:
         return response(400, {"error": "Invalid JSON body"})
 
     name = body.get("name")
@@ -53,56 +163,53 @@ def create_meal(event):
         return response(400, {"error": "At least one ingredient is required"})
 
     conn = get_connection()
-    user_id, error_response = _get_user_id_or_404(conn, cognito_user_id)
+    user_id, error_response = _get_user_id_or_404(conn, cognito_user_id, write=True)
     if error_response:
         return error_response
 
     ingredient_ids = [item.get("ingredient_id") for item in ingredients]
     if not all(ingredient_ids):
-        conn.close()
+        release_connection(conn)
         return response(400, {"error": "Each ingredient requires ingredient_id"})
 
     # Check for duplicate ingredient IDs
     if len(ingredient_ids) != len(set(ingredient_ids)):
-        conn.close()
+        release_connection(conn)
         return response(400, {"error": "Duplicate ingredient IDs are not allowed"})
 
     cur = conn.cursor()
     try:
-        calories_map = _load_ingredient_calories(cur, user_id, ingredient_ids)
-        if len(calories_map) != len(set(ingredient_ids)):
+        known_ids = _load_ingredient_ids(cur, user_id, ingredient_ids, "create_meal.check_ingredients")
+        if len(known_ids) != len(set(ingredient_ids)):
             return response(400, {"error": "Invalid ingredient_id in request"})
 
-        total_calories = 0
         for item in ingredients:
-            quantity = item.get("quantity")
-            quantity_error = validate_quantity(quantity, "ingredient quantity")
+            quantity_error = validate_quantity(item.get("quantity"), "ingredient quantity")
             if quantity_error:
                 return response(400, {"error": quantity_error})
-            total_calories += calories_map[item["ingredient_id"]] * quantity
-
-        total_calories = round(total_calories, 2)
+        quantities = [item["quantity"] for item in ingredients]
 
-        cur.execute("BEGIN")
+        # The meal, its total and all of its ingredient rows in one statement
         cur.execute(
-            """
-            INSERT INTO meals (user_id, name, total_calories)
-            VALUES (%s, %s, %s)
-            RETURNING id
-            """,
-            (user_id, name, total_calories)
-        )
-        meal_id = cur.fetchone()[0]
-
-        cur.executemany(
-            """
-            INSERT INTO meal_ingredients (meal_id, ingredient_id, quantity)
-            VALUES (%s, %s, %s)
+            f"""
+            WITH m AS (
+                INSERT INTO meals (user_id, name, total_calories)
+                VALUES (%s, %s, {_MEAL_TOTAL_SQL})
+                RETURNING id, total_calories
+            ),
+            mi AS (
+                INSERT INTO meal_ingredients (meal_id, ingredient_id, quantity)
+                SELECT m.id, r.ingredient_id, r.quantity
+                FROM m, unnest(%s::uuid[], %s::numeric[]) AS r(ingredient_id, quantity)
+            )
+            SELECT id, total_calories FROM m
             """,
-            [(meal_id, item["ingredient_id"], item["quantity"]) for item in ingredients]
+            (user_id, name, ingredient_ids, quantities, ingredient_ids, quantities),
+            name="create_meal.insert"
         )
+        meal_id, total_calories = cur.fetchone()
         conn.commit()
-        logger.info("Created meal", extra={"user_id": cognito_user_id, "meal_id": meal_id})
+        logger.info("Created meal", extra={"meal_id": meal_id})
 
         return response(201, {
             "id": meal_id,
@@ -111,12 +218,13 @@ def create_meal(event):
         })
     except Exception:
         conn.rollback()
-        logger.exception("Failed to create meal", extra={"user_id": cognito_user_id})
+        logger.exception("Failed to create meal")
         return response(500, {"error": "Failed to create meal"})
     finally:
         cur.close()
-        conn.close()
+        release_connection(conn)
 
+@conditional_get
 def list_meals(event):
     cognito_user_id = get_user_id(event)
     params = event.get("queryStringParameters") or {}
@@ -128,39 +236,36 @@ def list_meals(event):
         return response(400, {"error": "Invalid pagination parameters"})
     if limit <= 0 or offset < 0:
         return response(400, {"error": "Invalid pagination parameters"})
+    fields, fields_error = parse_fields(params, MEAL_FIELDS)
+    if fields_error:
+        return response(400, {"error": fields_error})
+    query, positions = _list_meals_query(fields)
 
     conn = get_connection()
-    user_id, error_response = _get_user_id_or_404(conn, cognito_user_id)
-    if error_response:
-        return error_response
-
     cur = conn.cursor()
     try:
-        cur.execute(
-            """
-            SELECT id, name, total_calories, created_at
-            FROM meals
-            WHERE user_id = %s
-            ORDER BY created_at DESC
-            LIMIT %s OFFSET %s
-            """,
-            (user_id, limit, offset)
-        )
-        meals = [
-            {
-                "id": row[0],
-                "name": row[1],
-                "total_calories": row[2],
-                "created_at": row[3].isoformat()
-            }
-            for row in cur.fetchall()
-        ]
+        cur.execute(query, (cognito_user_id, limit, offset), name="list_meals.select")
+        rows = cur.fetchall()
     finally:
         cur.close()
-        conn.close()
+        release_connection(conn)
 
-    return response(200, {"meals": meals})
+    if not rows:
+        return response(404, {"error": "User not found"})
 
+    with phase("map"):
+        meals = []
+        for row in rows:
+            if row[1] is None:
+                continue
+            meal = {field: row[index] for field, index in positions}
+            if "created_at" in meal:
+                meal["created_at"] = meal["created_at"].isoformat()
+            meals.append(meal)
+
+    return response(200, {"meals": meals}, etag=etag_for(event, rows[0][0], rows[0][-1]))
+
+@conditional_get
 def get_meal(event):
     cognito_user_id = get_user_id(event)
     meal_id = get_path_param(event, "id")
@@ -185,43 +290,47 @@ def get_meal(event):
                 i.id,
                 i.name,
                 i.calories_per_unit,
-                i.unit
+                i.unit,
+                u.data_version
             FROM meals m
+            JOIN users u ON u.id = m.user_id
             LEFT JOIN meal_ingredients mi ON mi.meal_id = m.id
             LEFT JOIN ingredients i ON i.id = mi.ingredient_id
             WHERE m.id = %s AND m.user_id = %s
             ORDER BY i.name
             """,
-            (meal_id, user_id)
+            (meal_id, user_id),
+            name="get_meal.select"
         )
         rows = cur.fetchall()
     finally:
         cur.close()
-        conn.close()
+        release_connection(conn)
 
     if not rows:
         return response(404, {"error": "Meal not found"})
 
-    meal = {
-        "id": rows[0][0],
-        "name": rows[0][1],
-        "total_calories": rows[0][2],
-        "created_at": rows[0][3].isoformat(),
-        "ingredients": []
-    }
-
-    for row in rows:
-        ingredient_id = row[5]
-        if ingredient_id:
-            meal["ingredients"].append({
-                "ingredient_id": ingredient_id,
-                "name": row[6],
-                "calories_per_unit": row[7],
-                "unit": row[8],
-                "quantity": row[4]
-            })
-
-    return response(200, meal)
+    with phase("map"):
+        meal = {
+            "id": rows[0][0],
+            "name": rows[0][1],
+            "total_calories": rows[0][2],
+            "created_at": rows[0][3].isoformat(),
+            "ingredients": []
+        }
+
+        for row in rows:
+            ingredient_id = row[5]
+            if ingredient_id:
+                meal["ingredients"].append({
+                    "ingredient_id": ingredient_id,
+                    "name": row[6],
+                    "calories_per_unit": row[7],
+                    "unit": row[8],
+                    "quantity": row[4]
+                })
+
+    return response(200, meal, etag=etag_for(event, user_id, rows[0][-1]))
 
 def update_meal(event):
     cognito_user_id = get_user_id(event)
@@ -230,8 +339,9 @@ def update_meal(event):
         return response(400, {"error": "Invalid ID format"})
 
     try:
-        body = json.loads(event.get("body") or "{}")
-    except json.JSONDecodeError:
+        with phase("parse"):
+            body = json.loads(get_body(event) or "{}")
+    except ValueError:
         return response(400, {"error": "Invalid JSON body"})
 
     name = body.get("name")
@@ -246,63 +356,90 @@ def update_meal(event):
         return response(400, {"error": "At least one ingredient is required"})
 
     conn = get_connection()
-    user_id, error_response = _get_user_id_or_404(conn, cognito_user_id)
+    user_id, error_response = _get_user_id_or_404(conn, cognito_user_id, write=True)
     if error_response:
         return error_response
 
     ingredient_ids = [item.get("ingredient_id") for item in ingredients]
     if not all(ingredient_ids):
-        conn.close()
+        release_connection(conn)
         return response(400, {"error": "Each ingredient requires ingredient_id"})
 
     # Check for duplicate ingredient IDs
     if len(ingredient_ids) != len(set(ingredient_ids)):
-        conn.close()
+        release_connection(conn)
         return response(400, {"error": "Duplicate ingredient IDs are not allowed"})
 
+    # Stored quantities are diffed exactly, not as 2-place floats
+    use_exact_numerics(conn)
     cur = conn.cursor()
     try:
-        calories_map = _load_ingredient_calories(cur, user_id, ingredient_ids)
-        if len(calories_map) != len(set(ingredient_ids)):
+        current = _lock_meal_ingredients(cur, meal_id, user_id)
+        if current is None:
+            return response(404, {"error": "Meal not found"})
+
+        known_ids = _load_ingredient_ids(cur, user_id, ingredient_ids, "update_meal.check_ingredients")
+        if len(known_ids) != len(set(ingredient_ids)):
             return response(400, {"error": "Invalid ingredient_id in request"})
 
-        total_calories = 0
         for item in ingredients:
-            quantity = item.get("quantity")
-            quantity_error = validate_quantity(quantity, "ingredient quantity")
+            quantity_error = validate_quantity(item.get("quantity"), "ingredient quantity")
             if quantity_error:
                 return response(400, {"error": quantity_error})
-            total_calories += calories_map[item["ingredient_id"]] * quantity
-
-        total_calories = round(total_calories, 2)
-
-        cur.execute("BEGIN")
-        cur.execute(
-            """
-            UPDATE meals
-            SET name = %s, total_calories = %s
-            WHERE id = %s AND user_id = %s
-            RETURNING id
-            """,
-            (name, total_calories, meal_id, user_id)
-        )
-        row = cur.fetchone()
-        if not row:
-            return response(404, {"error": "Meal not found"})
-
-        cur.execute(
-            "DELETE FROM meal_ingredients WHERE meal_id = %s",
-            (meal_id,)
-        )
-        cur.executemany(
-            """
-            INSERT INTO meal_ingredients (meal_id, ingredient_id, quantity)
-            VALUES (%s, %s, %s)
-            """,
-            [(meal_id, item["ingredient_id"], item["quantity"]) for item in ingredients]
-        )
+        quantities = [item["quantity"] for item in ingredients]
+
+        removed, changed, added = _diff_ingredients(current, ingredients)
+        if not (removed or changed or added):
+            # Only the name (or nothing) changed: leave meal_ingredients alone
+            cur.execute(
+                f"""
+                UPDATE meals
+                SET name = %s, total_calories = {_MEAL_TOTAL_SQL}
+                WHERE id = %s AND user_id = %s
+                RETURNING total_calories
+                """,
+                (name, ingredient_ids, quantities, meal_id, user_id),
+                name="update_meal.rename"
+            )
+        else:
+            # The meal row plus only the ingredient rows that differ, in one statement
+            cur.execute(
+                f"""
+                WITH m AS (
+                    UPDATE meals
+                    SET name = %s, total_calories = {_MEAL_TOTAL_SQL}
+                    WHERE id = %s AND user_id = %s
+                    RETURNING id, total_calories
+                ),
+                removed AS (
+                    DELETE FROM meal_ingredients mi
+                    USING m
+                    WHERE mi.meal_id = m.id AND mi.ingredient_id = ANY(%s::uuid[])
+                ),
+                changed AS (
+                    UPDATE meal_ingredients mi
+                    SET quantity = r.quantity
+                    FROM m, unnest(%s::uuid[], %s::numeric[]) AS r(ingredient_id, quantity)
+                    WHERE mi.meal_id = m.id AND mi.ingredient_id = r.ingredient_id
+                ),
+                added AS (
+                    INSERT INTO meal_ingredients (meal_id, ingredient_id, quantity)
+                    SELECT m.id, r.ingredient_id, r.quantity
+                    FROM m, unnest(%s::uuid[], %s::numeric[]) AS r(ingredient_id, quantity)
+                )
+                SELECT total_calories FROM m
+                """,
+                (
+                    name, ingredient_ids, quantities, meal_id, user_id,
+                    removed,
+                    [ingredient_id for ingredient_id, _ in changed], [quantity for _, quantity in changed],
+                    [ingredient_id for ingredient_id, _ in added], [quantity for _, quantity in added],
+                ),
+                name="update_meal.update"
+            )
+        total_calories = cur.fetchone()[0]
         conn.commit()
-        logger.info("Updated meal", extra={"user_id": cognito_user_id, "meal_id": meal_id})
+        logger.info("Updated meal", extra={"meal_id": meal_id})
 
         return response(200, {
             "id": meal_id,
@@ -311,11 +448,11 @@ def update_meal(event):
         })
     except Exception:
         conn.rollback()
-        logger.exception("Failed to update meal", extra={"user_id": cognito_user_id, "meal_id": meal_id})
+        logger.exception("Failed to update meal", extra={"meal_id": meal_id})
         return response(500, {"error": "Failed to update meal"})
     finally:
         cur.close()
-        conn.close()
+        release_connection(conn)
 
 def delete_meal(event):
     cognito_user_id = get_user_id(event)
@@ -324,7 +461,7 @@ def delete_meal(event):
         return response(400, {"error": "Invalid ID format"})
 
     conn = get_connection()
-    user_id, error_response = _get_user_id_or_404(conn, cognito_user_id)
+    user_id, error_response = _get_user_id_or_404(conn, cognito_user_id, write=True)
     if error_response:
         return error_response
 
@@ -332,16 +469,17 @@ def delete_meal(event):
     try:
         cur.execute(
             "DELETE FROM meals WHERE id = %s AND user_id = %s",
-            (meal_id, user_id)
+            (meal_id, user_id),
+            name="delete_meal.delete"
         )
         deleted = cur.rowcount
         conn.commit()
     finally:
         cur.close()
-        conn.close()
+        release_connection(conn)
 
     if deleted == 0:
         return response(404, {"error": "Meal not found"})
 
-    logger.info("Deleted meal", extra={"user_id": cognito_user_id, "meal_id": meal_id})
+    logger.info("Deleted meal", extra={"meal_id": meal_id})
     return response(204, None)
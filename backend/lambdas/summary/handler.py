@@ -1,8 +1,7 @@
-from backend.shared.auth import get_user_id
-from backend.shared.response import response
-from backend.shared.db import get_connection
 from backend.shared.logging import get_logger
-from backend.shared.metrics import timer, put_count, put_metric
+from backend.shared.metrics import put_metric
+from backend.shared.response import response
+from backend.shared.router import Router
 
 from backend.lambdas.summary.summary import (
     get_daily_summary,
@@ -12,36 +11,22 @@ from backend.lambdas.summary.summary import (
 logger = get_logger(__name__)
 
 
-def handler(event, context):
-    resource = event.get("resource")
-    method = event.get("httpMethod")
+def get_summary(event):
+    """GET /daily-summary serves one day (?date=) or a range (?from=&to=)."""
     params = event.get("queryStringParameters") or {}
+    if "date" in params:
+        return get_daily_summary(event)
+    if "from" in params and "to" in params:
+        return get_range_summary(event)
+
+    logger.warning("Missing query parameters for daily-summary", extra={"params": list(params.keys())})
+    put_metric("ErrorCount", 1, unit="Count", dimensions={"Lambda": "summary"})
+    return response(400, {
+        "error": "Expected query params: date OR from & to"
+    })
+
+
+router = Router("summary", logger)
+router.add("GET", "/daily-summary", get_summary)
 
-    with timer("RequestLatency", dimensions={"Lambda": "summary", "Endpoint": resource or "unknown"}):
-        put_count("RequestCount", dimensions={"Lambda": "summary", "Endpoint": resource or "unknown"})
-
-        if not method or not resource:
-            logger.info("Invalid request", extra={"method": method, "resource": resource})
-            put_metric("ErrorCount", 1, unit="Count", dimensions={"Lambda": "summary"})
-            return response(400, {"error": "Invalid request"})
-
-        try:
-            if resource == "/daily-summary" and method == "GET":
-                if "date" in params:
-                    return get_daily_summary(event)
-                if "from" in params and "to" in params:
-                    return get_range_summary(event)
-
-                logger.warning("Missing query parameters for daily-summary", extra={"params": list(params.keys())})
-                put_metric("ErrorCount", 1, unit="Count", dimensions={"Lambda": "summary"})
-                return response(400, {
-                    "error": "Expected query params: date OR from & to"
-                })
-
-            logger.warning("Route not found", extra={"method": method, "resource": resource})
-            put_metric("ErrorCount", 1, unit="Count", dimensions={"Lambda": "summary"})
-            return response(404, {"error": "Not Found"})
-        except Exception as e:
-            logger.exception("Handler exception", extra={"method": method, "resource": resource, "error": str(e)})
-            put_metric("ErrorCount", 1, unit="Count", dimensions={"Lambda": "summary"})
-            raise
+handler = router.handler
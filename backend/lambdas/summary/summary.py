@@ -1,12 +1,15 @@
 from backend.shared.auth import get_user_id
-from backend.shared.db import get_connection, get_internal_user_id
+from backend.shared.db import get_connection, release_connection
+from backend.shared.etag import conditional_get, etag_for
 from backend.shared.logging import get_logger
+from backend.shared.metrics import phase
 from backend.shared.response import response
 from backend.shared.validation import is_valid_date
 
 logger = get_logger(__name__)
 
 
+@conditional_get
 def get_daily_summary(event):
     """
     GET /daily-summary?date=YYYY-MM-DD
@@ -25,48 +28,52 @@ def get_daily_summary(event):
         return response(400, {"error": "Invalid date format"})
 
     conn = get_connection()
-    user_id = get_internal_user_id(conn, cognito_user_id)
-    if not user_id:
-        conn.close()
-        return response(404, {"error": "User not found"})
     cur = conn.cursor()
 
     try:
-        # Try to read from cached daily_summaries first
-        cache_query = """
-            SELECT total_calories
-            FROM daily_summaries
-            WHERE user_id = %s AND date = %s
+        # One round trip: resolve the user, read the cached daily_summaries
+        # row and only compute the live total when no cached row exists.
+        query = """
+            WITH u AS (
+                SELECT id, data_version FROM users WHERE cognito_user_id = %s
+            )
+            SELECT
+                u.id,
+                ds.total_calories AS cached_total_calories,
+                CASE WHEN ds.total_calories IS NULL THEN (
+                    SELECT COALESCE(SUM(m.total_calories * ml.quantity), 0)
+                    FROM meal_logs ml
+                    JOIN meals m ON m.id = ml.meal_id
+                    WHERE ml.user_id = u.id
+                      AND ml.date = %s
+                ) END AS live_total_calories,
+                u.data_version
+            FROM u
+            LEFT JOIN daily_summaries ds ON ds.user_id = u.id AND ds.date = %s
         """
-        cur.execute(cache_query, (user_id, date))
-        cache_result = cur.fetchone()
-
-        if cache_result:
-            total_calories = cache_result[0]
-            logger.info("Fetched daily summary from cache", extra={"user_id": cognito_user_id, "date": date})
-        else:
-            # Fall back to live calculation if not in cache
-            query = """
-                SELECT
-                    COALESCE(SUM(m.total_calories * ml.quantity), 0) AS total_calories
-                FROM meal_logs ml
-                JOIN meals m ON m.id = ml.meal_id
-                WHERE ml.user_id = %s
-                  AND ml.date = %s
-            """
-            cur.execute(query, (user_id, date))
-            total_calories = cur.fetchone()[0]
-            logger.info("Fetched daily summary (live calculation)", extra={"user_id": cognito_user_id, "date": date})
+        cur.execute(query, (cognito_user_id, date, date), name="get_daily_summary.select")
+        row = cur.fetchone()
     finally:
         cur.close()
-        conn.close()
+        release_connection(conn)
+
+    if not row:
+        return response(404, {"error": "User not found"})
+
+    if row[1] is not None:
+        total_calories = row[1]
+        logger.info("Fetched daily summary from cache", extra={"date": date})
+    else:
+        total_calories = row[2]
+        logger.info("Fetched daily summary (live calculation)", extra={"date": date})
 
     return response(200, {
         "date": date,
         "total_calories": total_calories
-    })
+    }, etag=etag_for(event, row[0], row[3]))
 
 
+@conditional_get
 def get_range_summary(event):
     """
     GET /daily-summary?from=YYYY-MM-DD&to=YYYY-MM-DD
@@ -85,40 +92,51 @@ def get_range_summary(event):
         return response(400, {"error": "Invalid date format"})
 
     conn = get_connection()
-    user_id = get_internal_user_id(conn, cognito_user_id)
-    if not user_id:
-        conn.close()
-        return response(404, {"error": "User not found"})
     cur = conn.cursor()
 
     try:
+        # Resolve the user in the same statement; a user with no logs in the
+        # range still yields one row with NULL day columns.
         query = """
-            SELECT
-                ml.date,
-                COALESCE(SUM(m.total_calories * ml.quantity), 0) AS total_calories
-            FROM meal_logs ml
-            JOIN meals m ON m.id = ml.meal_id
-            WHERE ml.user_id = %s
-              AND ml.date BETWEEN %s AND %s
-            GROUP BY ml.date
-            ORDER BY ml.date
+            WITH u AS (
+                SELECT id, data_version FROM users WHERE cognito_user_id = %s
+            )
+            SELECT u.id, d.date, d.total_calories, u.data_version
+            FROM u
+            LEFT JOIN LATERAL (
+                SELECT
+                    ml.date,
+                    COALESCE(SUM(m.total_calories * ml.quantity), 0) AS total_calories
+                FROM meal_logs ml
+                JOIN meals m ON m.id = ml.meal_id
+                WHERE ml.user_id = u.id
+                  AND ml.date BETWEEN %s AND %s
+                GROUP BY ml.date
+            ) d ON TRUE
+            ORDER BY d.date
         """
-        cur.execute(query, (user_id, date_from, date_to))
+        cur.execute(query, (cognito_user_id, date_from, date_to), name="get_range_summary.select")
+        rows = cur.fetchall()
+    finally:
+        cur.close()
+        release_connection(conn)
+
+    if not rows:
+        return response(404, {"error": "User not found"})
 
+    with phase("map"):
         results = [
             {
-                "date": row[0].isoformat(),
-                "total_calories": row[1]
+                "date": row[1].isoformat(),
+                "total_calories": row[2]
             }
-            for row in cur.fetchall()
+            for row in rows
+            if row[1] is not None
         ]
-    finally:
-        cur.close()
-        conn.close()
 
-    logger.info("Fetched range summary", extra={"user_id": cognito_user_id, "from": date_from, "to": date_to})
+    logger.info("Fetched range summary", extra={"from": date_from, "to": date_to})
     return response(200, {
         "from": date_from,
         "to": date_to,
         "days": results
-    })
+    }, etag=etag_for(event, rows[0][0], rows[0][-1]))
@@ -1,7 +1,10 @@
-import psycopg2
-
 from backend.shared.auth import get_user_id, get_user_email
-from backend.shared.db import get_connection
+from backend.shared.db import (
+    cache_user_id,
+    get_connection,
+    invalidate_user_id,
+    release_connection,
+)
 from backend.shared.logging import get_logger
 from backend.shared.response import response
 
@@ -15,6 +18,8 @@ def bootstrap_user(event):
     Creates a user record if it does not already exist.
     This endpoint is idempotent.
     """
+    import psycopg2
+
     cognito_user_id = get_user_id(event)
     email = get_user_email(event)
 
@@ -25,25 +30,34 @@ def bootstrap_user(event):
             INSERT INTO users (cognito_user_id, email)
             VALUES (%s, %s)
             ON CONFLICT (cognito_user_id) DO NOTHING
+            RETURNING id
         """
-        cur.execute(query, (cognito_user_id, email))
+        cur.execute(query, (cognito_user_id, email), name="bootstrap_user.insert")
+        row = cur.fetchone()
         conn.commit()
 
-        logger.info("Bootstrapped user", extra={"user_id": cognito_user_id})
+        # A new row is cached directly; on conflict, drop any stale
+        # "not found" entry so the next lookup reads the existing row.
+        if row:
+            cache_user_id(cognito_user_id, row[0])
+        else:
+            invalidate_user_id(cognito_user_id)
+
+        logger.info("Bootstrapped user")
         return response(200, {
             "message": "User bootstrap completed"
         })
     except psycopg2.IntegrityError:
         conn.rollback()
-        logger.warning("User bootstrap conflict", extra={"user_id": cognito_user_id})
+        logger.warning("User bootstrap conflict")
         return response(409, {"error": "User already exists"})
     except Exception:
         conn.rollback()
-        logger.exception("Failed to bootstrap user", extra={"user_id": cognito_user_id})
+        logger.exception("Failed to bootstrap user")
         return response(500, {"error": "Failed to bootstrap user"})
     finally:
         cur.close()
-        conn.close()
+        release_connection(conn)
 
 
 def get_current_user(event):
@@ -60,21 +74,21 @@ def get_current_user(event):
             FROM users
             WHERE cognito_user_id = %s
         """
-        cur.execute(query, (cognito_user_id,))
+        cur.execute(query, (cognito_user_id,), name="get_current_user.select")
         row = cur.fetchone()
 
         if not row:
             return response(404, {"error": "User not found"})
 
-        logger.info("Fetched current user", extra={"user_id": cognito_user_id})
+        logger.info("Fetched current user")
         return response(200, {
             "id": row[0],
             "email": row[1],
             "created_at": row[2].isoformat()
         })
     except Exception:
-        logger.exception("Failed to fetch current user", extra={"user_id": cognito_user_id})
+        logger.exception("Failed to fetch current user")
         return response(500, {"error": "Failed to fetch current user"})
     finally:
         cur.close()
-        conn.close()
+        release_connection(conn)
@@ -0,0 +1,181 @@
+"""
+Local HTTP server that runs the API handlers without AWS.
+
+HTTP requests are turned into API Gateway proxy events and dispatched to the
+single-function entry point (backend.lambdas.api.handler) on a thread or
+process pool, backed by a local PostgreSQL. Meant for capacity testing with
+loadtests/locustfile.py:
+
+    DB_HOST=localhost DB_NAME=diet_tracker DB_USER=postgres DB_PASSWORD=postgres \\
+        python -m backend.local_server --port 8000 --workers 8
+
+    locust -f loadtests/locustfile.py --host http://localhost:8000
+
+A stub authorizer fills requestContext.authorizer.claims from the bearer
+token: the payload of a JWT is decoded without verifying it, and any other
+token is used as the Cognito sub. Requests without a token act as
+--default-user. With the thread pool every worker thread has its own DB
+connection (DB_CONNECTION_SCOPE=thread); with the process pool every worker
+process has one. Metrics are discarded (METRICS_BACKEND=none) and only
+warnings are logged unless those variables are set.
+"""
+import argparse
+import base64
+import json
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+DEFAULT_USER = "local-user"
+
+
+class _Context:
+    """The parts of the Lambda context object the handlers read."""
+
+    def __init__(self):
+        self.aws_request_id = str(uuid.uuid4())
+
+
+def invoke(event):
+    """Run one event through the API handler; executed on the worker pool."""
+    from backend.lambdas.api.handler import handler
+    return handler(event, _Context())
+
+
+def stub_claims(authorization, default_user=DEFAULT_USER):
+    """Cognito-style claims for an Authorization header value, without verification."""
+    token = (authorization or "").strip()
+    if token.lower().startswith("bearer "):
+        token = token[7:].strip()
+
+    if token.count(".") == 2:
+        payload_part = token.split(".")[1]
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(payload_part + "=" * (-len(payload_part) % 4)))
+        except ValueError:
+            payload = None
+        if isinstance(payload, dict) and payload.get("sub"):
+            return {"sub": payload["sub"], "email": payload.get("email")}
+
+    sub = token or default_user
+    return {"sub": sub, "email": f"{sub}@localhost"}
+
+
+class LocalServer(ThreadingHTTPServer):
+    """Accepts connections on threads and runs handlers on a bounded pool."""
+
+    daemon_threads = True
+
+    def __init__(self, address, workers=4, pool="thread", default_user=DEFAULT_USER):
+        super().__init__(address, _RequestHandler)
+        from backend.lambdas.api.handler import router
+
+        self.default_user = default_user
+        self.router = router
+        if pool == "process":
+            self.executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="handler")
+
+    def match(self, path):
+        """(resource template, path parameters) for a request path."""
+        return self.router.match(path)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=True)
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self._dispatch()
+
+    do_POST = do_PUT = do_DELETE = do_GET
+
+    def do_OPTIONS(self):
+        # API Gateway answers CORS preflights itself
+        self.send_response(204)
+        self.send_header("Access-Control-Allow-Origin", os.environ.get("ALLOWED_ORIGIN", "*"))
+        self.send_header("Access-Control-Allow-Headers", "Authorization,Content-Type,If-None-Match")
+        self.send_header("Access-Control-Allow-Methods", "GET,POST,PUT,DELETE,OPTIONS")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _event(self):
+        url = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length).decode() if length else None
+        resource, path_params = self.server.match(url.path)
+        query_params = dict(parse_qsl(url.query)) or None
+        return {
+            "resource": resource,
+            "path": url.path,
+            "httpMethod": self.command,
+            "headers": dict(self.headers.items()),
+            "queryStringParameters": query_params,
+            "pathParameters": path_params,
+            "body": body,
+            "isBase64Encoded": False,
+            "requestContext": {
+                "requestId": str(uuid.uuid4()),
+                "authorizer": {
+                    "claims": stub_claims(self.headers.get("Authorization"), self.server.default_user),
+                },
+            },
+        }
+
+    def _dispatch(self):
+        try:
+            result = self.server.executor.submit(invoke, self._event()).result()
+        except Exception:
+            # What API Gateway returns when the Lambda raises
+            result = {"statusCode": 502, "body": json.dumps({"message": "Internal server error"})}
+
+        body = result.get("body") or ""
+        payload = base64.b64decode(body) if result.get("isBase64Encoded") else body.encode()
+
+        self.send_response(result["statusCode"])
+        for name, value in (result.get("headers") or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        if payload:
+            self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        # No access log; the handlers log every request themselves
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the API handlers locally.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4,
+                        help="size of the handler pool (default: CPU count)")
+    parser.add_argument("--pool", choices=("thread", "process"), default="thread")
+    parser.add_argument("--default-user", default=DEFAULT_USER,
+                        help="Cognito sub for requests without an Authorization header")
+    args = parser.parse_args(argv)
+
+    # Read at import time by the shared modules, so set before the handlers load
+    os.environ.setdefault("DB_CONNECTION_SCOPE", "thread")
+    os.environ.setdefault("METRICS_BACKEND", "none")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    server = LocalServer((args.host, args.port), args.workers, args.pool, args.default_user)
+    print(f"Serving on http://{args.host}:{args.port} ({args.workers} {args.pool} workers)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,61 @@
 import json
 import os
+import re
+import threading
 import time
-import psycopg2
-import boto3
-from botocore.exceptions import BotoCoreError, ClientError
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache
+
+from backend.shared.logging import bind_log_context, get_logger
+from backend.shared.metrics import in_phase, phase, put_metrics, record_init_timing, timed_phase
+
+logger = get_logger(__name__)
 
 # Cached across Lambda invocations (warm starts)
 _connection = None
 _secret_cache = None
 
+# "container" caches one connection per process (Lambda); "thread" gives every
+# thread its own, for servers that run handlers concurrently (backend.local_server)
+CONNECTION_SCOPE = os.environ.get("DB_CONNECTION_SCOPE", "container").lower()
+_thread_connection = threading.local()
+
+# Background thread opening the first connection during Lambda init
+_warmup_thread = None
+
+# psycopg2 typecaster for NUMERIC -> float, built on first connect
+_numeric_caster = None
+
+# Probe the cached connection with SELECT 1 only after it has been idle this long
+IDLE_PROBE_SECONDS = float(os.environ.get("DB_IDLE_PROBE_SECONDS", "60"))
+
+# Lifetime counters for the cached connection (per Lambda container)
+_connection_stats = {
+    "connects": 0,
+    "reuses": 0,
+    "probes_run": 0,
+    "probes_skipped": 0,
+    "reconnects": 0,
+}
+
+# Cognito sub -> internal users.id, shared by warm invocations of a container
+USER_ID_CACHE_SIZE = int(os.environ.get("USER_ID_CACHE_SIZE", "1024"))
+USER_ID_CACHE_TTL_SECONDS = float(os.environ.get("USER_ID_CACHE_TTL_SECONDS", "300"))
+USER_ID_NEGATIVE_TTL_SECONDS = float(os.environ.get("USER_ID_NEGATIVE_TTL_SECONDS", "5"))
+
+_user_id_cache = OrderedDict()
+_user_id_cache_lock = threading.Lock()
+_user_id_cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+# Entries cached inside deferred_commits(), held until its transaction commits
+_deferred_user_ids = threading.local()
+
+# Statements recorded inside track_queries(); None when not tracking
+_query_log = threading.local()
+
+_SQL_VERB = re.compile(r"\s*(\w+)")
+_SQL_WRITE_TARGET = re.compile(r"\s*(?:INSERT\s+INTO|UPDATE|DELETE\s+FROM)\s+(\w+)", re.IGNORECASE)
+
 
 def _get_db_secret():
     global _secret_cache
@@ -16,14 +63,31 @@ def _get_db_secret():
     if _secret_cache:
         return _secret_cache
 
+    # Local PostgreSQL (backend.local_server): credentials from the environment
+    if not os.environ.get("DB_SECRET_ARN") and os.environ.get("DB_HOST"):
+        _secret_cache = {
+            "host": os.environ["DB_HOST"],
+            "port": int(os.environ.get("DB_PORT", "5432")),
+            "username": os.environ.get("DB_USER", "postgres"),
+            "password": os.environ.get("DB_PASSWORD", ""),
+        }
+        return _secret_cache
+
+    # boto3 costs hundreds of milliseconds to import; load it on first use
+    import boto3
+    from botocore.exceptions import BotoCoreError, ClientError
+
     secret_arn = os.environ["DB_SECRET_ARN"]
 
-    client = boto3.client("secretsmanager")
+    start_ns = time.perf_counter_ns()
+    # Own session: the default one is not safe to share with the warmup thread
+    client = boto3.session.Session().client("secretsmanager")
     last_exc = None
     for attempt in range(3):
         try:
             response = client.get_secret_value(SecretId=secret_arn)
             _secret_cache = json.loads(response["SecretString"])
+            record_init_timing("DbSecretFetchTime", (time.perf_counter_ns() - start_ns) / 1_000_000)
             return _secret_cache
         except (ClientError, BotoCoreError) as exc:
             last_exc = exc
@@ -46,23 +110,49 @@ def _is_connection_healthy(conn):
         return False
 
 
-def get_connection():
-    global _connection
+def _reconnect_errors():
+    """Errors that indicate the server side of the connection has gone away."""
+    import psycopg2
+    return (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+
+def _numeric_to_float(value, cur):
+    """
+    Cast NUMERIC text straight to a float rounded to 2 places, the value
+    response() has always sent, without building a Decimal first.
+    """
+    if value is None:
+        return None
+    whole, _, fraction = value.partition(".")
+    rest = fraction[2:].rstrip("0")
+    if not rest:
+        return float(value)
+
+    # Round half-even on the digits, then divide exact integer cents so the
+    # result is the float nearest the rounded decimal
+    cents = int(whole + fraction[:2])
+    if rest > "5" or (rest == "5" and cents % 2):
+        cents += -1 if value.startswith("-") else 1
+    return cents / 100
 
-    # Check if existing connection is healthy
-    if _connection and _connection.closed == 0:
-        if _is_connection_healthy(_connection):
-            return _connection
-        # Connection is broken, close and recreate
-        try:
-            _connection.close()
-        except Exception:
-            pass
-        _connection = None
+
+def _register_numeric_caster(raw):
+    global _numeric_caster
+    import psycopg2.extensions
+    if _numeric_caster is None:
+        _numeric_caster = psycopg2.extensions.new_type(
+            psycopg2.extensions.DECIMAL.values, "NUMERIC_AS_FLOAT", _numeric_to_float
+        )
+    psycopg2.extensions.register_type(_numeric_caster, raw)
+
+
+def _connect():
+    import psycopg2
 
     secret = _get_db_secret()
 
-    _connection = psycopg2.connect(
+    start_ns = time.perf_counter_ns()
+    raw = psycopg2.connect(
         host=secret["host"],
         user=secret["username"],
         password=secret["password"],
@@ -71,16 +161,495 @@ def get_connection():
         connect_timeout=5,
         options="-c statement_timeout=30000"  # 30 second statement timeout
     )
+    if _connection_stats["connects"] == 0:
+        record_init_timing("DbConnectTime", (time.perf_counter_ns() - start_ns) / 1_000_000)
+    _connection_stats["connects"] += 1
+    _register_numeric_caster(raw)
+    return raw
+
 
+class _ManagedCursor:
+    """
+    Cursor proxy that times statements and retries the first one of a lease.
+
+    Inside track_queries() every execute/executemany is recorded with its
+    duration and row count, under the caller's name= or the statement kind. The retry happens at most once: only connections
+    handed out without a health probe are eligible, and only when the failure
+    left the underlying connection closed, so statement timeouts and
+    constraint errors are never re-run.
+    """
+
+    def __init__(self, conn, args, kwargs):
+        self._conn = conn
+        self._args = args
+        self._kwargs = kwargs
+        self._cursor = self._open()
+
+    def _open(self):
+        cursor = self._conn.raw.cursor(*self._args, **self._kwargs)
+        if self._conn.exact_numeric:
+            import psycopg2.extensions
+            psycopg2.extensions.register_type(psycopg2.extensions.DECIMAL, cursor)
+        return cursor
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def execute(self, query, params=None, name=None):
+        return self._run("execute", query, params, name)
+
+    def executemany(self, query, params_seq, name=None):
+        return self._run("executemany", query, params_seq, name)
+
+    def _run(self, method, query, params, name):
+        # Statements outside any named phase are attributed to "db"
+        db_phase = nullcontext() if in_phase() else phase("db")
+        entries = getattr(_query_log, "entries", None)
+        if entries is None:
+            with db_phase:
+                return self._execute(method, query, params)
+
+        name = name or _statement_kind(query)
+        start_ns = time.perf_counter_ns()
+        try:
+            with db_phase:
+                return self._execute(method, query, params)
+        finally:
+            elapsed_ms = (time.perf_counter_ns() - start_ns) / 1_000_000
+            entries.append((name, elapsed_ms, max(self._cursor.rowcount, 0)))
+
+    def _execute(self, method, query, params):
+        retry_allowed = self._conn.retry_first_statement
+        self._conn.retry_first_statement = False
+        try:
+            return getattr(self._cursor, method)(query, params)
+        except _reconnect_errors():
+            if not retry_allowed or self._conn.raw.closed == 0:
+                raise
+
+        self._conn.reconnect()
+        self._cursor = self._open()
+        return getattr(self._cursor, method)(query, params)
+
+
+@lru_cache(maxsize=256)
+def _statement_kind(query):
+    """Stable label for a statement: the verb, plus the table for writes."""
+    target = _SQL_WRITE_TARGET.match(query)
+    verb = _SQL_VERB.match(query)
+    kind = verb.group(1).lower() if verb else "unknown"
+    return f"{kind}.{target.group(1).lower()}" if target else kind
+
+
+@contextmanager
+def track_queries(dimensions=None):
+    """
+    Time every statement run on the cached connection inside the block.
+
+    On exit the data is published in a single batch: DatabaseQueryTime per
+    statement (undimensioned, for the DietTracker-DatabaseSlowQuery alarm,
+    and by Query name), rows per statement, and per-request totals tagged
+    with the given dimensions. Query names are the name= passed to
+    execute(), e.g. "list_meals.select", or else the statement kind, e.g.
+    "insert.meal_ingredients".
+    """
+    _query_log.entries = []
+    try:
+        yield
+    finally:
+        entries = _query_log.entries
+        _query_log.entries = None
+        _publish_query_metrics(entries, dimensions)
+
+
+def _publish_query_metrics(entries, dimensions):
+    if not entries:
+        return
+
+    metrics = []
+    for name, elapsed_ms, rows in entries:
+        metrics.append(("DatabaseQueryTime", elapsed_ms, "Milliseconds", None))
+        metrics.append(("DatabaseQueryTime", elapsed_ms, "Milliseconds", {"Query": name}))
+        metrics.append(("DatabaseQueryRows", rows, "Count", {"Query": name}))
+
+    metrics.append(("DatabaseRequestTime", sum(e[1] for e in entries), "Milliseconds", dimensions))
+    metrics.append(("DatabaseQueryCount", len(entries), "Count", dimensions))
+    metrics.append(("DatabaseRowCount", sum(e[2] for e in entries), "Count", dimensions))
+    put_metrics(metrics)
+
+
+class _ManagedConnection:
+    """Proxy around the cached psycopg2 connection; see get_connection()."""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.last_used = time.monotonic()
+        self.retry_first_statement = False
+        # NUMERIC as Decimal instead of float for this lease; see use_exact_numerics()
+        self.exact_numeric = False
+        # Inside deferred_commits(): commit() is a no-op and release keeps the transaction
+        self.defer_commits = False
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+    def cursor(self, *args, **kwargs):
+        return _ManagedCursor(self, args, kwargs)
+
+    def commit(self):
+        if not self.defer_commits:
+            self.raw.commit()
+
+    def reconnect(self):
+        try:
+            self.raw.close()
+        except Exception:
+            pass
+        self.raw = _connect()
+        _connection_stats["reconnects"] += 1
+
+
+def get_connection():
+    """
+    Return the container's cached connection, connecting on first use.
+
+    A connection released less than IDLE_PROBE_SECONDS ago is trusted without a
+    round trip; if its first statement then fails because the server dropped
+    it, the statement is transparently retried once on a fresh connection.
+    Connections idle for longer are probed with SELECT 1 before reuse.
+
+    With DB_CONNECTION_SCOPE=thread each thread caches its own connection.
+    """
+    global _connection
+
+    if _warmup_thread is not None:
+        _wait_for_warmup()
+
+    if CONNECTION_SCOPE == "thread":
+        _thread_connection.conn = _reuse_or_connect(getattr(_thread_connection, "conn", None))
+        return _thread_connection.conn
+
+    _connection = _reuse_or_connect(_connection)
     return _connection
 
 
+def _reuse_or_connect(cached):
+    """Hand out a cached connection, probing or reconnecting it as needed."""
+    if cached is not None and cached.closed == 0:
+        idle_seconds = time.monotonic() - cached.last_used
+        if idle_seconds < IDLE_PROBE_SECONDS:
+            _connection_stats["probes_skipped"] += 1
+            _connection_stats["reuses"] += 1
+            # A retry would silently drop the writes of a deferred transaction
+            cached.retry_first_statement = not cached.defer_commits
+            return cached
+
+        _connection_stats["probes_run"] += 1
+        if _is_connection_healthy(cached.raw):
+            _connection_stats["reuses"] += 1
+            cached.last_used = time.monotonic()
+            cached.retry_first_statement = False
+            return cached
+
+        # Connection is broken, reconnect in place
+        cached.reconnect()
+        cached.last_used = time.monotonic()
+        cached.retry_first_statement = False
+        return cached
+
+    if cached is not None:
+        _connection_stats["reconnects"] += 1
+    return _ManagedConnection(_connect())
+
+
+def _is_cached(conn):
+    return conn is _connection or conn is getattr(_thread_connection, "conn", None)
+
+
+def _warmup():
+    global _connection
+    try:
+        _connection = _ManagedConnection(_connect())
+    except Exception:
+        # The first request connects lazily instead
+        logger.warning("DB warmup failed", exc_info=True)
+
+
+def start_warmup():
+    """
+    Fetch the secret and open the connection on a background thread.
+
+    Runs during Lambda init, overlapping the secret fetch and connect with
+    the rest of module loading. get_connection() waits for it to finish.
+    """
+    global _warmup_thread
+    if _warmup_thread is not None or _connection is not None:
+        return
+    _warmup_thread = threading.Thread(target=_warmup, name="db-warmup", daemon=True)
+    _warmup_thread.start()
+
+
+def _wait_for_warmup():
+    global _warmup_thread
+    thread = _warmup_thread
+    if thread is not None:
+        thread.join()
+        _warmup_thread = None
+
+
+def use_exact_numerics(conn):
+    """
+    Return NUMERIC columns as Decimal on cursors opened from conn until it is
+    released. Connections otherwise cast NUMERIC to floats rounded to 2 places.
+    """
+    conn.exact_numeric = True
+
+
+@contextmanager
+def deferred_commits():
+    """
+    Run several endpoints' writes as one transaction on the cached connection.
+
+    Inside the block commit() on the connection does nothing and
+    release_connection() leaves the transaction open. Yields a function that
+    commits it; whatever is still uncommitted when the block exits is rolled
+    back.
+
+    User ids cached inside the block (cache_user_id()) only reach the cache
+    once that commit succeeds, so a rolled-back POST /users/bootstrap cannot
+    leave a cached id for a users row that does not exist.
+    """
+    conn = get_connection()
+    conn.defer_commits = True
+    pending = _deferred_user_ids.entries = {}
+
+    def commit():
+        conn.raw.commit()
+        _deferred_user_ids.entries = None
+        for cognito_user_id, user_id in pending.items():
+            cache_user_id(cognito_user_id, user_id)
+        pending.clear()
+
+    try:
+        yield commit
+    finally:
+        _deferred_user_ids.entries = None
+        conn.defer_commits = False
+        # Rolled back: anything cached for these users may name a missing row
+        for cognito_user_id in pending:
+            invalidate_user_id(cognito_user_id)
+        release_connection(conn)
+
+
+def release_connection(conn):
+    """
+    Return a connection obtained from get_connection() without closing it.
+
+    Any transaction left open by the caller is rolled back so the next
+    invocation starts from a clean state. rollback() is a client-side no-op
+    when no transaction is in progress. If the reset fails the connection is
+    closed and dropped from the cache so the next get_connection() reconnects.
+    """
+    global _connection
+
+    if conn is None:
+        return
+
+    try:
+        if not conn.closed:
+            if getattr(conn, "defer_commits", False):
+                conn.last_used = time.monotonic()
+                return
+            conn.rollback()
+            if _is_cached(conn):
+                conn.last_used = time.monotonic()
+                conn.exact_numeric = False
+            return
+    except Exception:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    if conn is _connection:
+        _connection = None
+    elif conn is getattr(_thread_connection, "conn", None):
+        _thread_connection.conn = None
+
+
+def get_connection_stats():
+    """Return a snapshot of connection counters for this container."""
+    return dict(_connection_stats)
+
+
+# Counters published per invocation by connection_metrics()
+_CONNECTION_METRICS = (
+    ("probes_skipped", "DbProbesSkipped"),
+    ("probes_run", "DbProbesRun"),
+    ("reconnects", "DbReconnects"),
+)
+_USER_ID_CACHE_METRICS = (
+    ("hits", "UserIdCacheHits"),
+    ("misses", "UserIdCacheMisses"),
+    ("evictions", "UserIdCacheEvictions"),
+)
+
+
+@contextmanager
+def connection_metrics(dimensions=None):
+    """
+    Publish how the block used the cached connection and the user id cache:
+    health probes skipped and run, reconnects, and cache hits, misses and
+    evictions, as Count metrics with the given dimensions. The counters are
+    container-wide, so the block's delta is what is sent; use it to tune
+    DB_IDLE_PROBE_SECONDS and the USER_ID_CACHE_* settings.
+    """
+    before = dict(_connection_stats)
+    cache_before = get_user_id_cache_stats()
+    try:
+        yield
+    finally:
+        cache_after = get_user_id_cache_stats()
+        put_metrics([
+            (metric_name, _connection_stats[key] - before[key], "Count", dimensions)
+            for key, metric_name in _CONNECTION_METRICS
+        ] + [
+            (metric_name, cache_after[key] - cache_before[key], "Count", dimensions)
+            for key, metric_name in _USER_ID_CACHE_METRICS
+        ])
+
+
+def _lookup_cached_user_id(cognito_user_id):
+    """Return (found, user_id) from the cache; user_id may be a cached None."""
+    with _user_id_cache_lock:
+        entry = _user_id_cache.get(cognito_user_id)
+        if entry is None:
+            _user_id_cache_stats["misses"] += 1
+            return False, None
+        user_id, expires_at = entry
+        if expires_at <= time.monotonic():
+            del _user_id_cache[cognito_user_id]
+            _user_id_cache_stats["misses"] += 1
+            return False, None
+        _user_id_cache.move_to_end(cognito_user_id)
+        _user_id_cache_stats["hits"] += 1
+        return True, user_id
+
+
+def cache_user_id(cognito_user_id, user_id):
+    """
+    Remember the internal id for a Cognito user.
+
+    A None user_id is cached as "not found" for USER_ID_NEGATIVE_TTL_SECONDS so
+    repeated requests from an unbootstrapped user don't each hit the database.
+    Inside deferred_commits() the entry is held until the transaction commits.
+    """
+    pending = getattr(_deferred_user_ids, "entries", None)
+    if pending is not None:
+        pending[cognito_user_id] = user_id
+        return
+    ttl = USER_ID_CACHE_TTL_SECONDS if user_id is not None else USER_ID_NEGATIVE_TTL_SECONDS
+    with _user_id_cache_lock:
+        _user_id_cache[cognito_user_id] = (user_id, time.monotonic() + ttl)
+        _user_id_cache.move_to_end(cognito_user_id)
+        while len(_user_id_cache) > USER_ID_CACHE_SIZE:
+            _user_id_cache.popitem(last=False)
+            _user_id_cache_stats["evictions"] += 1
+
+
+def invalidate_user_id(cognito_user_id):
+    """Drop any cached (including negative) entry for a Cognito user."""
+    pending = getattr(_deferred_user_ids, "entries", None)
+    if pending is not None:
+        pending.pop(cognito_user_id, None)
+    with _user_id_cache_lock:
+        _user_id_cache.pop(cognito_user_id, None)
+
+
+def clear_user_id_cache():
+    """Empty the user id cache. Counters are left untouched."""
+    with _user_id_cache_lock:
+        _user_id_cache.clear()
+
+
+def get_user_id_cache_stats():
+    """Return a snapshot of hit/miss/eviction counters plus the current size."""
+    with _user_id_cache_lock:
+        return {**_user_id_cache_stats, "size": len(_user_id_cache)}
+
+
+@timed_phase("user")
 def get_internal_user_id(conn, cognito_user_id):
+    """
+    Return the internal users.id for a Cognito user, or None if unknown.
+    A resolved id is added to the request's log context as internal_user_id.
+    """
+    found, user_id = _lookup_cached_user_id(cognito_user_id)
+    if not found:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT id FROM users WHERE cognito_user_id = %s",
+            (cognito_user_id,),
+            name="get_internal_user_id.select"
+        )
+        row = cur.fetchone()
+        cur.close()
+        user_id = row[0] if row else None
+        cache_user_id(cognito_user_id, user_id)
+
+    if user_id is not None:
+        bind_log_context(internal_user_id=user_id)
+    return user_id
+
+
+@timed_phase("user")
+def begin_user_write(conn, cognito_user_id):
+    """
+    Resolve a Cognito user for a write: bump users.data_version and return
+    the internal id, or None if unknown.
+
+    Every write runs this before touching any of the user's other rows, so
+    the users row lock is always taken first and concurrent writes cannot
+    deadlock on lock order. The bump commits or rolls back with the write.
+    """
     cur = conn.cursor()
     cur.execute(
-        "SELECT id FROM users WHERE cognito_user_id = %s",
-        (cognito_user_id,)
+        "UPDATE users SET data_version = data_version + 1 WHERE cognito_user_id = %s RETURNING id",
+        (cognito_user_id,),
+        name="begin_user_write.update"
     )
     row = cur.fetchone()
     cur.close()
-    return row[0] if row else None
+    user_id = row[0] if row else None
+    cache_user_id(cognito_user_id, user_id)
+    if user_id is not None:
+        bind_log_context(internal_user_id=user_id)
+    return user_id
+
+
+@timed_phase("user")
+def get_user_data_version(conn, cognito_user_id):
+    """
+    Return (user_id, data_version) for a Cognito user, or None if unknown.
+
+    data_version is bumped by every write to the user's rows
+    (begin_user_write()), so it is never served from a cache.
+    """
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT id, data_version FROM users WHERE cognito_user_id = %s",
+        (cognito_user_id,),
+        name="get_user_data_version.select"
+    )
+    row = cur.fetchone()
+    cur.close()
+    cache_user_id(cognito_user_id, row[0] if row else None)
+    if not row:
+        return None
+    bind_log_context(internal_user_id=row[0])
+    return row[0], row[1]
+
+
+# Only inside a deployed Lambda; DB_WARMUP=0 turns it off
+if os.environ.get("AWS_LAMBDA_FUNCTION_NAME") and os.environ.get("DB_WARMUP", "1") == "1":
+    start_warmup()
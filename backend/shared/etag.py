@@ -0,0 +1,70 @@
+"""
+Conditional GET support for the read endpoints.
+
+ETags are built from the per-user data version (users.data_version, bumped
+by triggers on every write to the user's rows) plus a digest of the request
+URL, so they are strong without hashing the response body. Endpoints select
+the version in their main query and tag the 200 with etag_for();
+@conditional_get answers a matching If-None-Match with a 304 after a single
+indexed lookup, before the endpoint's query or serialization runs.
+"""
+import functools
+import hashlib
+
+from backend.shared.auth import get_user_id
+from backend.shared.db import get_connection, get_user_data_version, release_connection
+from backend.shared.response import CONTENT_CODINGS, not_modified
+from backend.shared.validation import get_header
+
+
+def etag_for(event, user_id, data_version):
+    """Strong ETag for a GET response of this user at this data version."""
+    path_params = event.get("pathParameters") or {}
+    query_params = event.get("queryStringParameters") or {}
+    key = "|".join((
+        str(user_id),
+        event.get("resource") or "",
+        repr(sorted(path_params.items())),
+        repr(sorted(query_params.items())),
+    ))
+    digest = hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+    return f'"{data_version}-{digest}"'
+
+
+def _match(if_none_match, etag):
+    """
+    The If-None-Match entry that matches etag, or None. Weak validators match
+    too (RFC 9110 13.1.2), as do the per-coding variants response() sends for
+    compressed bodies.
+    """
+    if if_none_match.strip() == "*":
+        return etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag or any(candidate == f'{etag[:-1]}-{coding}"' for coding in CONTENT_CODINGS):
+            return candidate
+    return None
+
+
+def conditional_get(func):
+    """
+    Decorator for GET endpoints: return 304 Not Modified when If-None-Match
+    matches the current ETag, otherwise run the endpoint.
+    """
+    @functools.wraps(func)
+    def wrapper(event):
+        if_none_match = get_header(event, "If-None-Match")
+        if if_none_match:
+            conn = get_connection()
+            try:
+                user = get_user_data_version(conn, get_user_id(event))
+            finally:
+                release_connection(conn)
+            if user is not None:
+                matched = _match(if_none_match, etag_for(event, *user))
+                if matched:
+                    return not_modified(matched)
+        return func(event)
+    return wrapper
@@ -1,70 +1,316 @@
+"""
+Structured JSON logging for the Lambdas: one JSON object per line on stdout.
+
+Fields bound with log_context() (request id, Lambda, route, user id) are
+added to every line the thread writes inside the block. LOG_SAMPLE_RATES
+keeps 1 in N records below WARNING for the named loggers, e.g.
+"backend.lambdas.meals=10,backend.lambdas.summary.summary=5"; warnings and
+errors are always written.
+
+Records are only built once Logger.isEnabledFor() has accepted the level.
+The formatter then assembles each line from pre-encoded pieces: the level
+and logger name are encoded once per logger, the timestamp is cached per
+millisecond, and orjson encodes the variable fields.
+"""
+import atexit
+import functools
+import itertools
 import json
 import logging
+import logging.handlers
 import os
+import queue
 import sys
-from datetime import datetime
+import threading
+import time
+from contextlib import contextmanager
+
+import orjson
 
 LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
 
+# "sync" writes each record on the calling thread, "queue" hands it to a listener thread
+LOG_MODE = os.environ.get("LOG_MODE", "sync").lower()
+
+
+def _parse_sample_rates(value):
+    """Parse "logger=N,other.logger=M" into {logger name: N}; invalid rules are ignored."""
+    rates = {}
+    for rule in value.split(","):
+        name, _, every = rule.partition("=")
+        if name.strip() and every.strip().isdigit() and int(every) > 0:
+            rates[name.strip()] = int(every)
+    return rates
+
+
+# Logger name (or package prefix) -> keep 1 in N records below WARNING
+LOG_SAMPLE_RATES = _parse_sample_rates(os.environ.get("LOG_SAMPLE_RATES", ""))
+
+# Per-thread fields bound by log_context(); the dict is replaced, never mutated
+_context = threading.local()
+
+# Shared by every logger in queue mode; created on first get_logger()
+_log_queue = None
+_queue_handler = None
+_queue_listener = None
+
+# Fields every line carries; extra fields may override them
+_STANDARD_FIELDS = frozenset(("timestamp", "level", "logger", "message", "function", "line"))
+
+# Non-serializable values in extra fields are logged as str() rather than
+# failing. Only used for what orjson rejects; compact and unescaped like orjson.
+_json_encode = json.JSONEncoder(default=str, separators=(",", ":"), ensure_ascii=False).encode
+
+# (epoch milliseconds, formatted timestamp) of the last record
+_last_timestamp = (None, "")
+
+
+def _dumps(value):
+    try:
+        return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+    except TypeError:
+        # e.g. integers wider than 64 bits
+        return _json_encode(value)
+
+
+def _timestamp(created):
+    """ISO-8601 UTC timestamp with millisecond precision, cached per millisecond."""
+    global _last_timestamp
+    ms = int(created * 1000)
+    cached_ms, formatted = _last_timestamp
+    if ms != cached_ms:
+        seconds, millis = divmod(ms, 1000)
+        formatted = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(seconds)) + f".{millis:03d}Z"
+        _last_timestamp = (ms, formatted)
+    return formatted
+
 
 class JSONFormatter(logging.Formatter):
     """Custom formatter that outputs logs as JSON objects."""
 
+    def __init__(self):
+        super().__init__()
+        # (logger name, level) -> pre-encoded ',"level":...,"logger":...'
+        self._static_fields = {}
+
     def format(self, record):
+        extra_fields = getattr(record, "extra_fields", None)
+        if extra_fields and not _STANDARD_FIELDS.isdisjoint(extra_fields):
+            return self._format_merged(record, extra_fields)
+
+        key = (record.name, record.levelno)
+        static_fields = self._static_fields.get(key)
+        if static_fields is None:
+            static_fields = f',"level":{_dumps(record.levelname)},"logger":{_dumps(record.name)}'
+            self._static_fields[key] = static_fields
+
+        line = (
+            '{"timestamp":"' + _timestamp(record.created) + '"'
+            + static_fields
+            + ',"message":' + _dumps(record.getMessage())
+            + ',"function":' + _dumps(record.funcName)
+            + ',"line":' + str(record.lineno)
+        )
+        if record.exc_info:
+            line += ',"exception":' + _dumps(self._exception_text(record))
+        if extra_fields:
+            line += "," + _dumps(extra_fields)[1:-1]
+        return line + "}"
+
+    def _format_merged(self, record, extra_fields):
+        """Slow path for extra fields that replace a standard field."""
         log_data = {
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": _timestamp(record.created),
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
             "function": record.funcName,
             "line": record.lineno,
         }
+        if record.exc_info:
+            log_data["exception"] = self._exception_text(record)
+        log_data.update(extra_fields)
+        return _dumps(log_data)
 
-        # Add extra fields if provided
-        if hasattr(record, "extra_fields"):
-            log_data.update(record.extra_fields)
-
-        return json.dumps(log_data)
+    def _exception_text(self, record):
+        if not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        return record.exc_text
 
 
 class StructuredLogger(logging.Logger):
     """Logger that supports extra fields for structured logging."""
 
-    def _log(self, level, msg, args, exc_info=None, extra=None, stack_info=False):
-        # Extract extra fields from the extra dict
-        if extra is None:
-            extra = {}
+    sample_every = 1
+
+    def set_sample_rate(self, every):
+        """Keep 1 in `every` records below WARNING; warnings and errors are always kept."""
+        self.sample_every = max(int(every), 1)
+        self._sample_counter = itertools.count()
 
-        # Create a copy so we don't modify the original
-        extra_copy = dict(extra)
-        extra_copy_for_record = extra_copy.copy()
+    def _log(self, level, msg, args, exc_info=None, extra=None, stack_info=False, stacklevel=1):
+        # Only reached once the level check has passed. Dropped samples
+        # return before a record is built.
+        if self.sample_every > 1 and level < logging.WARNING:
+            if next(self._sample_counter) % self.sample_every:
+                return
+            extra = {**extra, "sample_rate": self.sample_every} if extra else {"sample_rate": self.sample_every}
 
-        # Pass extra_fields to the LogRecord
-        if not hasattr(logging.LogRecord, "extra_fields"):
-            logging.LogRecord.extra_fields = {}
+        # Extra fields win over context fields. Dicts are attached as-is;
+        # in queue mode DeferredQueueHandler snapshots them.
+        context_fields = getattr(_context, "fields", None)
+        if context_fields:
+            extra = {**context_fields, **extra} if extra else context_fields
 
         super()._log(
             level,
             msg,
             args,
             exc_info=exc_info,
-            extra={"extra_fields": extra_copy},
+            extra={"extra_fields": extra} if extra else None,
             stack_info=stack_info,
+            stacklevel=stacklevel,
         )
 
 
+logging.setLoggerClass(StructuredLogger)
+
+# Lines never include thread or process details, so skip collecting them
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread.
+
+    The stock prepare() formats the record on the calling thread; this one
+    only resolves the message arguments and copies the extra fields so later
+    changes by the caller can't leak into the queued record.
+    """
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        extra_fields = getattr(record, "extra_fields", None)
+        if extra_fields:
+            record.extra_fields = dict(extra_fields)
+        return record
+
+
+def _start_queue_listener():
+    global _log_queue, _queue_listener
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JSONFormatter())
+
+    _log_queue = queue.Queue()
+    _queue_listener = logging.handlers.QueueListener(_log_queue, stream_handler)
+    _queue_listener.start()
+
+
+def _get_queue_handler():
+    global _queue_handler
+    if _queue_handler is None:
+        _start_queue_listener()
+        atexit.register(flush_logs)
+        _queue_handler = DeferredQueueHandler(_log_queue)
+    return _queue_handler
+
+
+def _restart_queue_listener():
+    """
+    A forked child inherits the queue but not the listener thread, so
+    flush_logs() would wait forever. Give the child its own queue and listener;
+    records the parent had not written yet stay the parent's.
+    """
+    if _queue_handler is not None:
+        _start_queue_listener()
+        _queue_handler.queue = _log_queue
+
+
+os.register_at_fork(after_in_child=_restart_queue_listener)
+
+
+def flush_logs():
+    """Block until every queued record has been written. No-op in sync mode."""
+    if _log_queue is not None:
+        _log_queue.join()
+
+
+def queued_logs(func):
+    """
+    Decorator for handler entry points: wait for queued log records to be
+    written before returning or raising.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            flush_logs()
+    return wrapper
+
+
+def _sample_rate_for(name):
+    """Rate of the most specific LOG_SAMPLE_RATES rule covering a logger name."""
+    while name:
+        if name in LOG_SAMPLE_RATES:
+            return LOG_SAMPLE_RATES[name]
+        name = name.rpartition(".")[0]
+    return 1
+
+
+@contextmanager
+def log_context(**fields):
+    """Add fields to every log line this thread writes inside the block."""
+    previous = getattr(_context, "fields", None)
+    _context.fields = {**previous, **fields} if previous else fields
+    try:
+        yield
+    finally:
+        _context.fields = previous
+
+
+def bind_log_context(**fields):
+    """
+    Add fields to the enclosing log_context() once they become known. Does
+    nothing outside a log_context(), so nothing leaks into later lines.
+    """
+    previous = getattr(_context, "fields", None)
+    if previous is not None:
+        _context.fields = {**previous, **fields}
+
+
+def request_log_fields(event, context, lambda_name):
+    """Context fields for an API Gateway invocation: request id, Lambda, route and user id."""
+    request_context = event.get("requestContext") or {}
+    claims = (request_context.get("authorizer") or {}).get("claims") or {}
+
+    fields = {
+        "request_id": getattr(context, "aws_request_id", None) or request_context.get("requestId"),
+        "lambda_name": lambda_name,
+        "route": f"{event.get('httpMethod')} {event.get('resource')}",
+    }
+    if claims.get("sub"):
+        fields["user_id"] = claims["sub"]
+    return fields
+
+
 def get_logger(name):
     """Get a logger instance with JSON structured logging."""
-    # Set the logger class to our custom StructuredLogger
-    logging.setLoggerClass(StructuredLogger)
-
     logger = logging.getLogger(name)
     logger.setLevel(LOG_LEVEL)
+    if isinstance(logger, StructuredLogger):
+        logger.set_sample_rate(_sample_rate_for(name))
 
     # Only add handler if this logger doesn't already have one
     if not logger.handlers:
-        handler = logging.StreamHandler(sys.stdout)
-        handler.setFormatter(JSONFormatter())
-        logger.addHandler(handler)
+        if LOG_MODE == "queue":
+            logger.addHandler(_get_queue_handler())
+        else:
+            handler = logging.StreamHandler(sys.stdout)
+            handler.setFormatter(JSONFormatter())
+            logger.addHandler(handler)
 
     return logger
@@ -1,13 +1,56 @@
 """
 CloudWatch custom metrics for the DietTracker application.
 Namespace: DietTracker
+
+Inside a handler decorated with @buffered_metrics, data points are
+aggregated per (name, unit, dimensions) into Values/Counts arrays and sent
+in as few PutMetricData calls as possible when the handler returns or
+raises. Outside such a handler each call is sent immediately.
+
+METRICS_BACKEND=emf switches from PutMetricData to CloudWatch Embedded
+Metric Format: metrics are written to stdout as structured JSON log lines
+and extracted by CloudWatch Logs asynchronously, with no API call on the
+request path. METRICS_BACKEND=none discards metrics, e.g. for the local
+server (backend.local_server) where there is no CloudWatch to send to.
 """
+import functools
+import json
+import os
+import sys
+import threading
 import time
 from contextlib import contextmanager
-from typing import Optional, Dict
+from typing import Optional, Dict, List, Tuple
+
+NAMESPACE = "DietTracker"
+
+# "cloudwatch" (PutMetricData), "emf" (Embedded Metric Format on stdout) or "none"
+METRICS_BACKEND = os.environ.get("METRICS_BACKEND", "cloudwatch").lower()
+
+# PutMetricData accepts at most 1000 data points per call
+MAX_METRIC_DATA_PER_CALL = 1000
+
+# A single datum may carry at most 150 distinct Values
+MAX_VALUES_PER_DATUM = 150
+
+# An EMF metric may carry at most 100 values per document
+MAX_EMF_VALUES_PER_METRIC = 100
 
 _cloudwatch_client = None
 
+# Per-thread invocation buffer: {(name, unit, dimensions): {value: count}}
+_state = threading.local()
+
+# Handlers import this module first thing, so this approximates the start of
+# Lambda init for the container
+_init_started_ns = time.perf_counter_ns()
+_cold_start = True
+
+# One-off init timings (e.g. first secret fetch) waiting for an invocation
+# to publish them with its dimensions: {metric_name: milliseconds}
+_pending_init_timings = {}
+_pending_init_timings_lock = threading.Lock()
+
 
 def _get_cloudwatch_client():
     """Lazy-initialize CloudWatch client."""
@@ -22,6 +65,110 @@ def _get_cloudwatch_client():
     return _cloudwatch_client
 
 
+def _dimension_list(dimensions) -> list:
+    return [{"Name": k, "Value": v} for k, v in dimensions]
+
+
+def _metric_datum(
+    metric_name: str,
+    value: float,
+    unit: str,
+    dimensions: Optional[Dict[str, str]],
+) -> dict:
+    metric_data = {
+        "MetricName": metric_name,
+        "Value": value,
+        "Unit": unit,
+    }
+
+    if dimensions:
+        metric_data["Dimensions"] = [
+            {"Name": k, "Value": str(v)} for k, v in dimensions.items()
+        ]
+
+    return metric_data
+
+
+def _send(metric_data: list) -> None:
+    """Send prepared MetricData entries, chunked to the per-call limit."""
+    if METRICS_BACKEND == "none":
+        return
+    try:
+        client = _get_cloudwatch_client()
+        if client is None:
+            return
+
+        for start in range(0, len(metric_data), MAX_METRIC_DATA_PER_CALL):
+            client.put_metric_data(
+                Namespace=NAMESPACE,
+                MetricData=metric_data[start:start + MAX_METRIC_DATA_PER_CALL],
+            )
+    except Exception:
+        # Silently fail - metrics should never crash the application
+        pass
+
+
+def _series_key(metric_name, unit, dimensions) -> tuple:
+    return (
+        metric_name,
+        unit,
+        tuple((k, str(v)) for k, v in dimensions.items()) if dimensions else (),
+    )
+
+
+def _buffer_metric(buffer, metric_name, value, unit, dimensions) -> None:
+    values = buffer.setdefault(_series_key(metric_name, unit, dimensions), {})
+    values[value] = values.get(value, 0) + 1
+
+
+def _emf_documents(series: dict) -> list:
+    """
+    Pack buffered series into as few EMF documents as possible.
+
+    Everything normally fits in one document. A series needs a new document
+    only when its metric name is already used there, or when one of its
+    dimensions already holds a different value (for example per-query
+    timings for several different queries).
+    """
+    chunks = []
+    for (metric_name, unit, dimensions), values in series.items():
+        expanded = [value for value, count in values.items() for _ in range(count)]
+        for start in range(0, len(expanded), MAX_EMF_VALUES_PER_METRIC):
+            chunks.append((metric_name, unit, dimensions, expanded[start:start + MAX_EMF_VALUES_PER_METRIC]))
+
+    timestamp = int(time.time() * 1000)
+    documents = []
+    for metric_name, unit, dimensions, values in chunks:
+        for document in documents:
+            if metric_name in document or any(document.get(k, v) != v for k, v in dimensions):
+                continue
+            break
+        else:
+            document = {"_aws": {"Timestamp": timestamp, "CloudWatchMetrics": []}}
+            documents.append(document)
+
+        document.update(dimensions)
+        document[metric_name] = values if len(values) > 1 else values[0]
+
+        dimension_set = [k for k, _ in dimensions]
+        directives = document["_aws"]["CloudWatchMetrics"]
+        directive = next((d for d in directives if d["Dimensions"] == [dimension_set]), None)
+        if directive is None:
+            directive = {"Namespace": NAMESPACE, "Dimensions": [dimension_set], "Metrics": []}
+            directives.append(directive)
+        directive["Metrics"].append({"Name": metric_name, "Unit": unit})
+    return documents
+
+
+def _write_emf(series: dict) -> None:
+    try:
+        lines = "".join(json.dumps(document) + "\n" for document in _emf_documents(series))
+        sys.stdout.write(lines)
+    except Exception:
+        # Silently fail - metrics should never crash the application
+        pass
+
+
 def put_metric(
     metric_name: str,
     value: float,
@@ -37,31 +184,169 @@ def put_metric(
         unit: CloudWatch unit (e.g., "Count", "Milliseconds", "None"). Default: "None"
         dimensions: Optional dict of dimension names to values
 
+    Buffered until flush_metrics() when called inside @buffered_metrics.
     Silently handles exceptions to ensure metrics never crash the app.
     """
-    try:
-        client = _get_cloudwatch_client()
-        if client is None:
-            return
+    buffer = getattr(_state, "buffer", None)
+    if buffer is not None:
+        _buffer_metric(buffer, metric_name, value, unit, dimensions)
+        return
 
-        metric_data = {
-            "MetricName": metric_name,
-            "Value": value,
-            "Unit": unit,
-        }
-
-        if dimensions:
-            metric_data["Dimensions"] = [
-                {"Name": k, "Value": str(v)} for k, v in dimensions.items()
-            ]
-
-        client.put_metric_data(
-            Namespace="DietTracker",
-            MetricData=[metric_data],
-        )
-    except Exception:
-        # Silently fail - metrics should never crash the application
-        pass
+    if METRICS_BACKEND == "emf":
+        _write_emf({_series_key(metric_name, unit, dimensions): {value: 1}})
+        return
+
+    _send([_metric_datum(metric_name, value, unit, dimensions)])
+
+
+def put_metrics(
+    metrics: List[Tuple[str, float, str, Optional[Dict[str, str]]]],
+) -> None:
+    """
+    Push several data points in as few PutMetricData calls as possible.
+
+    Args:
+        metrics: List of (metric_name, value, unit, dimensions) tuples
+
+    Buffered until flush_metrics() when called inside @buffered_metrics.
+    Silently handles exceptions to ensure metrics never crash the app.
+    """
+    if not metrics:
+        return
+
+    buffer = getattr(_state, "buffer", None)
+    if buffer is not None:
+        for metric in metrics:
+            _buffer_metric(buffer, *metric)
+        return
+
+    if METRICS_BACKEND == "emf":
+        series = {}
+        for metric in metrics:
+            _buffer_metric(series, *metric)
+        _write_emf(series)
+        return
+
+    _send([_metric_datum(*metric) for metric in metrics])
+
+
+def flush_metrics() -> None:
+    """
+    Send everything buffered for the current invocation and clear the buffer.
+
+    Each (name, unit, dimensions) series becomes one datum with Values/Counts
+    arrays (split every MAX_VALUES_PER_DATUM distinct values). In EMF mode
+    the whole buffer is written as a single document where possible.
+    """
+    buffer = getattr(_state, "buffer", None)
+    if not buffer:
+        return
+    _state.buffer = {}
+    if METRICS_BACKEND == "none":
+        return
+
+    if METRICS_BACKEND == "emf":
+        _write_emf(buffer)
+        return
+
+    metric_data = []
+    for (metric_name, unit, dimensions), values in buffer.items():
+        items = list(values.items())
+        for start in range(0, len(items), MAX_VALUES_PER_DATUM):
+            chunk = items[start:start + MAX_VALUES_PER_DATUM]
+            datum = {
+                "MetricName": metric_name,
+                "Unit": unit,
+                "Values": [value for value, _ in chunk],
+                "Counts": [count for _, count in chunk],
+            }
+            if dimensions:
+                datum["Dimensions"] = _dimension_list(dimensions)
+            metric_data.append(datum)
+
+    _send(metric_data)
+
+
+def buffered_metrics(func):
+    """
+    Decorator for handler entry points: buffer metrics for the invocation
+    and flush them once when it returns or raises.
+
+    Nested decorated calls share the outermost buffer and flush with it.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        depth = getattr(_state, "depth", 0)
+        if depth == 0:
+            _state.buffer = {}
+        _state.depth = depth + 1
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _state.depth = depth
+            if depth == 0:
+                try:
+                    flush_metrics()
+                finally:
+                    _state.buffer = None
+    return wrapper
+
+
+def record_init_timing(metric_name: str, milliseconds: float) -> None:
+    """
+    Record a one-off init timing, published by the next cold_start_metrics
+    invocation. Only the first value recorded for a name is kept.
+    """
+    with _pending_init_timings_lock:
+        _pending_init_timings.setdefault(metric_name, milliseconds)
+
+
+def cold_start_metrics(lambda_name: str):
+    """
+    Decorator for handler entry points: publish cold start and init timings.
+
+    Every invocation publishes ColdStart (1 for the first invocation of the
+    container, 0 afterwards). The cold invocation also publishes
+    InitDuration and InitToFirstRequest. The decorator is applied when the
+    handler module finishes loading, so that moment marks the end of init.
+    Any timings passed to record_init_timing() are published by the next
+    invocation. All metrics carry a Lambda dimension.
+    """
+    def decorator(func):
+        init_finished_ns = time.perf_counter_ns()
+        dimensions = {"Lambda": lambda_name}
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            global _cold_start, _pending_init_timings
+            metrics = [("ColdStart", 1 if _cold_start else 0, "Count", dimensions)]
+            if _cold_start:
+                _cold_start = False
+                metrics.append((
+                    "InitDuration",
+                    (init_finished_ns - _init_started_ns) / 1_000_000,
+                    "Milliseconds",
+                    dimensions,
+                ))
+                metrics.append((
+                    "InitToFirstRequest",
+                    (time.perf_counter_ns() - init_finished_ns) / 1_000_000,
+                    "Milliseconds",
+                    dimensions,
+                ))
+            try:
+                return func(*args, **kwargs)
+            finally:
+                # Timings recorded during init or by this invocation's first
+                # connect; swapped out whole so concurrent invocations (local
+                # server threads) never publish or pop the same one
+                with _pending_init_timings_lock:
+                    pending, _pending_init_timings = _pending_init_timings, {}
+                for metric_name, milliseconds in pending.items():
+                    metrics.append((metric_name, milliseconds, "Milliseconds", dimensions))
+                put_metrics(metrics)
+        return wrapper
+    return decorator
 
 
 def put_count(metric_name: str, dimensions: Optional[Dict[str, str]] = None) -> None:
@@ -105,9 +390,89 @@ def timer(metric_name: str, dimensions: Optional[Dict[str, str]] = None):
             # do work
             pass
     """
-    start_time = time.time()
+    start_ns = time.perf_counter_ns()
     try:
         yield
     finally:
-        elapsed_ms = (time.time() - start_time) * 1000
+        elapsed_ms = (time.perf_counter_ns() - start_ns) / 1_000_000
         put_latency(metric_name, elapsed_ms, dimensions=dimensions)
+
+
+@contextmanager
+def profile_phases(dimensions: Optional[Dict[str, str]] = None):
+    """
+    Collect phase() timings for one request.
+
+    On exit each phase is published as RequestPhaseLatency, with a Phase
+    dimension added to the given dimensions. While active, response()
+    reports the same timings in a Server-Timing header.
+
+    Usage:
+        with profile_phases(dimensions={"Lambda": "meals"}):
+            with phase("parse"):
+                body = json.loads(raw)
+    """
+    _state.phases = {}
+    _state.phase_stack = []
+    try:
+        yield
+    finally:
+        phases = _state.phases
+        _state.phases = None
+        _state.phase_stack = None
+        for name, elapsed_ns in phases.items():
+            put_latency(
+                "RequestPhaseLatency",
+                elapsed_ns / 1_000_000,
+                dimensions={**(dimensions or {}), "Phase": name},
+            )
+
+
+@contextmanager
+def phase(name: str):
+    """
+    Attribute the time spent in the block to a named request phase.
+
+    Phases are exclusive: time spent in a nested phase is not counted again
+    in the enclosing one. A no-op outside profile_phases().
+    """
+    stack = getattr(_state, "phase_stack", None)
+    if stack is None:
+        yield
+        return
+
+    frame = [time.perf_counter_ns(), 0]  # start, time spent in nested phases
+    stack.append(frame)
+    try:
+        yield
+    finally:
+        stack.pop()
+        total_ns = time.perf_counter_ns() - frame[0]
+        phases = _state.phases
+        phases[name] = phases.get(name, 0) + total_ns - frame[1]
+        if stack:
+            stack[-1][1] += total_ns
+
+
+def timed_phase(name: str):
+    """Decorator form of phase() with no overhead outside profile_phases()."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if getattr(_state, "phase_stack", None) is None:
+                return func(*args, **kwargs)
+            with phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def in_phase() -> bool:
+    """True when called from inside an open phase() block."""
+    return bool(getattr(_state, "phase_stack", None))
+
+
+def phase_timings() -> Dict[str, int]:
+    """Phase name -> accumulated nanoseconds for the current request."""
+    phases = getattr(_state, "phases", None)
+    return dict(phases) if phases else {}
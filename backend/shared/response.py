@@ -1,23 +1,157 @@
+import base64
+import gzip
 import json
 import os
+import threading
+from contextlib import contextmanager
 from decimal import Decimal
 
+import orjson
+
+try:
+    import brotli
+except ImportError:  # optional; only gzip is offered without it
+    brotli = None
+
+from backend.shared.metrics import phase, phase_timings
+from backend.shared.validation import get_header
+
 ALLOWED_ORIGIN = os.environ.get("ALLOWED_ORIGIN", "http://localhost:5173")
 
+# Bodies below this many bytes are sent uncompressed; see
+# backend/tests/benchmarks/test_response_compression.py for the trade-off
+COMPRESSION_MIN_BYTES = int(os.environ.get("COMPRESSION_MIN_BYTES", "1024"))
+CONTENT_CODINGS = ("br", "gzip")
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+
+# Content codings response() may use for the current request, best first;
+# set by negotiate_encoding()
+_negotiation = threading.local()
+
 
 def _json_default(value):
     if isinstance(value, Decimal):
         return float(round(value, 2))
     raise TypeError(f"Object of type {value.__class__.__name__} is not JSON serializable")
 
-def response(status_code, body):
-    return {
+
+# NUMERIC columns already arrive as rounded floats (see backend.shared.db), so
+# _json_default only sees the occasional Decimal built in Python. The stdlib
+# encoder only handles what orjson rejects, and like orjson leaves non-ASCII
+# text unescaped.
+_json_encode = json.JSONEncoder(default=_json_default, separators=(",", ":"), ensure_ascii=False).encode
+
+
+def _dumps(body):
+    try:
+        return orjson.dumps(body, default=_json_default).decode()
+    except TypeError:
+        # e.g. integers wider than 64 bits or non-string keys
+        return _json_encode(body)
+
+
+def _accepted_codings(accept_encoding):
+    """Codings we can produce that an Accept-Encoding value allows, best first."""
+    weights = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        weight = 1.0
+        params = params.strip().lower()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding] = weight
+
+    default = weights.get("*", 0.0)
+    supported = CONTENT_CODINGS if brotli is not None else ("gzip",)
+    ranked = sorted(supported, key=lambda coding: -weights.get(coding, default))
+    return tuple(coding for coding in ranked if weights.get(coding, default) > 0)
+
+
+def _compress(data, coding):
+    if coding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+@contextmanager
+def negotiate_encoding(event):
+    """Compress large response() bodies inside the block as the request's Accept-Encoding allows."""
+    previous = getattr(_negotiation, "codings", None)
+    _negotiation.codings = _accepted_codings(get_header(event, "Accept-Encoding") or "")
+    try:
+        yield
+    finally:
+        _negotiation.codings = previous
+
+
+def _server_timing(timings):
+    return ", ".join(
+        f"{name};dur={elapsed_ns / 1_000_000:.3f}" for name, elapsed_ns in timings.items()
+    )
+
+
+def _headers(etag):
+    headers = {
+        "Content-Type": "application/json",
+        "Access-Control-Allow-Origin": ALLOWED_ORIGIN,
+        "Access-Control-Allow-Headers": "Authorization,Content-Type,If-None-Match",
+        "Access-Control-Allow-Methods": "GET,POST,PUT,DELETE,OPTIONS"
+    }
+    if etag:
+        # Let the browser store the response but revalidate it every time
+        headers["ETag"] = etag
+        headers["Cache-Control"] = "private, no-cache"
+        headers["Access-Control-Expose-Headers"] = "ETag"
+    return headers
+
+
+def response(status_code, body, etag=None):
+    headers = _headers(etag)
+
+    with phase("serialize"):
+        payload = _dumps(body) if body is not None else ""
+
+    result = {
         "statusCode": status_code,
-        "headers": {
-            "Content-Type": "application/json",
-            "Access-Control-Allow-Origin": ALLOWED_ORIGIN,
-            "Access-Control-Allow-Headers": "Authorization,Content-Type",
-            "Access-Control-Allow-Methods": "GET,POST,PUT,DELETE,OPTIONS"
-        },
-        "body": json.dumps(body, default=_json_default) if body is not None else ""
+        "headers": headers,
+        "body": payload
+    }
+
+    # Only inside negotiate_encoding(); small bodies aren't worth the CPU
+    codings = getattr(_negotiation, "codings", None)
+    if codings is not None and len(payload) >= COMPRESSION_MIN_BYTES:
+        headers["Vary"] = "Accept-Encoding"
+        if codings:
+            coding = codings[0]
+            with phase("compress"):
+                compressed = _compress(payload.encode(), coding)
+                result["body"] = base64.b64encode(compressed).decode("ascii")
+            result["isBase64Encoded"] = True
+            headers["Content-Encoding"] = coding
+            if etag:
+                # A strong ETag names one exact byte sequence, so each coding gets its own
+                headers["ETag"] = f'{etag[:-1]}-{coding}"'
+
+    # Per-phase breakdown when the handler is profiling the request
+    timings = phase_timings()
+    if timings:
+        headers["Server-Timing"] = _server_timing(timings)
+        headers["Timing-Allow-Origin"] = ALLOWED_ORIGIN
+
+    return result
+
+
+def not_modified(etag):
+    """304 for a matching If-None-Match: headers only, no body to serialize."""
+    return {
+        "statusCode": 304,
+        "headers": _headers(etag),
+        "body": ""
     }
@@ -0,0 +1,103 @@
+"""
+Table-driven request routing for the API Lambdas.
+
+Each handler module builds a Router, registers its (resource, method) routes
+and exports router.handler as the Lambda entry point. Dispatch is a single
+dict lookup, and every request runs through the same middleware: log context,
+RequestCount / RequestLatency, query, connection and phase metrics, response
+compression, ErrorCount for invalid requests, unknown routes and unhandled
+exceptions, and one metric and log flush when the invocation ends.
+"""
+import re
+
+from backend.shared.db import connection_metrics, track_queries
+from backend.shared.logging import get_logger, log_context, queued_logs, request_log_fields
+from backend.shared.metrics import (
+    buffered_metrics,
+    cold_start_metrics,
+    profile_phases,
+    put_count,
+    put_metric,
+    timer,
+)
+from backend.shared.response import negotiate_encoding, response
+
+
+class Router:
+    """Routes API Gateway proxy events of one Lambda to endpoint functions."""
+
+    def __init__(self, lambda_name, logger=None):
+        self.lambda_name = lambda_name
+        self.logger = logger or get_logger(__name__)
+        # (resource, method) -> endpoint(event)
+        self.routes = {}
+        # [(compiled path pattern, resource)], built on first match()
+        self._patterns = None
+        self._lambda_dimensions = {"Lambda": lambda_name}
+        # Wrapped while the handler module is imported, so cold_start_metrics
+        # marks the end of init at the right moment
+        self.handler = queued_logs(buffered_metrics(cold_start_metrics(lambda_name)(self._handle)))
+
+    def add(self, method, resource, endpoint):
+        """Register endpoint(event) for a method on an API Gateway resource path."""
+        self.routes[(resource, method)] = endpoint
+        self._patterns = None
+
+    def include(self, other):
+        """Register every route of another Router."""
+        self.routes.update(other.routes)
+        self._patterns = None
+
+    def match(self, path):
+        """
+        (resource, path parameters) for a concrete request path such as
+        /meals/<id>, or (path, None) when no registered resource matches.
+        Literal segments win over parameters, as in API Gateway.
+        """
+        patterns = self._patterns
+        if patterns is None:
+            patterns = []
+            resources = {resource for resource, _ in self.routes}
+            for resource in sorted(resources, key=lambda resource: (resource.count("{"), resource)):
+                regex = re.sub(r"\\\{(\w+)\\\}", r"(?P<\1>[^/]+)", re.escape(resource))
+                patterns.append((re.compile(f"^{regex}$"), resource))
+            self._patterns = patterns
+        for pattern, resource in patterns:
+            found = pattern.match(path)
+            if found:
+                return resource, found.groupdict() or None
+        return path, None
+
+    def _handle(self, event, context):
+        method = event.get("httpMethod")
+        resource = event.get("resource")
+
+        dimensions = {"Lambda": self.lambda_name, "Endpoint": resource or "unknown"}
+
+        with log_context(**request_log_fields(event, context, self.lambda_name)), \
+                timer("RequestLatency", dimensions=dimensions), \
+                track_queries(dimensions=dimensions), \
+                connection_metrics(dimensions=self._lambda_dimensions), \
+                profile_phases(dimensions=dimensions), \
+                negotiate_encoding(event):
+            put_count("RequestCount", dimensions=dimensions)
+
+            if not method or not resource:
+                self.logger.info("Invalid request", extra={"method": method, "resource": resource})
+                put_metric("ErrorCount", 1, unit="Count", dimensions=self._lambda_dimensions)
+                return response(400, {"error": "Invalid request"})
+
+            endpoint = self.routes.get((resource, method))
+            if endpoint is None:
+                self.logger.warning("Route not found", extra={"method": method, "resource": resource})
+                put_metric("ErrorCount", 1, unit="Count", dimensions=self._lambda_dimensions)
+                return response(404, {"error": "Not Found"})
+
+            try:
+                return endpoint(event)
+            except Exception as e:
+                self.logger.exception(
+                    "Handler exception", extra={"method": method, "resource": resource, "error": str(e)}
+                )
+                put_metric("ErrorCount", 1, unit="Count", dimensions=self._lambda_dimensions)
+                raise
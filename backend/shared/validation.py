@@ -1,6 +1,9 @@
+import base64
 import re
 from datetime import datetime
 
+from backend.shared.metrics import timed_phase
+
 UUID_PATTERN = re.compile(
     r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$",
     re.IGNORECASE
@@ -13,10 +16,12 @@ MAX_CALORIES = 100000  # 100k calories per unit is extremely high
 MAX_QUANTITY = 10000   # Max quantity per ingredient or meal log
 
 
+@timed_phase("validate")
 def is_valid_uuid(value):
     return bool(value and UUID_PATTERN.match(value))
 
 
+@timed_phase("validate")
 def is_valid_date(value):
     if not value or not isinstance(value, str):
         return False
@@ -37,6 +42,53 @@ def get_path_param(event, param_name):
     return path_params.get(param_name)
 
 
+def parse_fields(params, allowed):
+    """
+    Parse a comma-separated ?fields= value against an allowlist.
+    Returns (fields, error message or None); all allowed fields when absent.
+    Fields come back in allowlist order, so equivalent requests share one
+    SQL shape.
+    """
+    value = params.get("fields")
+    if value is None:
+        return tuple(allowed), None
+    requested = {field.strip() for field in value.split(",") if field.strip()}
+    if not requested:
+        return None, "fields must name at least one field"
+    unknown = requested.difference(allowed)
+    if unknown:
+        return None, f"Unknown fields: {', '.join(sorted(unknown))}"
+    return tuple(field for field in allowed if field in requested), None
+
+
+def get_header(event, name):
+    """Case-insensitive request header lookup; None if the header is absent."""
+    headers = event.get("headers")
+    if not headers:
+        return None
+    value = headers.get(name)
+    if value is None:
+        name = name.lower()
+        for key, candidate in headers.items():
+            if key.lower() == name:
+                return candidate
+    return value
+
+
+def get_body(event):
+    """
+    The request body as text; None if there is none.
+    Decodes bodies API Gateway base64-encoded (isBase64Encoded), which it does
+    for every request once the binary media types include */*. Raises
+    ValueError when such a body is not valid base64 UTF-8.
+    """
+    body = event.get("body")
+    if body and event.get("isBase64Encoded"):
+        return base64.b64decode(body, validate=True).decode("utf-8")
+    return body
+
+
+@timed_phase("validate")
 def validate_string_length(value, max_length, field_name):
     """Validate string is not empty and within max length. Returns error message or None."""
     if not value or not isinstance(value, str):
@@ -46,6 +98,7 @@ def validate_string_length(value, max_length, field_name):
     return None
 
 
+@timed_phase("validate")
 def validate_calories(value):
     """Validate calories is a non-negative integer within bounds. Returns error message or None."""
     if value is None:
@@ -59,6 +112,7 @@ def validate_calories(value):
     return None
 
 
+@timed_phase("validate")
 def validate_quantity(value, field_name="quantity"):
     """Validate quantity is a positive number within bounds. Returns error message or None."""
     if value is None:
@@ -72,6 +126,7 @@ def validate_quantity(value, field_name="quantity"):
     return None
 
 
+@timed_phase("validate")
 def validate_int_quantity(value, field_name="quantity"):
     """Validate quantity is a positive integer within bounds. Returns error message or None."""
     if value is None:
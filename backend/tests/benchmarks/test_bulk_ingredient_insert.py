@@ -0,0 +1,92 @@
+"""Bulk ingredient import: POST /ingredients/bulk versus N POST /ingredients.
+
+Both paths run the real endpoint code against a fake connection that sleeps
+for one database round trip per statement, so the measurement is dominated by
+round trips, as it is against RDS. The N single inserts are timed within one
+warm invocation; in production each is also its own API Gateway request and
+Lambda invocation, which this leaves out.
+
+Run with `-s` to see the timings.
+
+Environment variables:
+  BULK_BENCH_ITEMS: Ingredients per import (default 500)
+  BULK_BENCH_RTT_MS: Simulated round trip per statement (default 1.0)
+"""
+
+import json
+import os
+import time
+
+from backend.lambdas.meals import ingredients as ingredients_module
+
+BULK_BENCH_ITEMS = int(os.environ.get("BULK_BENCH_ITEMS", "500"))
+BULK_BENCH_RTT_MS = float(os.environ.get("BULK_BENCH_RTT_MS", "1.0"))
+
+PANTRY = [
+    {"name": f"Pantry item {i}", "calories_per_unit": i % 900 + 0.5, "unit": "g"}
+    for i in range(BULK_BENCH_ITEMS)
+]
+
+
+class _RoundTripCursor:
+    def __init__(self, conn):
+        self._conn = conn
+
+    def execute(self, query, params=None, name=None):
+        self._conn.statements += 1
+        time.sleep(BULK_BENCH_RTT_MS / 1000)
+
+    def fetchone(self):
+        return (1, 1)
+
+    def close(self):
+        pass
+
+
+class _RoundTripConnection:
+    def __init__(self):
+        self.statements = 0
+
+    def cursor(self):
+        return _RoundTripCursor(self)
+
+    def commit(self):
+        self.statements += 1
+        time.sleep(BULK_BENCH_RTT_MS / 1000)
+
+    def rollback(self):
+        pass
+
+
+def _event(body):
+    return {
+        "httpMethod": "POST",
+        "body": json.dumps(body),
+        "requestContext": {"authorizer": {"claims": {"sub": "bench-user"}}},
+    }
+
+
+def _run(monkeypatch, import_pantry):
+    conn = _RoundTripConnection()
+    monkeypatch.setattr(ingredients_module, "get_connection", lambda: conn)
+    monkeypatch.setattr(ingredients_module, "release_connection", lambda conn: None)
+    start = time.perf_counter()
+    statuses = import_pantry()
+    return statuses, conn.statements, (time.perf_counter() - start) * 1000
+
+
+def test_bulk_import_beats_single_inserts(monkeypatch):
+    single_statuses, single_statements, single_ms = _run(monkeypatch, lambda: [
+        ingredients_module.create_ingredient(_event(item))["statusCode"] for item in PANTRY
+    ])
+    bulk_statuses, bulk_statements, bulk_ms = _run(monkeypatch, lambda: [
+        ingredients_module.bulk_create_ingredients(_event({"ingredients": PANTRY}))["statusCode"]
+    ])
+
+    print(f"\n{BULK_BENCH_ITEMS} ingredients, {BULK_BENCH_RTT_MS:g} ms per round trip")
+    print(f"  single inserts {single_statements:>5} round trips {single_ms:>9.1f} ms")
+    print(f"  bulk insert    {bulk_statements:>5} round trips {bulk_ms:>9.1f} ms ({single_ms / bulk_ms:.0f}x)")
+
+    assert set(single_statuses) == {201} and bulk_statuses == [201]
+    assert bulk_statements == 2
+    assert bulk_ms < single_ms
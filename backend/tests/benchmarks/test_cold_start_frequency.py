@@ -0,0 +1,117 @@
+"""Cold-start frequency: per-domain Lambdas versus the single "api" function.
+
+Replays a synthetic day of traffic through a simple model of Lambda
+containers and counts cold starts for both deployment layouts. Routes are
+mapped to functions through the handlers' own route tables, so the split
+layout always matches what is deployed.
+
+Traffic follows loadtests/locustfile.py: sessions start at random (Poisson)
+times, each makes a handful of requests 1-3 s apart, and each request picks a
+route with the locustfile task weights.
+
+Container model: one request at a time per container; a request reuses any
+idle container that has been idle for less than the keep-warm window,
+otherwise it starts a new one (a cold start).
+
+Run with `-s` to see the cold starts per function.
+
+Environment variables:
+  COLD_START_SESSIONS_PER_HOUR: Mean session arrival rate (default 6)
+  COLD_START_IDLE_MINUTES: Keep-warm window of an idle container (default 10)
+"""
+
+import os
+import random
+from collections import Counter
+
+from backend.lambdas.api.handler import router as api_router
+from backend.lambdas.meals.handler import router as meals_router
+from backend.lambdas.meal_logs.handler import router as meal_logs_router
+from backend.lambdas.summary.handler import router as summary_router
+from backend.lambdas.users.handler import router as users_router
+
+COLD_START_SESSIONS_PER_HOUR = float(os.environ.get("COLD_START_SESSIONS_PER_HOUR", "6"))
+COLD_START_IDLE_MINUTES = float(os.environ.get("COLD_START_IDLE_MINUTES", "10"))
+
+REQUEST_SECONDS = 0.15
+SIMULATED_HOURS = 24
+
+# (resource, method) -> locustfile task weight
+TRAFFIC_MIX = {
+    ("/ingredients", "GET"): 5,
+    ("/meals", "GET"): 5,
+    ("/meal-logs", "GET"): 3,
+    ("/daily-summary", "GET"): 5,
+    ("/users/me", "GET"): 1,
+    ("/ingredients", "POST"): 2,
+    ("/meals", "POST"): 2,
+    ("/meal-logs", "POST"): 2,
+    ("/meal-logs/{id}", "DELETE"): 1,
+}
+
+SPLIT_LAYOUT = {
+    route: router.lambda_name
+    for router in (meals_router, meal_logs_router, summary_router, users_router)
+    for route in router.routes
+}
+
+
+def _replay_traffic(seed=7):
+    """[(seconds since start, (resource, method))] for one simulated day."""
+    rng = random.Random(seed)
+    routes = list(TRAFFIC_MIX)
+    weights = list(TRAFFIC_MIX.values())
+
+    requests = []
+    t = 0.0
+    while True:
+        t += rng.expovariate(COLD_START_SESSIONS_PER_HOUR / 3600)
+        if t > SIMULATED_HOURS * 3600:
+            break
+        at = t
+        for route in rng.choices(routes, weights, k=rng.randint(3, 12)):
+            requests.append((at, route))
+            at += rng.uniform(1, 3)
+    requests.sort()
+    return requests
+
+
+def _cold_starts(requests, function_for):
+    """Cold starts per function when each request is served by function_for(route)."""
+    idle_window = COLD_START_IDLE_MINUTES * 60
+    # function -> [busy-until time] of each container still alive
+    containers = {}
+    cold = Counter()
+    for at, route in requests:
+        function = function_for(route)
+        alive = [busy_until for busy_until in containers.get(function, []) if at - busy_until < idle_window]
+        idle = [busy_until for busy_until in alive if busy_until <= at]
+        if idle:
+            alive.remove(max(idle))
+        else:
+            cold[function] += 1
+        alive.append(at + REQUEST_SECONDS)
+        containers[function] = alive
+    return cold
+
+
+def test_every_replayed_route_is_served_by_both_layouts():
+    for route in TRAFFIC_MIX:
+        assert route in SPLIT_LAYOUT
+        assert route in api_router.routes
+
+
+def test_monolith_cold_starts_less_often():
+    requests = _replay_traffic()
+
+    split = _cold_starts(requests, SPLIT_LAYOUT.__getitem__)
+    monolith = _cold_starts(requests, lambda route: api_router.lambda_name)
+
+    print(f"\n{len(requests)} requests over {SIMULATED_HOURS}h, "
+          f"{COLD_START_SESSIONS_PER_HOUR:g} sessions/h, {COLD_START_IDLE_MINUTES:g} min keep-warm")
+    for function, count in sorted(split.items()):
+        print(f"  split {function:<10} {count:>5} cold starts")
+    print(f"  split total      {sum(split.values()):>5} ({sum(split.values()) / len(requests):.1%} of requests)")
+    print(f"  monolith api     {monolith['api']:>5} ({monolith['api'] / len(requests):.1%} of requests)")
+
+    assert monolith["api"] < sum(split.values())
@@ -0,0 +1,72 @@
+"""Import-time budget for the Lambda entry points.
+
+Each handler module is imported in a fresh interpreter under
+`python -X importtime`. The test fails if the cumulative import time exceeds
+the budget, or if a heavy dependency (boto3, psycopg2) is loaded during init
+instead of on first use.
+
+Environment variables:
+  IMPORT_BUDGET_MS: Per-handler budget in milliseconds (default 150)
+"""
+
+import functools
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parents[3]
+
+IMPORT_BUDGET_MS = float(os.environ.get("IMPORT_BUDGET_MS", "150"))
+
+HANDLERS = [
+    "backend.lambdas.meals.handler",
+    "backend.lambdas.meal_logs.handler",
+    "backend.lambdas.summary.handler",
+    "backend.lambdas.users.handler",
+    "backend.lambdas.daily_summaries_batch.handler",
+    "backend.lambdas.api.handler",
+]
+
+LAZY_DEPENDENCIES = {"boto3", "botocore", "psycopg2"}
+
+
+@functools.lru_cache(maxsize=None)
+def _import_profile(module):
+    """Return {module name: cumulative microseconds} for a cold import."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    profile = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            profile[name.strip()] = int(cumulative)
+    return profile
+
+
+@pytest.mark.parametrize("module", HANDLERS)
+def test_handler_import_within_budget(module):
+    profile = _import_profile(module)
+
+    elapsed_ms = profile[module] / 1000
+    assert elapsed_ms <= IMPORT_BUDGET_MS, (
+        f"{module} took {elapsed_ms:.1f}ms to import (budget {IMPORT_BUDGET_MS:.0f}ms)"
+    )
+
+
+@pytest.mark.parametrize("module", HANDLERS)
+def test_handler_defers_heavy_dependencies(module):
+    profile = _import_profile(module)
+
+    loaded = {name.split(".")[0] for name in profile} & LAZY_DEPENDENCIES
+    assert not loaded, f"{module} imports {sorted(loaded)} during init"
@@ -0,0 +1,111 @@
+"""Throughput of synchronous vs queued logging under a multithreaded server.
+
+A local ThreadingHTTPServer logs LOG_BENCH_LINES structured INFO lines per
+request, the way a handler does, while a pool of client threads keeps it
+busy. The same load runs once with a StreamHandler writing on the request
+thread and once with DeferredQueueHandler + QueueListener. Run with `-s` to
+see, for each mode, requests per second (including draining the queue) and
+the time each request spends logging before it can respond.
+
+Environment variables:
+  LOG_BENCH_REQUESTS: Requests per mode (default 400)
+  LOG_BENCH_LINES: Log lines per request (default 20)
+  LOG_BENCH_CLIENTS: Concurrent client threads (default 8)
+"""
+
+import http.client
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from backend.shared.logging import DeferredQueueHandler, JSONFormatter, StructuredLogger
+
+LOG_BENCH_REQUESTS = int(os.environ.get("LOG_BENCH_REQUESTS", "400"))
+LOG_BENCH_LINES = int(os.environ.get("LOG_BENCH_LINES", "20"))
+LOG_BENCH_CLIENTS = int(os.environ.get("LOG_BENCH_CLIENTS", "8"))
+
+
+def _serve(logger, logging_times):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            start = time.perf_counter()
+            for i in range(LOG_BENCH_LINES):
+                logger.info("Fetched meals", extra={"user_id": "a1b2c3", "line_no": i})
+            logging_times.append(time.perf_counter() - start)
+            self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _run_load(port):
+    per_client = LOG_BENCH_REQUESTS // LOG_BENCH_CLIENTS
+
+    def client():
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        for _ in range(per_client):
+            conn.request("GET", "/meals")
+            conn.getresponse().read()
+        conn.close()
+
+    with ThreadPoolExecutor(LOG_BENCH_CLIENTS) as pool:
+        for future in [pool.submit(client) for _ in range(LOG_BENCH_CLIENTS)]:
+            future.result()
+    return per_client * LOG_BENCH_CLIENTS
+
+
+def _measure(path, queued):
+    """Return (requests per second, mean ms per request spent logging)."""
+    logger = StructuredLogger(f"bench.queue.{queued}")
+    with open(path, "w") as sink:
+        stream_handler = logging.StreamHandler(sink)
+        stream_handler.setFormatter(JSONFormatter())
+
+        listener = None
+        if queued:
+            log_queue = queue.Queue()
+            listener = logging.handlers.QueueListener(log_queue, stream_handler)
+            listener.start()
+            logger.addHandler(DeferredQueueHandler(log_queue))
+        else:
+            logger.addHandler(stream_handler)
+
+        logging_times = []
+        server = _serve(logger, logging_times)
+        try:
+            start = time.perf_counter()
+            requests = _run_load(server.server_address[1])
+            if listener:
+                # Same as flush_logs(): every record written before we stop the clock
+                log_queue.join()
+            elapsed = time.perf_counter() - start
+        finally:
+            server.shutdown()
+            server.server_close()
+            if listener:
+                listener.stop()
+
+    with open(path) as written:
+        assert sum(1 for _ in written) == requests * LOG_BENCH_LINES
+    return requests / elapsed, sum(logging_times) / len(logging_times) * 1000
+
+
+def test_queued_vs_sync_logging_throughput(tmp_path):
+    sync_rps, sync_ms = _measure(tmp_path / "sync.log", queued=False)
+    queued_rps, queued_ms = _measure(tmp_path / "queued.log", queued=True)
+
+    print(f"\nlogging under load: sync {sync_rps:,.0f} req/s, {sync_ms:.3f}ms logging per request; "
+          f"queued {queued_rps:,.0f} req/s, {queued_ms:.3f}ms logging per request")
@@ -0,0 +1,83 @@
+"""Logging throughput micro-benchmark.
+
+Formats and writes the same INFO record through the previous
+dict-and-json.dumps formatter and through the current JSONFormatter, and
+reports records per second for each. Run with `-s` to see the numbers.
+
+Environment variables:
+  LOG_BENCH_RECORDS: Records per measurement (default 20000)
+"""
+
+import io
+import json
+import logging
+import os
+import time
+from datetime import datetime
+
+from backend.shared.logging import JSONFormatter, StructuredLogger
+
+LOG_BENCH_RECORDS = int(os.environ.get("LOG_BENCH_RECORDS", "20000"))
+
+
+class LegacyJSONFormatter(logging.Formatter):
+    """The formatter as it was before the fast path, kept as the baseline."""
+
+    def format(self, record):
+        log_data = {
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "function": record.funcName,
+            "line": record.lineno,
+        }
+        if hasattr(record, "extra_fields"):
+            log_data.update(record.extra_fields)
+        return json.dumps(log_data)
+
+
+class LegacyStructuredLogger(logging.Logger):
+    def _log(self, level, msg, args, exc_info=None, extra=None, stack_info=False):
+        extra_copy = dict(extra or {})
+        extra_copy.copy()
+        super()._log(level, msg, args, exc_info=exc_info,
+                     extra={"extra_fields": extra_copy}, stack_info=stack_info)
+
+
+def _records_per_second(logger_class, formatter):
+    logger = logger_class(f"bench.{logger_class.__name__}")
+    logger.setLevel(logging.INFO)
+    logger.addHandler(logging.StreamHandler(io.StringIO()))
+    logger.handlers[0].setFormatter(formatter)
+
+    extra = {"user_id": "a1b2c3", "meal_count": 12}
+    start = time.perf_counter()
+    for _ in range(LOG_BENCH_RECORDS):
+        logger.info("Fetched meals", extra=extra)
+    return LOG_BENCH_RECORDS / (time.perf_counter() - start)
+
+
+def test_logging_throughput(monkeypatch):
+    # The baseline also collected thread and process details on every record
+    with monkeypatch.context() as m:
+        for flag in ("logThreads", "logProcesses", "logMultiprocessing"):
+            m.setattr(logging, flag, True)
+        before = _records_per_second(LegacyStructuredLogger, LegacyJSONFormatter())
+    after = _records_per_second(StructuredLogger, JSONFormatter())
+
+    print(f"\nlogging: {before:,.0f} records/s before, {after:,.0f} records/s after ({after / before:.2f}x)")
+    assert after > before
+
+
+def test_disabled_level_is_cheap():
+    logger = StructuredLogger("bench.disabled")
+    logger.setLevel(logging.WARNING)
+
+    start = time.perf_counter()
+    for _ in range(LOG_BENCH_RECORDS):
+        logger.info("Fetched meals", extra={"user_id": "a1b2c3"})
+    per_call_us = (time.perf_counter() - start) / LOG_BENCH_RECORDS * 1e6
+
+    print(f"\nlogging: {per_call_us:.2f}us per filtered INFO call")
+    assert per_call_us < 5
@@ -0,0 +1,71 @@
+"""Compression benchmark: CPU spent versus bytes saved by response size.
+
+Builds meal-log list payloads of increasing size and, for each content coding
+response() can use, measures the time to compress and base64-encode the body
+and the size API Gateway receives. Run with `-s` to see the table; use it to
+pick COMPRESSION_MIN_BYTES. API Gateway decodes the base64 body before it goes
+out, so the client receives the compressed bytes.
+
+The assertion guards the default threshold: a body at COMPRESSION_MIN_BYTES
+must already shrink once compressed, even after base64 inflates it by a third.
+
+Environment variables:
+  COMPRESS_BENCH_ROUNDS: Compressions per measurement (default 200)
+"""
+
+import base64
+import os
+import time
+
+from backend.shared import response as response_module
+
+COMPRESS_BENCH_ROUNDS = int(os.environ.get("COMPRESS_BENCH_ROUNDS", "200"))
+
+ITEM_COUNTS = (2, 5, 10, 25, 50, 100, 500)
+
+
+def _payload(items):
+    meal_logs = [
+        {
+            "id": f"7c9e6679-7425-40de-944b-e07fc1f9{i:04d}",
+            "meal_id": f"9b2d1c7e-0d3f-4a8e-b1f2-3c4d5e6f{i % 20:04d}",
+            "date": f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}",
+            "quantity": 1 + i % 3,
+            "meal_name": f"Meal {i % 20}",
+            "meal_calories": round(250 + i * 7.3 % 600, 2),
+        }
+        for i in range(items)
+    ]
+    return response_module._dumps({"meal_logs": meal_logs}).encode()
+
+
+def _measure(data, coding):
+    start = time.perf_counter()
+    for _ in range(COMPRESS_BENCH_ROUNDS):
+        encoded = base64.b64encode(response_module._compress(data, coding))
+    elapsed_us = (time.perf_counter() - start) / COMPRESS_BENCH_ROUNDS * 1e6
+    return elapsed_us, len(base64.b64decode(encoded))
+
+
+def test_compression_cpu_versus_bytes():
+    codings = ["gzip"] + (["br"] if response_module.brotli is not None else [])
+
+    print(f"\n{'bytes':>8} " + " ".join(f"{coding + ' us':>10} {coding + ' bytes':>12}" for coding in codings))
+    for items in ITEM_COUNTS:
+        data = _payload(items)
+        cells = []
+        for coding in codings:
+            elapsed_us, size = _measure(data, coding)
+            cells.append(f"{elapsed_us:>10.1f} {size:>12}")
+        print(f"{len(data):>8} " + " ".join(cells))
+
+
+def test_threshold_body_shrinks_after_base64():
+    items = 1
+    while len(_payload(items)) < response_module.COMPRESSION_MIN_BYTES:
+        items += 1
+    data = _payload(items)
+
+    for coding in ["gzip"] + (["br"] if response_module.brotli is not None else []):
+        encoded = base64.b64encode(response_module._compress(data, coding))
+        assert len(encoded) < len(data)
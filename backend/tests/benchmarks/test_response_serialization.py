@@ -0,0 +1,68 @@
+"""Serialization benchmark for 100-item list responses.
+
+Compares the previous path with the current one for a list_ingredients-sized
+payload, starting from the NUMERIC text psycopg2 receives from the server:
+
+  before: Decimal typecast + json.dumps with a Decimal default callback
+  after:  float typecast (backend.shared.db) + response()
+
+Run with `-s` to see microseconds per response.
+
+Environment variables:
+  SERIALIZE_BENCH_ROUNDS: Responses per measurement (default 2000)
+"""
+
+import json
+import os
+import time
+from decimal import Decimal
+
+from backend.shared import db
+from backend.shared.response import response
+
+SERIALIZE_BENCH_ROUNDS = int(os.environ.get("SERIALIZE_BENCH_ROUNDS", "2000"))
+
+# (id, name, calories_per_unit, unit) as text, the way rows arrive on the wire
+ROWS = [
+    (f"7c9e6679-7425-40de-944b-e07fc1f9{i:04d}", f"Ingredient {i}", f"{i * 3.7 % 900:.2f}", "g")
+    for i in range(100)
+]
+
+
+def _legacy_default(value):
+    if isinstance(value, Decimal):
+        return float(round(value, 2))
+    raise TypeError
+
+
+def _before():
+    items = [
+        {"id": r[0], "name": r[1], "calories_per_unit": Decimal(r[2]), "unit": r[3]}
+        for r in ROWS
+    ]
+    return json.dumps({"ingredients": items}, default=_legacy_default)
+
+
+def _after():
+    items = [
+        {"id": r[0], "name": r[1], "calories_per_unit": db._numeric_to_float(r[2], None), "unit": r[3]}
+        for r in ROWS
+    ]
+    return response(200, {"ingredients": items})["body"]
+
+
+def _us_per_response(build):
+    start = time.perf_counter()
+    for _ in range(SERIALIZE_BENCH_ROUNDS):
+        build()
+    return (time.perf_counter() - start) / SERIALIZE_BENCH_ROUNDS * 1e6
+
+
+def test_list_payload_serialization():
+    assert json.loads(_before()) == json.loads(_after())
+
+    before = _us_per_response(_before)
+    after = _us_per_response(_after)
+
+    print(f"\nserialize 100 items: {before:.0f}us before, {after:.0f}us after ({before / after:.2f}x)")
+    assert after < before
@@ -10,12 +10,12 @@ class FakeCursor:
         self.executemany_calls = []
         self.raise_on_execute = raise_on_execute
 
-    def execute(self, query, params=None):
+    def execute(self, query, params=None, name=None):
         self.executed.append((query, params))
         if self.raise_on_execute:
             raise self.raise_on_execute
 
-    def executemany(self, query, params=None):
+    def executemany(self, query, params=None, name=None):
         self.executemany_calls.append((query, params))
         if self.raise_on_execute:
             raise self.raise_on_execute
@@ -82,3 +82,11 @@ def fake_cursor():
 @pytest.fixture
 def fake_connection(fake_cursor):
     return FakeConnection(fake_cursor)
+
+
+@pytest.fixture(autouse=True)
+def clear_user_id_cache():
+    from backend.shared.db import clear_user_id_cache as clear_cache
+    clear_cache()
+    yield
+    clear_cache()
@@ -21,7 +21,7 @@ class MockCursor:
         self._result_index = 0
         self.rowcount = 0
 
-    def execute(self, query, params=None):
+    def execute(self, query, params=None, name=None):
         self._results = []
         self._result_index = 0
 
@@ -35,7 +35,13 @@ class MockCursor:
             self._results = [(1,)]
             return
 
-        if query_normalized.startswith("INSERT"):
+        if query_normalized.startswith("WITH U AS"):
+            self._handle_user_cte(query_normalized, params)
+        elif query_normalized.startswith("WITH M AS"):
+            self._handle_meal_cte(query_normalized, params)
+        elif query_normalized.startswith("WITH TOTALS AS"):
+            self._handle_meal_totals(params)
+        elif query_normalized.startswith("INSERT"):
             self._handle_insert(query_normalized, params)
         elif query_normalized.startswith("SELECT"):
             self._handle_select(query_normalized, params)
@@ -103,15 +109,182 @@ class MockCursor:
             self._results = [(log_id,)]
             self.rowcount = 1
 
+    def _find_user(self, cognito_id):
+        for user in self._db["users"].values():
+            if user["cognito_user_id"] == cognito_id:
+                return user
+        return None
+
+    def _handle_user_cte(self, query_upper, params):
+        """
+        Statements that resolve the user inline:
+        WITH u AS (SELECT id FROM users WHERE cognito_user_id = %s) ...
+        Writes resolve it with UPDATE users ... RETURNING id, which bumps the
+        user's data_version.
+
+        Returns no rows when the user does not exist. Otherwise the per-user
+        statement is answered by the existing handlers and each row is
+        prefixed with the user id and, for reads, suffixed with the user's
+        data version (list endpoints return a single all-NULL row when the
+        user has no data).
+        """
+        user = self._find_user(params[0])
+        if user is None:
+            self._results = []
+            return
+        if "U AS ( UPDATE USERS" in query_upper:
+            user["data_version"] = user.get("data_version", 0) + 1
+        user_id = user["id"]
+        version = user.get("data_version", 0)
+        rest = tuple(params[1:])
+
+        if "INSERT INTO MEAL_LOGS" in query_upper:
+            meal_id, log_date, quantity = rest
+            self._handle_select("SELECT ID FROM MEALS WHERE ID = %S AND USER_ID = %S", (meal_id, user_id))
+            if not self._results:
+                self._results = [(user_id, None, None)]
+                return
+            self._handle_insert("INSERT INTO MEAL_LOGS", (user_id, meal_id, log_date, quantity))
+            self._results = [(user_id, meal_id, self._results[0][0])]
+            return
+
+        if "INSERT INTO INGREDIENTS" in query_upper:
+            for ing_id, name, calories, unit in zip(*rest):
+                self._db["ingredients"][ing_id] = {
+                    "id": ing_id,
+                    "user_id": user_id,
+                    "name": name,
+                    "calories_per_unit": calories,
+                    "unit": unit
+                }
+            self.rowcount = len(rest[0])
+            self._results = [(user_id, len(rest[0]))]
+            return
+
+        if "DELETE FROM MEAL_LOGS" in query_upper:
+            self._handle_delete("DELETE FROM MEAL_LOGS", (rest[0], user_id))
+            self._results = [(user_id, self.rowcount)]
+            return
+
+        if "DAILY_SUMMARIES" in query_upper:
+            # No pre-computed summaries in the mock: always the live total
+            self._handle_select("SELECT SUM( FROM MEAL_LOGS WHERE ML.DATE = %S", (user_id, rest[0]))
+            self._results = [(user_id, None, self._results[0][0], version)]
+            return
+
+        if "BETWEEN" in query_upper:
+            self._handle_select("SELECT SUM( FROM MEAL_LOGS WHERE BETWEEN", (user_id,) + rest)
+            width = 2
+        elif "FROM MEAL_LOGS ML" in query_upper:
+            self._handle_select("SELECT FROM MEAL_LOGS ML JOIN MEALS M", (user_id,) + rest)
+            width = 6
+        elif "FROM INGREDIENTS" in query_upper:
+            self._handle_select("SELECT FROM INGREDIENTS WHERE USER_ID", (user_id,) + rest)
+            width = 4
+        elif "FROM MEALS" in query_upper:
+            self._handle_select("SELECT FROM MEALS WHERE USER_ID = %S ORDER BY", (user_id,) + rest)
+            width = 4
+        else:
+            self._results = []
+            return
+
+        rows = self._results or [(None,) * width]
+        self._results = [(user_id,) + tuple(row) + (version,) for row in rows]
+
+    def _handle_meal_cte(self, query_upper, params):
+        """
+        Meal writes that include their meal_ingredients rows:
+        WITH m AS (INSERT INTO meals ... | UPDATE meals ...) ...
+        """
+        if "INSERT INTO MEALS" in query_upper:
+            user_id, name, ingredient_ids, quantities = params[:4]
+            total_calories = self._meal_total(ingredient_ids, quantities)
+            self._handle_insert("INSERT INTO MEALS", (user_id, name, total_calories))
+            meal_id = self._results[0][0]
+            for ingredient_id, quantity in zip(ingredient_ids, quantities):
+                self._handle_insert("INSERT INTO MEAL_INGREDIENTS", (meal_id, ingredient_id, quantity))
+            self._results = [(meal_id, total_calories)]
+            return
+
+        meal_id = params[3]
+        removed, changed_ids, changed_quantities, added_ids, added_quantities = params[5:]
+        self._handle_update("UPDATE MEALS", params[:5])
+        if not self.rowcount:
+            return
+        results = self._results
+        for key, mi in list(self._db["meal_ingredients"].items()):
+            if str(mi["meal_id"]) != str(meal_id):
+                continue
+            if str(mi["ingredient_id"]) in removed:
+                del self._db["meal_ingredients"][key]
+            elif str(mi["ingredient_id"]) in changed_ids:
+                mi["quantity"] = changed_quantities[changed_ids.index(str(mi["ingredient_id"]))]
+        for ingredient_id, quantity in zip(added_ids, added_quantities):
+            self._handle_insert("INSERT INTO MEAL_INGREDIENTS", (meal_id, ingredient_id, quantity))
+        self._results = results
+
+    def _meal_total(self, ingredient_ids, quantities):
+        """ROUND(SUM(r.quantity * i.calories_per_unit), 2) over unnest(ids, quantities)."""
+        return round(sum(
+            quantity * self._db["ingredients"][str(ingredient_id)]["calories_per_unit"]
+            for ingredient_id, quantity in zip(ingredient_ids, quantities)
+        ), 2)
+
+    def _handle_meal_totals(self, params):
+        """
+        Recompute the totals of the user's meals that use an ingredient:
+        WITH totals AS (...), updated AS (UPDATE meals ...), days AS (...) ...
+        Returns (meals updated, summary dates refreshed); the mock keeps no
+        daily_summaries rows, so no dates are ever refreshed.
+        """
+        ingredient_id, user_id = params[0], params[1]
+        meal_ids = {
+            str(mi["meal_id"]) for mi in self._db["meal_ingredients"].values()
+            if str(mi["ingredient_id"]) == str(ingredient_id)
+        }
+        updated = set()
+        for meal_id in meal_ids:
+            meal = self._db["meals"].get(meal_id)
+            if meal is None or str(meal["user_id"]) != str(user_id):
+                continue
+            total = round(sum(
+                mi["quantity"] * self._db["ingredients"][str(mi["ingredient_id"])]["calories_per_unit"]
+                for mi in self._db["meal_ingredients"].values()
+                if str(mi["meal_id"]) == meal_id
+            ), 2)
+            if total != meal["total_calories"]:
+                meal["total_calories"] = total
+                updated.add(meal_id)
+        self._results = [(len(updated), [])]
+
     def _handle_select(self, query_upper, params):
         # Remove all spaces for easier pattern matching
         query_no_spaces = query_upper.replace(" ", "")
 
+        # Lock a meal before diffing its ingredients:
+        # SELECT m.id, mi.ingredient_id, mi.quantity ... FOR UPDATE OF m
+        if "FOR UPDATE OF M" in query_upper:
+            meal_id, user_id = params
+            meal = self._db["meals"].get(str(meal_id))
+            if meal is None or str(meal["user_id"]) != str(user_id):
+                self._results = []
+                return
+            rows = [
+                (meal["id"], mi["ingredient_id"], mi["quantity"])
+                for mi in self._db["meal_ingredients"].values()
+                if str(mi["meal_id"]) == str(meal_id)
+            ]
+            self._results = rows or [(meal["id"], None, None)]
+            return
+
         if "FROM USERS" in query_upper and "COGNITO_USER_ID" in query_upper:
             cognito_id = params[0]
             for user in self._db["users"].values():
                 if user["cognito_user_id"] == cognito_id:
-                    self._results = [(user["id"],)]
+                    if "DATA_VERSION" in query_upper:
+                        self._results = [(user["id"], user.get("data_version", 0))]
+                    else:
+                        self._results = [(user["id"],)]
                     return
             self._results = []
 
@@ -144,6 +317,7 @@ class MockCursor:
 
         elif "FROM MEALS M" in query_upper and "LEFT JOIN MEAL_INGREDIENTS" in query_upper:
             meal_id, user_id = params[0], params[1]
+            version = self._db["users"].get(str(user_id), {}).get("data_version", 0)
             results = []
             for meal in self._db["meals"].values():
                 if str(meal["id"]) == str(meal_id) and str(meal["user_id"]) == str(user_id):
@@ -155,13 +329,14 @@ class MockCursor:
                                     results.append((
                                         meal["id"], meal["name"], meal["total_calories"],
                                         meal["created_at"], mi["quantity"],
-                                        ing["id"], ing["name"], ing["calories_per_unit"], ing["unit"]
+                                        ing["id"], ing["name"], ing["calories_per_unit"], ing["unit"],
+                                        version
                                     ))
                                     has_ingredients = True
                     if not has_ingredients:
                         results.append((
                             meal["id"], meal["name"], meal["total_calories"],
-                            meal["created_at"], None, None, None, None, None
+                            meal["created_at"], None, None, None, None, None, version
                         ))
                     break
             self._results = results
@@ -267,25 +442,37 @@ class MockCursor:
             self._results = [(count,)]
 
     def _handle_update(self, query_upper, params):
-        if "UPDATE INGREDIENTS" in query_upper:
+        if "UPDATE USERS" in query_upper:
+            # begin_user_write(): bump data_version and return the id
+            user = self._find_user(params[0])
+            if user is None:
+                self._results = []
+                self.rowcount = 0
+                return
+            user["data_version"] = user.get("data_version", 0) + 1
+            self._results = [(user["id"],)]
+            self.rowcount = 1
+
+        elif "UPDATE INGREDIENTS" in query_upper:
             name, calories, unit, ing_id, user_id = params
             for ing in self._db["ingredients"].values():
                 if str(ing["id"]) == str(ing_id) and str(ing["user_id"]) == str(user_id):
+                    changed = ing["calories_per_unit"] != calories
                     ing["name"] = name
                     ing["calories_per_unit"] = calories
                     ing["unit"] = unit
-                    self._results = [(ing["id"],)]
+                    self._results = [(ing["id"], changed)]
                     self.rowcount = 1
                     return
             self.rowcount = 0
 
         elif "UPDATE MEALS" in query_upper:
-            name, total_calories, meal_id, user_id = params
+            name, ingredient_ids, quantities, meal_id, user_id = params
             for meal in self._db["meals"].values():
                 if str(meal["id"]) == str(meal_id) and str(meal["user_id"]) == str(user_id):
                     meal["name"] = name
-                    meal["total_calories"] = total_calories
-                    self._results = [(meal["id"],)]
+                    meal["total_calories"] = self._meal_total(ingredient_ids, quantities)
+                    self._results = [(meal["total_calories"],)]
                     self.rowcount = 1
                     return
             self.rowcount = 0
@@ -350,7 +537,7 @@ class MockCursor:
             else:
                 self.rowcount = 0
 
-    def executemany(self, query, params_list):
+    def executemany(self, query, params_list, name=None):
         for params in params_list:
             self.execute(query, params)
 
@@ -406,6 +593,7 @@ def mock_db():
 def mock_db_connection(mock_db, monkeypatch):
     """Patch the db module to use our mock connection."""
     from backend.shared import db as db_module
+    from backend.shared import etag as etag_module
     from backend.lambdas.meals import ingredients as ingredients_module
     from backend.lambdas.meals import meals as meals_module
     from backend.lambdas.meal_logs import meal_logs as meal_logs_module
@@ -426,6 +614,7 @@ def mock_db_connection(mock_db, monkeypatch):
     monkeypatch.setattr(meals_module, "get_connection", get_mock_connection)
     monkeypatch.setattr(meal_logs_module, "get_connection", get_mock_connection)
     monkeypatch.setattr(summary_module, "get_connection", get_mock_connection)
+    monkeypatch.setattr(etag_module, "get_connection", get_mock_connection)
 
     return conn, mock_db
 
@@ -0,0 +1,38 @@
+"""Integration tests for POST /batch through the single-function handler."""
+import json
+from datetime import date
+
+from backend.lambdas.api.handler import router
+
+
+class TestBatch:
+    """Integration tests for POST /batch."""
+
+    def test_page_load_batch(
+        self, mock_db_connection, mock_event_factory, test_user, test_meal
+    ):
+        today = date.today().isoformat()
+        event = mock_event_factory(
+            method="POST",
+            resource="/batch",
+            body={"requests": [
+                {"id": "ingredients", "method": "GET", "path": "/ingredients"},
+                {"id": "meals", "method": "GET", "path": "/meals?fields=id,name"},
+                {"id": "meal", "method": "GET", "path": f"/meals/{test_meal['id']}"},
+                {"id": "log", "method": "POST", "path": "/meal-logs",
+                 "body": {"meal_id": test_meal["id"], "date": today}},
+            ]},
+            cognito_user_id=test_user["cognito_user_id"]
+        )
+
+        response = router.routes[("/batch", "POST")](event)
+
+        assert response["statusCode"] == 200
+        results = {item["id"]: item for item in json.loads(response["body"])["responses"]}
+        assert results["ingredients"]["status"] == 200
+        assert len(results["ingredients"]["body"]["ingredients"]) == 1
+        assert results["meals"]["body"]["meals"] == [{"id": test_meal["id"], "name": "Test Meal"}]
+        assert results["meal"]["body"]["id"] == test_meal["id"]
+        assert "ETag" in results["meal"]["headers"]
+        assert results["log"]["status"] == 201
+        assert results["log"]["body"]["date"] == today
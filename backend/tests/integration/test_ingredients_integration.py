@@ -4,6 +4,7 @@ import pytest
 
 from backend.lambdas.meals.ingredients import (
     create_ingredient,
+    bulk_create_ingredients,
     list_ingredients,
     update_ingredient,
     delete_ingredient,
@@ -136,6 +137,53 @@ class TestCreateIngredient:
         assert "user" in body["error"].lower()
 
 
+class TestBulkCreateIngredients:
+    """Integration tests for POST /ingredients/bulk."""
+
+    def test_bulk_created_ingredients_are_listed(
+        self, mock_db_connection, mock_event_factory, test_user
+    ):
+        pantry = [
+            {"name": f"Item {i:03d}", "calories_per_unit": i, "unit": "g"}
+            for i in range(150)
+        ]
+        event = mock_event_factory(
+            method="POST",
+            resource="/ingredients/bulk",
+            body={"ingredients": pantry},
+            cognito_user_id=test_user["cognito_user_id"]
+        )
+
+        response = bulk_create_ingredients(event)
+
+        assert response["statusCode"] == 201
+        body = json.loads(response["body"])
+        assert body["created"] == 150
+
+        event = mock_event_factory(
+            resource="/ingredients",
+            query_params={"limit": "100", "fields": "id,name"},
+            cognito_user_id=test_user["cognito_user_id"]
+        )
+        listed = json.loads(list_ingredients(event)["body"])["ingredients"]
+        assert listed[0] == {"id": body["results"][0]["id"], "name": "Item 000"}
+        assert len(listed) == 100
+
+    def test_bulk_create_user_not_found(
+        self, mock_db_connection, mock_event_factory
+    ):
+        event = mock_event_factory(
+            method="POST",
+            resource="/ingredients/bulk",
+            body={"ingredients": [{"name": "Test", "calories_per_unit": 1, "unit": "g"}]},
+            cognito_user_id="non-existent-user"
+        )
+
+        response = bulk_create_ingredients(event)
+
+        assert response["statusCode"] == 404
+
+
 class TestListIngredients:
     """Integration tests for GET /ingredients."""
 
@@ -241,6 +289,28 @@ class TestUpdateIngredient:
         assert body["calories_per_unit"] == 150
         assert body["unit"] == "oz"
 
+    def test_calorie_change_updates_meal_totals(
+        self, mock_db_connection, mock_event_factory, test_user, test_ingredient, test_meal
+    ):
+        conn, mock_db = mock_db_connection
+        event = mock_event_factory(
+            method="PUT",
+            resource="/ingredients/{id}",
+            path_params={"id": str(test_ingredient["id"])},
+            body={
+                "name": "Test Ingredient",
+                "calories_per_unit": 150,
+                "unit": "g"
+            },
+            cognito_user_id=test_user["cognito_user_id"]
+        )
+
+        response = update_ingredient(event)
+
+        assert response["statusCode"] == 200
+        # 2 units of the ingredient, now at 150 each
+        assert mock_db["meals"][test_meal["id"]]["total_calories"] == 300
+
     def test_update_ingredient_not_found(
         self, mock_db_connection, mock_event_factory, test_user
     ):
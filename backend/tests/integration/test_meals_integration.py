@@ -350,6 +350,48 @@ class TestUpdateMeal:
         assert body["name"] == "Updated Meal"
         assert body["total_calories"] == 300  # 100 * 3
 
+    def test_update_meal_touches_only_changed_ingredients(
+        self, mock_db_connection, mock_event_factory, test_user, test_meal, test_ingredient
+    ):
+        conn, mock_db = mock_db_connection
+        mock_db["ingredients"]["ing-2"] = {
+            "id": "ing-2", "user_id": test_user["id"], "name": "Rice", "calories_per_unit": 10, "unit": "g"
+        }
+        original_row = next(iter(mock_db["meal_ingredients"]))
+
+        def update(name, ingredients):
+            event = mock_event_factory(
+                method="PUT",
+                resource="/meals/{id}",
+                path_params={"id": str(test_meal["id"])},
+                body={"name": name, "ingredients": ingredients},
+                cognito_user_id=test_user["cognito_user_id"]
+            )
+            return update_meal(event)
+
+        # Existing ingredient unchanged, one added: the existing row is kept
+        unchanged = {"ingredient_id": str(test_ingredient["id"]), "quantity": 2}
+        response = update(test_meal["name"], [unchanged, {"ingredient_id": "ing-2", "quantity": 5}])
+        assert json.loads(response["body"])["total_calories"] == 250
+        assert original_row in mock_db["meal_ingredients"]
+        assert sorted(mi["ingredient_id"] for mi in mock_db["meal_ingredients"].values()) == [
+            str(test_ingredient["id"]), "ing-2"
+        ]
+
+        # Rename only: no ingredient row is rewritten
+        rows_before = dict(mock_db["meal_ingredients"])
+        response = update("Renamed", [unchanged, {"ingredient_id": "ing-2", "quantity": 5}])
+        assert response["statusCode"] == 200
+        assert mock_db["meal_ingredients"] == rows_before
+        assert mock_db["meals"][test_meal["id"]]["name"] == "Renamed"
+
+        # One removed, one changed
+        response = update("Renamed", [{"ingredient_id": "ing-2", "quantity": 7}])
+        assert json.loads(response["body"])["total_calories"] == 70
+        assert [(mi["ingredient_id"], mi["quantity"]) for mi in mock_db["meal_ingredients"].values()] == [
+            ("ing-2", 7)
+        ]
+
     def test_update_meal_not_found(
         self, mock_db_connection, mock_event_factory, test_user, test_ingredient
     ):
@@ -470,3 +512,40 @@ class TestDeleteMeal:
         cur.execute("SELECT COUNT(*) FROM meal_ingredients WHERE meal_id = %s", (meal_id,))
         assert cur.fetchone()[0] == 0
         cur.close()
+
+
+class TestConditionalGetMeal:
+    """Integration tests for ETag / If-None-Match on GET /meals/{id}."""
+
+    def test_revalidation_until_the_meal_changes(
+        self, mock_db_connection, mock_event_factory, test_user, test_meal, test_ingredient
+    ):
+        get_event = mock_event_factory(
+            method="GET",
+            resource="/meals/{id}",
+            path_params={"id": str(test_meal["id"])},
+            cognito_user_id=test_user["cognito_user_id"]
+        )
+        first = get_meal(get_event)
+        assert first["statusCode"] == 200
+        etag = first["headers"]["ETag"]
+
+        get_event["headers"] = {"If-None-Match": etag}
+        assert get_meal(get_event)["statusCode"] == 304
+
+        update_event = mock_event_factory(
+            method="PUT",
+            resource="/meals/{id}",
+            path_params={"id": str(test_meal["id"])},
+            body={
+                "name": "Renamed",
+                "ingredients": [{"ingredient_id": str(test_ingredient["id"]), "quantity": 1}]
+            },
+            cognito_user_id=test_user["cognito_user_id"]
+        )
+        assert update_meal(update_event)["statusCode"] == 200
+
+        after = get_meal(get_event)
+        assert after["statusCode"] == 200
+        assert json.loads(after["body"])["name"] == "Renamed"
+        assert after["headers"]["ETag"] != etag
@@ -0,0 +1,185 @@
+import json
+from contextlib import contextmanager
+
+import pytest
+
+from backend.lambdas.api import batch as batch_module
+from backend.lambdas.api.batch import run_batch
+from backend.lambdas.users import users as users_module
+from backend.shared import db as db_module
+from backend.shared.response import response
+from backend.shared.router import Router
+from backend.tests.conftest import FakeConnection, FakeCursor
+
+
+def _batch_event(event, requests, **extra):
+    event["httpMethod"] = "POST"
+    event["resource"] = "/batch"
+    event["body"] = json.dumps({"requests": requests, **extra})
+    return event
+
+
+@pytest.fixture
+def router():
+    router = Router("test")
+    router.add("GET", "/meals", lambda event: response(200, [{"id": "m1"}], etag='"3-abc"'))
+    router.add("GET", "/meals/{id}", lambda event: response(200, {
+        "id": event["pathParameters"]["id"],
+        "query": event["queryStringParameters"],
+        "sub": event["requestContext"]["authorizer"]["claims"]["sub"],
+    }))
+    router.add("POST", "/meal-logs", lambda event: response(201, json.loads(event["body"])))
+    router.add("POST", "/batch", lambda event: run_batch(router, event))
+    return router
+
+
+@pytest.fixture
+def transaction(monkeypatch):
+    state = {"committed": False, "open": False}
+
+    @contextmanager
+    def fake_deferred_commits():
+        state["open"] = True
+        yield lambda: state.update(committed=True)
+        state["open"] = False
+
+    monkeypatch.setattr(batch_module, "deferred_commits", fake_deferred_commits)
+    return state
+
+
+def _responses(result):
+    assert result["statusCode"] == 200
+    return json.loads(result["body"])["responses"]
+
+
+def test_sub_requests_run_in_order_through_their_routes(event_copy, router):
+    event = _batch_event(event_copy, [
+        {"id": "list", "method": "GET", "path": "/meals"},
+        {"id": "one", "method": "GET", "path": "/meals/m1?fields=id"},
+        {"method": "POST", "path": "/meal-logs", "body": {"quantity": 2}},
+    ])
+
+    responses = _responses(run_batch(router, event))
+
+    assert responses[0] == {"id": "list", "status": 200, "body": [{"id": "m1"}], "headers": {"ETag": '"3-abc"'}}
+    assert responses[1]["body"] == {"id": "m1", "query": {"fields": "id"}, "sub": "test-cognito-user-id"}
+    assert responses[2] == {"status": 201, "body": {"quantity": 2}}
+
+
+def test_unknown_and_nested_batch_routes_are_404(event_copy, router):
+    event = _batch_event(event_copy, [
+        {"method": "GET", "path": "/nope"},
+        {"method": "POST", "path": "/batch", "body": {"requests": []}},
+    ])
+
+    assert [r["status"] for r in _responses(run_batch(router, event))] == [404, 404]
+
+
+def test_endpoint_exceptions_become_500_items(event_copy, router):
+    def broken(event):
+        raise RuntimeError("boom")
+
+    router.add("DELETE", "/meals/{id}", broken)
+    event = _batch_event(event_copy, [
+        {"method": "DELETE", "path": "/meals/m1"},
+        {"method": "GET", "path": "/meals"},
+    ])
+
+    assert [r["status"] for r in _responses(run_batch(router, event))] == [500, 200]
+
+
+def test_sub_responses_are_never_compressed(event_copy, router):
+    router.add("GET", "/big", lambda event: response(200, {"data": "x" * 4096}))
+    event = _batch_event(event_copy, [
+        {"method": "GET", "path": "/big", "headers": {"Accept-Encoding": "gzip"}},
+    ])
+
+    assert _responses(run_batch(router, event)) == [{"status": 200, "body": {"data": "x" * 4096}}]
+
+
+def test_undecodable_sub_responses_become_500_items(event_copy, router):
+    router.add("GET", "/text", lambda event: {"statusCode": 200, "headers": {}, "body": "not json"})
+    event = _batch_event(event_copy, [
+        {"method": "GET", "path": "/text"},
+        {"method": "GET", "path": "/meals"},
+    ])
+
+    assert [r["status"] for r in _responses(run_batch(router, event))] == [500, 200]
+
+
+@pytest.mark.parametrize("body,error", [
+    ({"requests": []}, "requests must be a non-empty list"),
+    ({"requests": [{"method": "PATCH", "path": "/meals"}]}, "method must be one of GET, POST, PUT, DELETE"),
+    ({"requests": [{"method": "GET", "path": "meals"}]}, "path must be an absolute path"),
+    ({"requests": [{"method": "GET", "path": "/meals"}], "atomic": "yes"}, "atomic must be a boolean"),
+])
+def test_invalid_batches_are_rejected(event_copy, router, body, error):
+    event_copy["body"] = json.dumps(body)
+
+    result = run_batch(router, event_copy)
+
+    assert result["statusCode"] == 400
+    assert json.loads(result["body"])["error"] == error
+
+
+def test_batch_size_is_limited(event_copy, router, monkeypatch):
+    monkeypatch.setattr(batch_module, "BATCH_MAX_REQUESTS", 2)
+    event = _batch_event(event_copy, [{"method": "GET", "path": "/meals"}] * 3)
+
+    assert run_batch(router, event)["statusCode"] == 400
+
+
+def test_atomic_batch_commits_once_when_everything_succeeds(event_copy, router, transaction):
+    event = _batch_event(event_copy, [
+        {"method": "POST", "path": "/meal-logs", "body": {"quantity": 1}},
+        {"method": "POST", "path": "/meal-logs", "body": {"quantity": 2}},
+    ], atomic=True)
+
+    assert [r["status"] for r in _responses(run_batch(router, event))] == [201, 201]
+    assert transaction == {"committed": True, "open": False}
+
+
+def test_atomic_batch_rolls_back_on_the_first_failure(event_copy, router, transaction):
+    router.add("PUT", "/meals/{id}", lambda event: response(404, {"error": "Meal not found"}))
+    event = _batch_event(event_copy, [
+        {"method": "GET", "path": "/meals"},
+        {"method": "POST", "path": "/meal-logs", "body": {"quantity": 1}},
+        {"method": "PUT", "path": "/meals/m1", "body": {"name": "x"}},
+        {"method": "POST", "path": "/meal-logs", "body": {"quantity": 2}},
+    ], atomic=True)
+
+    assert [r["status"] for r in _responses(run_batch(router, event))] == [200, 424, 404, 424]
+    assert transaction == {"committed": False, "open": False}
+
+
+def test_read_only_atomic_batch_needs_no_transaction(event_copy, router, transaction):
+    event = _batch_event(event_copy, [{"method": "GET", "path": "/meals"}], atomic=True)
+
+    assert [r["status"] for r in _responses(run_batch(router, event))] == [200]
+    assert transaction == {"committed": False, "open": False}
+
+
+@pytest.mark.parametrize("then,committed", [
+    (lambda event: response(201, {}), True),
+    (lambda event: response(404, {"error": "Meal not found"}), False),
+])
+def test_atomic_bootstrap_caches_the_user_id_only_once_committed(
+    event_copy, router, monkeypatch, then, committed
+):
+    # The real deferred_commits() around the real POST /users/bootstrap
+    raw = FakeConnection(FakeCursor(fetchone_values=[("user-1",)]))
+    conn = db_module._ManagedConnection(raw)
+    monkeypatch.setattr(db_module, "get_connection", lambda: conn)
+    monkeypatch.setattr(users_module, "get_connection", lambda: conn)
+    router.add("POST", "/users/bootstrap", users_module.bootstrap_user)
+    router.add("PUT", "/meals/{id}", then)
+    event = _batch_event(event_copy, [
+        {"method": "POST", "path": "/users/bootstrap"},
+        {"method": "PUT", "path": "/meals/m1", "body": {"name": "x"}},
+    ], atomic=True)
+
+    run_batch(router, event)
+
+    assert raw.committed is committed
+    cached = db_module._lookup_cached_user_id("test-cognito-user-id")
+    assert cached == ((True, "user-1") if committed else (False, None))
@@ -67,6 +67,22 @@ class TestComputeDailySummaries:
         # Check that an UPSERT query was executed
         assert any("ON CONFLICT" in query for query, _ in cursor.executed)
 
+    def test_compute_daily_summaries_bumps_data_versions_first(self):
+        """The users rows are bumped before any summary row is written."""
+        cursor = FakeCursor(
+            fetchall_values=[
+                [("user-id-1", Decimal("1500"), 3), ("user-id-2", Decimal("2000"), 4)]
+            ]
+        )
+        conn = FakeConnection(cursor)
+
+        batch.compute_daily_summaries(conn, date(2024, 1, 15))
+
+        query, params = cursor.executed[1]
+        assert query.startswith("UPDATE users SET data_version")
+        assert params == (["user-id-1", "user-id-2"],)
+        assert all("ON CONFLICT" in query for query, _ in cursor.executed[2:])
+
     def test_compute_daily_summaries_decimal_handling(self):
         """Test that decimal values are handled correctly."""
         target_date = date(2024, 1, 15)
@@ -304,6 +320,26 @@ class TestHandler:
         assert result["metrics"]["anomalies_detected"] == 0
         assert result["metrics"]["errors"] == []
 
+    def test_handler_tracks_batch_queries(self, monkeypatch):
+        from backend.shared import db as db_module
+
+        conn = FakeConnection(FakeCursor())
+        tracking = []
+
+        def compute(conn):
+            tracking.append(db_module._query_log.entries is not None)
+            return 0
+
+        monkeypatch.setattr(batch_handler, "get_connection", lambda: conn)
+        monkeypatch.setattr(batch_handler, "compute_daily_summaries", compute)
+        monkeypatch.setattr(batch_handler, "compute_weekly_reports", lambda conn: 0)
+        monkeypatch.setattr(batch_handler, "detect_anomalies", lambda conn: [])
+
+        batch_handler.handler({}, None)
+
+        assert tracking == [True]
+        assert getattr(db_module._query_log, "entries", None) is None
+
     def test_handler_partial_failure(self, monkeypatch):
         """Test handler when one batch process fails."""
         cursor = FakeCursor()
@@ -1,4 +1,9 @@
 import json
+from decimal import Decimal
+
+import boto3
+import psycopg2
+import pytest
 
 from backend.shared import db as db_module
 from backend.shared.db import get_internal_user_id
@@ -21,8 +26,10 @@ class FakeCursor:
 class FakeConnection:
     def __init__(self, row=None):
         self._row = row
+        self.queries = 0
 
     def cursor(self):
+        self.queries += 1
         return FakeCursor(self._row)
 
 
@@ -36,6 +43,71 @@ def test_get_internal_user_id_missing():
     assert get_internal_user_id(conn, "cognito") is None
 
 
+def test_get_internal_user_id_cached_after_first_lookup():
+    conn = FakeConnection(row=(123,))
+    stats_before = db_module.get_user_id_cache_stats()
+
+    assert get_internal_user_id(conn, "cognito") == 123
+    assert get_internal_user_id(conn, "cognito") == 123
+
+    stats = db_module.get_user_id_cache_stats()
+    assert conn.queries == 1
+    assert stats["misses"] == stats_before["misses"] + 1
+    assert stats["hits"] == stats_before["hits"] + 1
+
+
+def test_resolved_user_id_is_bound_to_the_log_context():
+    from backend.shared.logging import _context, log_context
+
+    with log_context(request_id="req-1"):
+        get_internal_user_id(FakeConnection(row=None), "missing")
+        assert "internal_user_id" not in _context.fields
+        get_internal_user_id(FakeConnection(row=(5,)), "cognito")
+        assert _context.fields == {"request_id": "req-1", "internal_user_id": 5}
+    assert _context.fields is None
+
+
+def test_begin_user_write_bumps_the_version_and_caches_the_id():
+    conn = FakeConnection(row=(123,))
+
+    assert db_module.begin_user_write(conn, "cognito") == 123
+    # Later reads of the id come from the cache
+    assert get_internal_user_id(conn, "cognito") == 123
+    assert conn.queries == 1
+
+
+def test_get_internal_user_id_negative_entry_expires(monkeypatch):
+    conn = FakeConnection(row=None)
+    monkeypatch.setattr(db_module, "USER_ID_NEGATIVE_TTL_SECONDS", 0)
+
+    assert get_internal_user_id(conn, "cognito") is None
+    assert get_internal_user_id(conn, "cognito") is None
+    assert conn.queries == 2
+
+
+def test_get_internal_user_id_negative_entry_cached():
+    conn = FakeConnection(row=None)
+
+    assert get_internal_user_id(conn, "cognito") is None
+    assert get_internal_user_id(conn, "cognito") is None
+    assert conn.queries == 1
+
+
+def test_user_id_cache_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(db_module, "USER_ID_CACHE_SIZE", 2)
+    evictions_before = db_module.get_user_id_cache_stats()["evictions"]
+
+    db_module.cache_user_id("a", 1)
+    db_module.cache_user_id("b", 2)
+    assert get_internal_user_id(FakeConnection(), "a") == 1
+    db_module.cache_user_id("c", 3)
+
+    stats = db_module.get_user_id_cache_stats()
+    assert stats["size"] == 2
+    assert stats["evictions"] == evictions_before + 1
+    assert get_internal_user_id(FakeConnection(row=(99,)), "b") == 99
+
+
 def test_get_db_secret_and_connection_cache(monkeypatch):
     calls = {"secret": 0, "connect": 0}
 
@@ -71,12 +143,372 @@ def test_get_db_secret_and_connection_cache(monkeypatch):
     monkeypatch.setenv("DB_NAME", "db")
     monkeypatch.setattr(db_module, "_secret_cache", None)
     monkeypatch.setattr(db_module, "_connection", None)
-    monkeypatch.setattr(db_module.boto3, "client", lambda *_: FakeBotoClient())
-    monkeypatch.setattr(db_module.psycopg2, "connect", lambda **kwargs: fake_connect(**kwargs))
+    monkeypatch.setattr(boto3.session.Session, "client", lambda self, *_: FakeBotoClient())
+    monkeypatch.setattr(psycopg2, "connect", lambda **kwargs: fake_connect(**kwargs))
+    monkeypatch.setattr(db_module, "_register_numeric_caster", lambda raw: None)
 
+    stats_before = db_module.get_connection_stats()
     conn1 = db_module.get_connection()
     conn2 = db_module.get_connection()
 
     assert conn1 is conn2
     assert calls["secret"] == 1
     assert calls["connect"] == 1
+    stats = db_module.get_connection_stats()
+    assert stats["connects"] == stats_before["connects"] + 1
+    assert stats["reuses"] == stats_before["reuses"] + 1
+
+
+def test_release_connection_keeps_connection_open(monkeypatch):
+    class FakePsycopgConn:
+        def __init__(self):
+            self.closed = 0
+            self.rollbacks = 0
+
+        def rollback(self):
+            self.rollbacks += 1
+
+        def close(self):
+            self.closed = 1
+
+    conn = FakePsycopgConn()
+    monkeypatch.setattr(db_module, "_connection", conn)
+
+    db_module.release_connection(conn)
+
+    assert conn.closed == 0
+    assert conn.rollbacks == 1
+    assert db_module._connection is conn
+
+
+def test_release_connection_drops_broken_connection(monkeypatch):
+    class BrokenConn:
+        def __init__(self):
+            self.closed = 0
+
+        def rollback(self):
+            raise Exception("connection lost")
+
+        def close(self):
+            self.closed = 1
+
+    conn = BrokenConn()
+    monkeypatch.setattr(db_module, "_connection", conn)
+
+    db_module.release_connection(conn)
+
+    assert conn.closed == 1
+    assert db_module._connection is None
+
+
+def _patch_connect(monkeypatch, make_conn):
+    monkeypatch.setenv("DB_NAME", "db")
+    monkeypatch.setattr(db_module, "_connection", None)
+    monkeypatch.setattr(db_module, "_secret_cache", {
+        "host": "localhost",
+        "username": "user",
+        "password": "pass",
+    })
+    monkeypatch.setattr(psycopg2, "connect", lambda **kwargs: make_conn())
+    monkeypatch.setattr(db_module, "_register_numeric_caster", lambda raw: None)
+
+
+class ProbeCountingConn:
+    def __init__(self):
+        self.closed = 0
+        self.statements = []
+
+    def cursor(self):
+        conn = self
+
+        class Cursor:
+            def execute(self, query, params=None):
+                conn.statements.append(query)
+
+            def close(self):
+                pass
+
+        return Cursor()
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+
+def test_get_connection_skips_probe_when_recently_used(monkeypatch):
+    raw = ProbeCountingConn()
+    _patch_connect(monkeypatch, lambda: raw)
+    monkeypatch.setattr(db_module, "IDLE_PROBE_SECONDS", 60)
+
+    conn = db_module.get_connection()
+    db_module.release_connection(conn)
+    stats_before = db_module.get_connection_stats()
+    db_module.get_connection()
+
+    stats = db_module.get_connection_stats()
+    assert "SELECT 1" not in raw.statements
+    assert stats["probes_skipped"] == stats_before["probes_skipped"] + 1
+    assert stats["probes_run"] == stats_before["probes_run"]
+
+
+def test_thread_scope_gives_each_thread_its_own_connection(monkeypatch):
+    import threading
+
+    _patch_connect(monkeypatch, ProbeCountingConn)
+    monkeypatch.setattr(db_module, "CONNECTION_SCOPE", "thread")
+    monkeypatch.setattr(db_module, "_thread_connection", threading.local())
+
+    main = db_module.get_connection()
+    db_module.release_connection(main)
+    assert db_module.get_connection() is main
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(db_module.get_connection()))
+    thread.start()
+    thread.join()
+
+    assert other[0] is not main
+    assert other[0].raw is not main.raw
+    assert db_module._connection is None
+
+
+def test_local_credentials_from_environment(monkeypatch):
+    monkeypatch.setattr(db_module, "_secret_cache", None)
+    monkeypatch.delenv("DB_SECRET_ARN", raising=False)
+    monkeypatch.setenv("DB_HOST", "localhost")
+    monkeypatch.setenv("DB_USER", "postgres")
+
+    secret = db_module._get_db_secret()
+    assert secret == {"host": "localhost", "port": 5432, "username": "postgres", "password": ""}
+
+
+def test_connection_metrics_publish_per_block_deltas(monkeypatch):
+    raw = ProbeCountingConn()
+    _patch_connect(monkeypatch, lambda: raw)
+    monkeypatch.setattr(db_module, "IDLE_PROBE_SECONDS", 60)
+    published = []
+    monkeypatch.setattr(db_module, "put_metrics", lambda metrics: published.extend(metrics))
+
+    db_module.release_connection(db_module.get_connection())
+    db_module.cache_user_id("cached", 1)
+    with db_module.connection_metrics(dimensions={"Lambda": "meals"}):
+        db_module.release_connection(db_module.get_connection())
+        db_module.release_connection(db_module.get_connection())
+        get_internal_user_id(None, "cached")
+
+    assert published == [
+        ("DbProbesSkipped", 2, "Count", {"Lambda": "meals"}),
+        ("DbProbesRun", 0, "Count", {"Lambda": "meals"}),
+        ("DbReconnects", 0, "Count", {"Lambda": "meals"}),
+        ("UserIdCacheHits", 1, "Count", {"Lambda": "meals"}),
+        ("UserIdCacheMisses", 0, "Count", {"Lambda": "meals"}),
+        ("UserIdCacheEvictions", 0, "Count", {"Lambda": "meals"}),
+    ]
+
+
+def test_get_connection_probes_after_idle_threshold(monkeypatch):
+    raw = ProbeCountingConn()
+    _patch_connect(monkeypatch, lambda: raw)
+    monkeypatch.setattr(db_module, "IDLE_PROBE_SECONDS", 0)
+
+    conn = db_module.get_connection()
+    db_module.release_connection(conn)
+    stats_before = db_module.get_connection_stats()
+    db_module.get_connection()
+
+    stats = db_module.get_connection_stats()
+    assert raw.statements == ["SELECT 1"]
+    assert stats["probes_run"] == stats_before["probes_run"] + 1
+
+
+def test_first_statement_retried_once_after_server_disconnect(monkeypatch):
+    class DroppedConn(ProbeCountingConn):
+        def cursor(self):
+            conn = self
+
+            class Cursor:
+                def execute(self, query, params=None):
+                    conn.closed = 2
+                    raise psycopg2.OperationalError("server closed the connection")
+
+            return Cursor()
+
+    connections = [ProbeCountingConn(), ProbeCountingConn()]
+    _patch_connect(monkeypatch, lambda: connections.pop(0))
+    monkeypatch.setattr(db_module, "IDLE_PROBE_SECONDS", 60)
+
+    conn = db_module.get_connection()
+    db_module.release_connection(conn)
+    # Simulate the server dropping the socket while the container was frozen
+    conn.raw = DroppedConn()
+    stats_before = db_module.get_connection_stats()
+
+    conn = db_module.get_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT id FROM meals")
+
+    assert conn.raw.statements == ["SELECT id FROM meals"]
+    assert db_module.get_connection_stats()["reconnects"] == stats_before["reconnects"] + 1
+
+
+def test_deferred_commits_hold_one_transaction_across_leases(monkeypatch):
+    class TransactionConn(ProbeCountingConn):
+        def commit(self):
+            self.statements.append("COMMIT")
+
+        def rollback(self):
+            self.statements.append("ROLLBACK")
+
+    raw = TransactionConn()
+    _patch_connect(monkeypatch, lambda: raw)
+    monkeypatch.setattr(db_module, "IDLE_PROBE_SECONDS", 60)
+
+    with db_module.deferred_commits() as commit:
+        for _ in range(2):
+            conn = db_module.get_connection()
+            conn.cursor().execute("INSERT INTO meal_logs VALUES (1)")
+            conn.commit()
+            db_module.release_connection(conn)
+            # A dropped connection must fail the batch, not reconnect mid-transaction
+            assert conn.retry_first_statement is False
+        assert raw.statements == ["INSERT INTO meal_logs VALUES (1)"] * 2
+        commit()
+
+    assert raw.statements[2:] == ["COMMIT", "ROLLBACK"]
+    assert conn.defer_commits is False
+
+
+def test_non_connection_errors_are_not_retried(monkeypatch):
+    class FailingConn(ProbeCountingConn):
+        def cursor(self):
+            class Cursor:
+                def execute(self, query, params=None):
+                    raise psycopg2.OperationalError("canceling statement due to statement timeout")
+
+            return Cursor()
+
+    _patch_connect(monkeypatch, FailingConn)
+    monkeypatch.setattr(db_module, "IDLE_PROBE_SECONDS", 60)
+
+    conn = db_module.get_connection()
+    db_module.release_connection(conn)
+    conn = db_module.get_connection()
+
+    stats_before = db_module.get_connection_stats()
+
+    with pytest.raises(psycopg2.OperationalError):
+        conn.cursor().execute("SELECT pg_sleep(60)")
+    assert db_module.get_connection_stats()["reconnects"] == stats_before["reconnects"]
+
+
+def test_track_queries_publishes_per_query_and_request_metrics(monkeypatch):
+    class RowCountingConn(ProbeCountingConn):
+        def cursor(self):
+            class Cursor:
+                rowcount = 3
+
+                def execute(self, query, params=None):
+                    pass
+
+                def close(self):
+                    pass
+
+            return Cursor()
+
+    published = []
+    _patch_connect(monkeypatch, RowCountingConn)
+    monkeypatch.setattr(db_module, "put_metrics", lambda metrics: published.extend(metrics))
+
+    with db_module.track_queries(dimensions={"Lambda": "meals"}):
+        cur = db_module.get_connection().cursor()
+        cur.execute("SELECT id FROM meals WHERE user_id = %s", (1,), name="list_things.select")
+        cur.execute("  DELETE FROM meal_logs WHERE id = %s", (2,))
+
+    # Explicit names win; unnamed statements fall back to their kind
+    query_times = [m for m in published if m[0] == "DatabaseQueryTime" and m[3]]
+    assert [m[3]["Query"] for m in query_times] == [
+        "list_things.select",
+        "delete.meal_logs",
+    ]
+    # Undimensioned data points back the DietTracker-DatabaseSlowQuery alarm
+    assert len([m for m in published if m[0] == "DatabaseQueryTime" and m[3] is None]) == 2
+    totals = {m[0]: m for m in published if m[3] == {"Lambda": "meals"}}
+    assert totals["DatabaseQueryCount"][1] == 2
+    assert totals["DatabaseRowCount"][1] == 6
+    assert totals["DatabaseRequestTime"][2] == "Milliseconds"
+
+
+def test_queries_outside_track_queries_are_not_recorded(monkeypatch):
+    published = []
+    _patch_connect(monkeypatch, ProbeCountingConn)
+    monkeypatch.setattr(db_module, "put_metrics", lambda metrics: published.extend(metrics))
+
+    db_module.get_connection().cursor().execute("SELECT 1")
+    with db_module.track_queries():
+        pass
+
+    assert published == []
+
+
+def test_first_connect_records_init_timings(monkeypatch):
+    recorded = {}
+    monkeypatch.setattr(db_module, "record_init_timing", recorded.setdefault)
+    monkeypatch.setitem(db_module._connection_stats, "connects", 0)
+    _patch_connect(monkeypatch, ProbeCountingConn)
+
+    conn = db_module.get_connection()
+    conn.reconnect()
+
+    assert list(recorded) == ["DbConnectTime"]
+    assert recorded["DbConnectTime"] >= 0
+
+
+def test_warmup_connection_is_used_by_first_request(monkeypatch):
+    connections = [ProbeCountingConn()]
+    _patch_connect(monkeypatch, lambda: connections.pop(0))
+    monkeypatch.setattr(db_module, "_warmup_thread", None)
+
+    db_module.start_warmup()
+    conn = db_module.get_connection()
+
+    assert db_module._warmup_thread is None
+    assert connections == []
+    assert conn is db_module._connection
+
+
+def test_failed_warmup_falls_back_to_lazy_connect(monkeypatch):
+    attempts = []
+
+    def make_conn():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise psycopg2.OperationalError("could not connect to server")
+        return ProbeCountingConn()
+
+    _patch_connect(monkeypatch, make_conn)
+    monkeypatch.setattr(db_module, "_warmup_thread", None)
+
+    db_module.start_warmup()
+    conn = db_module.get_connection()
+
+    assert len(attempts) == 2
+    assert conn.closed == 0
+
+
+def test_numeric_cast_matches_decimal_rounding():
+    for text in ["1500", "12.5", "0.01", "2.675", "-3.14159", "99999.995"]:
+        assert db_module._numeric_to_float(text, None) == float(round(Decimal(text), 2))
+    assert db_module._numeric_to_float(None, None) is None
+
+
+def test_exact_numerics_last_until_release(monkeypatch):
+    _patch_connect(monkeypatch, ProbeCountingConn)
+
+    conn = db_module.get_connection()
+    db_module.use_exact_numerics(conn)
+    assert conn.exact_numeric is True
+
+    db_module.release_connection(conn)
+    assert db_module.get_connection().exact_numeric is False
@@ -0,0 +1,86 @@
+import json
+
+import pytest
+
+from backend.lambdas.meals import ingredients as ingredients_module
+from backend.shared import etag as etag_module
+from backend.shared.etag import etag_for
+from backend.tests.conftest import FakeConnection, FakeCursor
+
+
+def _install(monkeypatch, cursor):
+    conn = FakeConnection(cursor)
+    monkeypatch.setattr(etag_module, "get_connection", lambda: conn)
+    monkeypatch.setattr(ingredients_module, "get_connection", lambda: conn)
+    return conn
+
+
+def test_etag_is_strong_and_depends_on_version_user_and_query(event_copy):
+    etag = etag_for(event_copy, 1, 7)
+    assert etag.startswith('"7-') and etag.endswith('"')
+    assert etag == etag_for(event_copy, 1, 7)
+    assert etag != etag_for(event_copy, 1, 8)
+    assert etag != etag_for(event_copy, 2, 7)
+
+    event_copy["queryStringParameters"] = {"offset": "50"}
+    assert etag != etag_for(event_copy, 1, 7)
+
+
+def test_list_response_carries_etag(monkeypatch, event_copy):
+    _install(monkeypatch, FakeCursor(fetchall_values=[[(1, "ing-1", "Rice", 100, "g", 7)]]))
+
+    resp = ingredients_module.list_ingredients(event_copy)
+    assert resp["headers"]["ETag"] == etag_for(event_copy, 1, 7)
+    assert resp["headers"]["Cache-Control"] == "private, no-cache"
+
+
+@pytest.mark.parametrize("header", ["{etag}", "W/{etag}", '"other", {etag}', "*"])
+def test_matching_if_none_match_returns_304_after_one_lookup(monkeypatch, event_copy, header):
+    etag = etag_for(event_copy, 1, 7)
+    cursor = FakeCursor(fetchone_values=[(1, 7)])
+    _install(monkeypatch, cursor)
+
+    event_copy["headers"] = {"if-none-match": header.format(etag=etag)}
+    resp = ingredients_module.list_ingredients(event_copy)
+
+    assert resp["statusCode"] == 304
+    assert resp["body"] == ""
+    assert resp["headers"]["ETag"] == etag
+    # Only the version lookup ran, not the list query
+    assert len(cursor.executed) == 1
+    assert "data_version" in cursor.executed[0][0]
+
+
+def test_stale_if_none_match_returns_full_response(monkeypatch, event_copy):
+    stale = etag_for(event_copy, 1, 6)
+    cursor = FakeCursor(
+        fetchone_values=[(1, 7)],
+        fetchall_values=[[(1, "ing-1", "Rice", 100, "g", 7)]],
+    )
+    _install(monkeypatch, cursor)
+
+    event_copy["headers"] = {"If-None-Match": stale}
+    resp = ingredients_module.list_ingredients(event_copy)
+
+    assert resp["statusCode"] == 200
+    assert len(json.loads(resp["body"])["ingredients"]) == 1
+    assert resp["headers"]["ETag"] == etag_for(event_copy, 1, 7)
+
+
+def test_if_none_match_for_unknown_user_falls_through_to_404(monkeypatch, event_copy):
+    _install(monkeypatch, FakeCursor())
+
+    event_copy["headers"] = {"If-None-Match": "*"}
+    resp = ingredients_module.list_ingredients(event_copy)
+    assert resp["statusCode"] == 404
+
+
+def test_compressed_etag_variant_revalidates(monkeypatch, event_copy):
+    compressed = etag_for(event_copy, 1, 7)[:-1] + '-gzip"'
+    _install(monkeypatch, FakeCursor(fetchone_values=[(1, 7)]))
+
+    event_copy["headers"] = {"If-None-Match": compressed}
+    resp = ingredients_module.list_ingredients(event_copy)
+
+    assert resp["statusCode"] == 304
+    assert resp["headers"]["ETag"] == compressed
@@ -2,10 +2,11 @@ from backend.lambdas.meals import handler as meals_handler
 from backend.lambdas.meal_logs import handler as meal_logs_handler
 from backend.lambdas.summary import handler as summary_handler
 from backend.lambdas.users import handler as users_handler
+from backend.lambdas.api import handler as api_handler
 
 
 def test_meals_handler_routes(monkeypatch, event_copy):
-    monkeypatch.setattr(meals_handler, "create_meal", lambda *_: {"statusCode": 201})
+    monkeypatch.setitem(meals_handler.router.routes, ("/meals", "POST"), lambda *_: {"statusCode": 201})
     event_copy["resource"] = "/meals"
     event_copy["httpMethod"] = "POST"
     resp = meals_handler.handler(event_copy, None)
@@ -19,7 +20,7 @@ def test_meals_handler_not_found(event_copy):
 
 
 def test_meal_logs_handler_routes(monkeypatch, event_copy):
-    monkeypatch.setattr(meal_logs_handler, "list_meal_logs", lambda *_: {"statusCode": 200})
+    monkeypatch.setitem(meal_logs_handler.router.routes, ("/meal-logs", "GET"), lambda *_: {"statusCode": 200})
     event_copy["resource"] = "/meal-logs"
     event_copy["httpMethod"] = "GET"
     resp = meal_logs_handler.handler(event_copy, None)
@@ -44,8 +45,22 @@ def test_summary_handler_bad_query(event_copy):
 
 
 def test_users_handler_routes(monkeypatch, event_copy):
-    monkeypatch.setattr(users_handler, "get_current_user", lambda *_: {"statusCode": 200})
+    monkeypatch.setitem(users_handler.router.routes, ("/users/me", "GET"), lambda *_: {"statusCode": 200})
     event_copy["resource"] = "/users/me"
     event_copy["httpMethod"] = "GET"
     resp = users_handler.handler(event_copy, None)
     assert resp["statusCode"] == 200
+
+
+def test_api_handler_serves_every_domain_route():
+    for domain_handler in (meals_handler, meal_logs_handler, summary_handler, users_handler):
+        for route, endpoint in domain_handler.router.routes.items():
+            assert api_handler.router.routes[route] is endpoint
+
+
+def test_api_handler_routes(monkeypatch, event_copy):
+    monkeypatch.setitem(api_handler.router.routes, ("/users/me", "GET"), lambda *_: {"statusCode": 200})
+    event_copy["resource"] = "/users/me"
+    event_copy["httpMethod"] = "GET"
+    resp = api_handler.handler(event_copy, None)
+    assert resp["statusCode"] == 200
@@ -1,4 +1,6 @@
+import base64
 import json
+from datetime import date
 
 from backend.lambdas.meals import ingredients as ingredients_module
 from backend.tests.conftest import FakeConnection, FakeCursor
@@ -38,7 +40,7 @@ def test_create_ingredient_success(monkeypatch, event_copy):
     conn = FakeConnection(cursor)
 
     monkeypatch.setattr(ingredients_module, "get_connection", lambda: conn)
-    monkeypatch.setattr(ingredients_module, "get_internal_user_id", lambda *_: 1)
+    monkeypatch.setattr(ingredients_module, "begin_user_write", lambda *_: 1)
 
     event_copy["body"] = json.dumps({
         "name": "Rice",
@@ -51,12 +53,35 @@ def test_create_ingredient_success(monkeypatch, event_copy):
     assert body["id"] == "ing-1"
 
 
+def test_create_ingredient_base64_body(monkeypatch, event_copy):
+    cursor = FakeCursor(fetchone_values=[("ing-1",)])
+    conn = FakeConnection(cursor)
+
+    monkeypatch.setattr(ingredients_module, "get_connection", lambda: conn)
+    monkeypatch.setattr(ingredients_module, "begin_user_write", lambda *_: 1)
+
+    body = json.dumps({"name": "Rice", "calories_per_unit": 100, "unit": "g"})
+    event_copy["body"] = base64.b64encode(body.encode()).decode()
+    event_copy["isBase64Encoded"] = True
+    resp = ingredients_module.create_ingredient(event_copy)
+    assert resp["statusCode"] == 201
+    assert cursor.executed[0][1][1] == "Rice"
+
+
+def test_create_ingredient_invalid_base64_body(event_copy):
+    event_copy["body"] = "not base64!"
+    event_copy["isBase64Encoded"] = True
+    resp = ingredients_module.create_ingredient(event_copy)
+    assert resp["statusCode"] == 400
+    assert json.loads(resp["body"])["error"] == "Invalid JSON body"
+
+
 def test_create_ingredient_decimal_calories(monkeypatch, event_copy):
     cursor = FakeCursor(fetchone_values=[("ing-2",)])
     conn = FakeConnection(cursor)
 
     monkeypatch.setattr(ingredients_module, "get_connection", lambda: conn)
-    monkeypatch.setattr(ingredients_module, "get_internal_user_id", lambda *_: 1)
+    monkeypatch.setattr(ingredients_module, "begin_user_write", lambda *_: 1)
 
     event_copy["body"] = json.dumps({
         "name": "Broccoli",
@@ -69,28 +94,115 @@ def test_create_ingredient_decimal_calories(monkeypatch, event_copy):
     assert body["calories_per_unit"] == 0.34
 
 
+def test_bulk_create_ingredients_inserts_valid_rows_in_one_statement(monkeypatch, event_copy):
+    cursor = FakeCursor(fetchone_values=[(1, 2)])
+    conn = FakeConnection(cursor)
+    monkeypatch.setattr(ingredients_module, "get_connection", lambda: conn)
+
+    event_copy["body"] = json.dumps({"ingredients": [
+        {"name": "Rice", "calories_per_unit": 1.3, "unit": "g"},
+        {"name": "", "calories_per_unit": 100, "unit": "g"},
+        {"name": "Oats", "calories_per_unit": 3.9, "unit": "g"},
+    ]})
+    resp = ingredients_module.bulk_create_ingredients(event_copy)
+    body = json.loads(resp["body"])
+
+    assert resp["statusCode"] == 207
+    assert (body["created"], body["failed"]) == (2, 1)
+    assert [r["status"] for r in body["results"]] == [201, 400, 201]
+    assert body["results"][1]["error"] == "name is required"
+    assert len(cursor.executed) == 1 and conn.committed
+    _, (sub, ids, names, calories, units) = cursor.executed[0]
+    assert ids == [body["results"][0]["id"], body["results"][2]["id"]]
+    assert (names, calories, units) == (["Rice", "Oats"], [1.3, 3.9], ["g", "g"])
+
+
+def test_bulk_create_ingredients_without_valid_rows_skips_the_database(monkeypatch, event_copy):
+    monkeypatch.setattr(ingredients_module, "get_connection", lambda: None)
+
+    event_copy["body"] = json.dumps({"ingredients": [{"name": "Rice", "calories_per_unit": -1, "unit": "g"}]})
+    resp = ingredients_module.bulk_create_ingredients(event_copy)
+
+    assert resp["statusCode"] == 400
+    assert json.loads(resp["body"])["results"][0]["error"] == "calories_per_unit cannot be negative"
+
+
+def test_bulk_create_ingredients_limits(monkeypatch, event_copy):
+    monkeypatch.setattr(ingredients_module, "BULK_MAX_INGREDIENTS", 1)
+
+    event_copy["body"] = json.dumps({"ingredients": []})
+    assert ingredients_module.bulk_create_ingredients(event_copy)["statusCode"] == 400
+    event_copy["body"] = json.dumps({"ingredients": [{"name": "a", "calories_per_unit": 1, "unit": "g"}] * 2})
+    assert ingredients_module.bulk_create_ingredients(event_copy)["statusCode"] == 400
+
+
+def test_bulk_create_ingredients_user_not_found(monkeypatch, event_copy):
+    conn = FakeConnection(FakeCursor(fetchone_values=[]))
+    monkeypatch.setattr(ingredients_module, "get_connection", lambda: conn)
+
+    event_copy["body"] = json.dumps({"ingredients": [{"name": "Rice", "calories_per_unit": 1, "unit": "g"}]})
+    resp = ingredients_module.bulk_create_ingredients(event_copy)
+
+    assert resp["statusCode"] == 404
+    assert not conn.committed
+
+
 def test_list_ingredients_success(monkeypatch, event_copy):
     cursor = FakeCursor(fetchall_values=[[
-        ("ing-1", "Rice", 100, "g"),
-        ("ing-2", "Oil", 120, "ml")
+        (1, "ing-1", "Rice", 100, "g", 3),
+        (1, "ing-2", "Oil", 120, "ml", 3)
     ]])
     conn = FakeConnection(cursor)
 
     monkeypatch.setattr(ingredients_module, "get_connection", lambda: conn)
-    monkeypatch.setattr(ingredients_module, "get_internal_user_id", lambda *_: 1)
 
     resp = ingredients_module.list_ingredients(event_copy)
     body = json.loads(resp["body"])
     assert resp["statusCode"] == 200
     assert len(body["ingredients"]) == 2
+    # User resolution is folded into the list query: one round trip
+    assert len(cursor.executed) == 1
+
+
+def test_list_ingredients_projects_requested_fields(monkeypatch, event_copy):
+    cursor = FakeCursor(fetchall_values=[[(1, "ing-1", "Rice", 3)]])
+    conn = FakeConnection(cursor)
+    monkeypatch.setattr(ingredients_module, "get_connection", lambda: conn)
+
+    event_copy["queryStringParameters"] = {"fields": "name,id"}
+    resp = ingredients_module.list_ingredients(event_copy)
+
+    assert json.loads(resp["body"])["ingredients"] == [{"id": "ing-1", "name": "Rice"}]
+    query = cursor.executed[0][0]
+    assert "calories_per_unit" not in query and "unit" not in query
+
+
+def test_list_ingredients_rejects_unknown_fields(event_copy):
+    event_copy["queryStringParameters"] = {"fields": "id,user_id"}
+    resp = ingredients_module.list_ingredients(event_copy)
+    assert resp["statusCode"] == 400
+    assert json.loads(resp["body"])["error"] == "Unknown fields: user_id"
+
+
+def test_list_ingredients_empty_vs_user_not_found(monkeypatch, event_copy):
+    cursor = FakeCursor(fetchall_values=[[(1, None, None, None, None, 3)], []])
+    conn = FakeConnection(cursor)
+    monkeypatch.setattr(ingredients_module, "get_connection", lambda: conn)
+
+    resp = ingredients_module.list_ingredients(event_copy)
+    assert resp["statusCode"] == 200
+    assert json.loads(resp["body"])["ingredients"] == []
+
+    resp = ingredients_module.list_ingredients(event_copy)
+    assert resp["statusCode"] == 404
 
 
 def test_update_ingredient_success(monkeypatch, event_copy):
-    cursor = FakeCursor(fetchone_values=[("ing-1",)])
+    cursor = FakeCursor(fetchone_values=[("ing-1", False)])
     conn = FakeConnection(cursor)
 
     monkeypatch.setattr(ingredients_module, "get_connection", lambda: conn)
-    monkeypatch.setattr(ingredients_module, "get_internal_user_id", lambda *_: 1)
+    monkeypatch.setattr(ingredients_module, "begin_user_write", lambda *_: 1)
 
     event_copy["pathParameters"] = {"id": "123e4567-e89b-12d3-a456-426614174000"}
     event_copy["body"] = json.dumps({
@@ -102,12 +214,35 @@ def test_update_ingredient_success(monkeypatch, event_copy):
     assert resp["statusCode"] == 200
 
 
+def test_update_ingredient_recomputes_meal_totals_only_when_calories_change(monkeypatch, event_copy):
+    event_copy["pathParameters"] = {"id": "123e4567-e89b-12d3-a456-426614174000"}
+    event_copy["body"] = json.dumps({"name": "Rice", "calories_per_unit": 130, "unit": "g"})
+    monkeypatch.setattr(ingredients_module, "begin_user_write", lambda *_: 1)
+
+    cursor = FakeCursor(fetchone_values=[("ing-1", False)])
+    monkeypatch.setattr(ingredients_module, "get_connection", lambda: FakeConnection(cursor))
+    assert ingredients_module.update_ingredient(event_copy)["statusCode"] == 200
+    assert len(cursor.executed) == 1
+
+    cursor = FakeCursor(fetchone_values=[("ing-1", True), (2, [date(2026, 10, 16)])])
+    conn = FakeConnection(cursor)
+    monkeypatch.setattr(ingredients_module, "get_connection", lambda: conn)
+    assert ingredients_module.update_ingredient(event_copy)["statusCode"] == 200
+    assert len(cursor.executed) == 2
+    query, params = cursor.executed[1]
+    assert "UPDATE meals" in query and "UPDATE daily_summaries" in query
+    # Only dates whose cached summary was actually refreshed are reported
+    assert "FROM refreshed" in query
+    assert params[0] == "123e4567-e89b-12d3-a456-426614174000"
+    assert conn.committed
+
+
 def test_delete_ingredient_in_use(monkeypatch, event_copy):
     cursor = FakeCursor(fetchone_values=[(2,)])
     conn = FakeConnection(cursor)
 
     monkeypatch.setattr(ingredients_module, "get_connection", lambda: conn)
-    monkeypatch.setattr(ingredients_module, "get_internal_user_id", lambda *_: 1)
+    monkeypatch.setattr(ingredients_module, "begin_user_write", lambda *_: 1)
 
     event_copy["pathParameters"] = {"id": "123e4567-e89b-12d3-a456-426614174000"}
     resp = ingredients_module.delete_ingredient(event_copy)
@@ -119,7 +254,7 @@ def test_delete_ingredient_force(monkeypatch, event_copy):
     conn = FakeConnection(cursor)
 
     monkeypatch.setattr(ingredients_module, "get_connection", lambda: conn)
-    monkeypatch.setattr(ingredients_module, "get_internal_user_id", lambda *_: 1)
+    monkeypatch.setattr(ingredients_module, "begin_user_write", lambda *_: 1)
 
     event_copy["pathParameters"] = {"id": "123e4567-e89b-12d3-a456-426614174000"}
     event_copy["queryStringParameters"] = {"force": "true"}
@@ -0,0 +1,94 @@
+import base64
+import json
+import threading
+import urllib.request
+
+import pytest
+
+from backend.lambdas.api import handler as api_handler
+from backend.shared import logging as logging_module
+from backend.local_server import LocalServer, stub_claims
+from backend.shared.response import response
+
+
+def _jwt(claims):
+    payload = base64.urlsafe_b64encode(json.dumps(claims).encode()).decode().rstrip("=")
+    return f"header.{payload}.signature"
+
+
+def test_stub_claims():
+    assert stub_claims(f"Bearer {_jwt({'sub': 'abc', 'email': 'a@b.c'})}") == {"sub": "abc", "email": "a@b.c"}
+    assert stub_claims("Bearer load-user-1")["sub"] == "load-user-1"
+    assert stub_claims(None)["sub"] == "local-user"
+
+
+@pytest.fixture
+def server():
+    server = LocalServer(("127.0.0.1", 0), workers=2)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_requests_become_proxy_events(monkeypatch, server):
+    seen = []
+
+    def endpoint(event):
+        seen.append(event)
+        return response(200, {"ok": True})
+
+    monkeypatch.setitem(api_handler.router.routes, ("/meals/{id}", "GET"), endpoint)
+
+    request = urllib.request.Request(
+        f"{server}/meals/meal-1?fields=id", headers={"Authorization": "Bearer someone"}
+    )
+    with urllib.request.urlopen(request) as resp:
+        assert resp.status == 200
+        assert json.loads(resp.read()) == {"ok": True}
+
+    event = seen[0]
+    assert event["resource"] == "/meals/{id}"
+    assert event["pathParameters"] == {"id": "meal-1"}
+    assert event["queryStringParameters"] == {"fields": "id"}
+    assert event["requestContext"]["authorizer"]["claims"]["sub"] == "someone"
+
+
+def test_unknown_paths_get_the_router_404(server):
+    with pytest.raises(urllib.error.HTTPError) as excinfo:
+        urllib.request.urlopen(f"{server}/nope")
+    assert excinfo.value.code == 404
+
+
+def test_process_pool_workers_write_queued_logs(monkeypatch, capfd):
+    # The queue and its listener thread are created in the parent, before the fork
+    monkeypatch.setattr(logging_module, "LOG_MODE", "queue")
+    for name in ("_log_queue", "_queue_handler", "_queue_listener"):
+        monkeypatch.setattr(logging_module, name, None)
+    logger = logging_module.get_logger("backend.test_local_server.forked")
+
+    @logging_module.queued_logs
+    def endpoint(event):
+        logger.warning("Logged in a worker process")
+        return response(200, {"ok": True})
+
+    monkeypatch.setitem(api_handler.router.routes, ("/meals", "GET"), endpoint)
+    server = LocalServer(("127.0.0.1", 0), workers=1, pool="process")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/meals", timeout=10) as resp:
+            assert resp.status == 200
+    except Exception:
+        # A worker stuck in flush_logs() would otherwise hang the shutdown
+        for process in list(server.executor._processes.values()):
+            process.terminate()
+        raise
+    finally:
+        server.shutdown()
+        server.server_close()
+        logger.handlers.clear()
+        logging_module._queue_listener.stop()
+
+    assert "Logged in a worker process" in capfd.readouterr().out
@@ -106,3 +106,168 @@ def test_log_level_from_env(monkeypatch):
     # Reset for other tests
     monkeypatch.setenv("LOG_LEVEL", "INFO")
     importlib.reload(logging_module)
+
+
+def _format(created=None, **attributes):
+    record = logging.LogRecord(
+        name="test.json.fast",
+        level=logging.INFO,
+        pathname="test.py",
+        lineno=7,
+        msg="Hello",
+        args=(),
+        exc_info=None,
+    )
+    if created is not None:
+        record.created = created
+    for name, value in attributes.items():
+        setattr(record, name, value)
+    return json.loads(JSONFormatter().format(record))
+
+
+def test_json_formatter_millisecond_utc_timestamp():
+    log_record = _format(created=1704067200.1239)
+    assert log_record["timestamp"] == "2024-01-01T00:00:00.123Z"
+
+
+def test_json_formatter_extra_field_overrides_standard_field():
+    log_record = _format(extra_fields={"message": "overridden", "user_id": "u1"})
+    assert log_record["message"] == "overridden"
+    assert log_record["user_id"] == "u1"
+    assert log_record["line"] == 7
+
+
+def test_json_formatter_non_serializable_extra():
+    from decimal import Decimal
+
+    log_record = _format(extra_fields={"total": Decimal("1.5")})
+    assert log_record["total"] == "1.5"
+
+
+def test_logger_includes_exception_traceback():
+    from backend.shared.logging import StructuredLogger
+
+    logger = StructuredLogger("test.json.exception")
+    stream = StringIO()
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(JSONFormatter())
+    logger.addHandler(handler)
+
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.exception("Failed", extra={"user_id": "u1"})
+
+    log_record = json.loads(stream.getvalue())
+    assert log_record["level"] == "ERROR"
+    assert log_record["user_id"] == "u1"
+    assert "ValueError: boom" in log_record["exception"]
+
+
+def _capturing_logger(name):
+    from backend.shared.logging import StructuredLogger
+
+    logger = StructuredLogger(name)
+    stream = StringIO()
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(JSONFormatter())
+    logger.addHandler(handler)
+    return logger, stream
+
+
+def _lines(stream):
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_log_context_fields_added_to_every_line():
+    from backend.shared.logging import bind_log_context, log_context
+
+    logger, stream = _capturing_logger("test.json.context")
+
+    with log_context(request_id="req-1", lambda_name="meals"):
+        logger.info("First")
+        bind_log_context(user_id="u1")
+        logger.info("Second", extra={"lambda_name": "override"})
+    bind_log_context(user_id="u2")
+    logger.info("Outside")
+
+    first, second, outside = _lines(stream)
+    assert first["request_id"] == "req-1"
+    assert "user_id" not in first
+    assert second["user_id"] == "u1"
+    assert second["lambda_name"] == "override"
+    assert "request_id" not in outside
+    assert "user_id" not in outside
+
+
+def test_request_log_fields_from_event_copy(event_copy):
+    from types import SimpleNamespace
+    from backend.shared.logging import request_log_fields
+
+    fields = request_log_fields(event_copy, SimpleNamespace(aws_request_id="abc"), "meals")
+
+    assert fields["request_id"] == "abc"
+    assert fields["lambda_name"] == "meals"
+    assert fields["user_id"] == event_copy["requestContext"]["authorizer"]["claims"]["sub"]
+
+
+def test_sampling_keeps_one_in_n_info_and_all_warnings():
+    logger, stream = _capturing_logger("test.json.sampled")
+    logger.set_sample_rate(3)
+
+    for i in range(6):
+        logger.info("Fetched", extra={"i": i})
+    logger.warning("Slow")
+    logger.error("Failed")
+
+    lines = _lines(stream)
+    assert [line.get("i") for line in lines] == [0, 3, None, None]
+    assert lines[0]["sample_rate"] == 3
+    assert [line["level"] for line in lines[2:]] == ["WARNING", "ERROR"]
+
+
+def test_sample_rates_matched_by_logger_prefix(monkeypatch):
+    import backend.shared.logging as logging_module
+
+    monkeypatch.setattr(logging_module, "LOG_SAMPLE_RATES", logging_module._parse_sample_rates(
+        "backend.test_sampling=10, backend.test_sampling.exact=2, bad, other=x"
+    ))
+
+    assert logging_module.get_logger("backend.test_sampling.child").sample_every == 10
+    assert logging_module.get_logger("backend.test_sampling.exact").sample_every == 2
+    assert logging_module.get_logger("backend.test_unsampled").sample_every == 1
+
+
+def test_queue_mode_writes_from_listener_and_flushes(monkeypatch, capsys):
+    import backend.shared.logging as logging_module
+
+    monkeypatch.setattr(logging_module, "LOG_MODE", "queue")
+    for name in ("_log_queue", "_queue_handler", "_queue_listener"):
+        monkeypatch.setattr(logging_module, name, None)
+
+    logger = logging_module.get_logger("backend.test_logging.queued")
+    try:
+        assert isinstance(logger.handlers[0], logging_module.DeferredQueueHandler)
+
+        extra = {"user_id": "u1"}
+
+        @logging_module.queued_logs
+        def handler():
+            logger.info("Queued %s", "message", extra=extra)
+            extra["user_id"] = "changed"
+
+        handler()
+
+        log_record = json.loads(capsys.readouterr().out)
+        assert log_record["message"] == "Queued message"
+        assert log_record["user_id"] == "u1"
+    finally:
+        logger.handlers.clear()
+        logging_module._queue_listener.stop()
+
+
+def test_flush_logs_is_noop_in_sync_mode(monkeypatch):
+    import backend.shared.logging as logging_module
+
+    monkeypatch.setattr(logging_module, "_log_queue", None)
+    logging_module.flush_logs()
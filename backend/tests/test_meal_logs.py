@@ -33,11 +33,10 @@ def test_delete_meal_log_invalid_id(event_copy):
 
 
 def test_create_meal_log_success(monkeypatch, event_copy):
-    cursor = FakeCursor(fetchone_values=[("meal-1",), ("log-1",)])
+    cursor = FakeCursor(fetchone_values=[(1, "meal-1", "log-1")])
     conn = FakeConnection(cursor)
 
     monkeypatch.setattr(meal_logs_module, "get_connection", lambda: conn)
-    monkeypatch.setattr(meal_logs_module, "get_internal_user_id", lambda *_: 1)
 
     event_copy["body"] = json.dumps({
         "meal_id": "123e4567-e89b-12d3-a456-426614174000",
@@ -46,31 +45,72 @@ def test_create_meal_log_success(monkeypatch, event_copy):
     })
     resp = meal_logs_module.create_meal_log(event_copy)
     assert resp["statusCode"] == 201
+    assert json.loads(resp["body"])["id"] == "log-1"
     assert conn.committed is True
+    assert len(cursor.executed) == 1
+
+
+def test_create_meal_log_meal_or_user_not_found(monkeypatch, event_copy):
+    cursor = FakeCursor(fetchone_values=[(1, None, None), None])
+    conn = FakeConnection(cursor)
+    monkeypatch.setattr(meal_logs_module, "get_connection", lambda: conn)
+
+    event_copy["body"] = json.dumps({
+        "meal_id": "123e4567-e89b-12d3-a456-426614174000",
+        "date": "2024-01-02"
+    })
+    resp = meal_logs_module.create_meal_log(event_copy)
+    assert json.loads(resp["body"])["error"] == "Meal not found"
+    assert conn.committed is False
+
+    resp = meal_logs_module.create_meal_log(event_copy)
+    assert json.loads(resp["body"])["error"] == "User not found"
 
 
 def test_list_meal_logs_success(monkeypatch, event_copy):
     cursor = FakeCursor(fetchall_values=[[
-        ("log-1", "meal-1", date(2024, 1, 2), 1, "Lunch", 300)
+        (1, "log-1", "meal-1", date(2024, 1, 2), 1, "Lunch", 300, 3)
     ]])
     conn = FakeConnection(cursor)
 
     monkeypatch.setattr(meal_logs_module, "get_connection", lambda: conn)
-    monkeypatch.setattr(meal_logs_module, "get_internal_user_id", lambda *_: 1)
 
     resp = meal_logs_module.list_meal_logs(event_copy)
     body = json.loads(resp["body"])
     assert resp["statusCode"] == 200
     assert body["meal_logs"][0]["meal_name"] == "Lunch"
+    assert len(cursor.executed) == 1
+
+
+def test_list_meal_logs_skips_meal_join_without_meal_fields(monkeypatch, event_copy):
+    cursor = FakeCursor(fetchall_values=[[(1, "log-1", date(2024, 1, 2), 2, 3)]])
+    conn = FakeConnection(cursor)
+    monkeypatch.setattr(meal_logs_module, "get_connection", lambda: conn)
+
+    event_copy["queryStringParameters"] = {"fields": "id,date,quantity"}
+    resp = meal_logs_module.list_meal_logs(event_copy)
+
+    assert json.loads(resp["body"])["meal_logs"] == [{"id": "log-1", "date": "2024-01-02", "quantity": 2}]
+    assert "JOIN meals" not in cursor.executed[0][0]
 
 
 def test_delete_meal_log_success(monkeypatch, event_copy):
-    cursor = FakeCursor(rowcount=1)
+    cursor = FakeCursor(fetchone_values=[(1, 1)])
     conn = FakeConnection(cursor)
 
     monkeypatch.setattr(meal_logs_module, "get_connection", lambda: conn)
-    monkeypatch.setattr(meal_logs_module, "get_internal_user_id", lambda *_: 1)
 
     event_copy["pathParameters"] = {"id": "123e4567-e89b-12d3-a456-426614174000"}
     resp = meal_logs_module.delete_meal_log(event_copy)
     assert resp["statusCode"] == 204
+    assert len(cursor.executed) == 1
+
+
+def test_delete_meal_log_not_found(monkeypatch, event_copy):
+    cursor = FakeCursor(fetchone_values=[(1, 0)])
+    conn = FakeConnection(cursor)
+    monkeypatch.setattr(meal_logs_module, "get_connection", lambda: conn)
+
+    event_copy["pathParameters"] = {"id": "123e4567-e89b-12d3-a456-426614174000"}
+    resp = meal_logs_module.delete_meal_log(event_copy)
+    assert json.loads(resp["body"])["error"] == "Meal log not found"
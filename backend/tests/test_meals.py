@@ -1,5 +1,6 @@
 import json
 from datetime import datetime
+from decimal import Decimal
 
 from backend.lambdas.meals import meals as meals_module
 from backend.tests.conftest import FakeConnection, FakeCursor
@@ -23,10 +24,10 @@ def test_get_meal_invalid_id(event_copy):
     assert resp["statusCode"] == 400
 
 
-def test_load_ingredient_calories():
-    cursor = FakeCursor(fetchall_values=[[("id1", 10), ("id2", 20)]])
-    result = meals_module._load_ingredient_calories(cursor, 1, ["id1", "id2"])
-    assert result == {"id1": 10, "id2": 20}
+def test_load_ingredient_ids():
+    cursor = FakeCursor(fetchall_values=[[("id1",), ("id2",)]])
+    result = meals_module._load_ingredient_ids(cursor, 1, ["id1", "id2", "id3"], "create_meal.check_ingredients")
+    assert result == {"id1", "id2"}
 
 
 def test_get_user_id_or_404_not_found(monkeypatch):
@@ -35,16 +36,16 @@ def test_get_user_id_or_404_not_found(monkeypatch):
     user_id, error = meals_module._get_user_id_or_404(conn, "cognito")
     assert user_id is None
     assert error["statusCode"] == 404
-    assert conn.closed is True
+    assert conn.closed is False
 
 
 def test_create_meal_success(monkeypatch, event_copy):
-    cursor = FakeCursor(fetchone_values=[("meal-1",)])
+    cursor = FakeCursor(fetchone_values=[("meal-1", 200)])
     conn = FakeConnection(cursor)
 
     monkeypatch.setattr(meals_module, "get_connection", lambda: conn)
-    monkeypatch.setattr(meals_module, "get_internal_user_id", lambda *_: 1)
-    monkeypatch.setattr(meals_module, "_load_ingredient_calories", lambda *_: {"ing-1": 100})
+    monkeypatch.setattr(meals_module, "begin_user_write", lambda *_: 1)
+    monkeypatch.setattr(meals_module, "_load_ingredient_ids", lambda *_: {"ing-1"})
 
     event_copy["body"] = json.dumps({
         "name": "Lunch",
@@ -57,12 +58,141 @@ def test_create_meal_success(monkeypatch, event_copy):
     assert conn.committed is True
 
 
+def test_create_meal_writes_all_ingredients_in_one_statement(monkeypatch, event_copy):
+    cursor = FakeCursor(fetchone_values=[("meal-1", 820)])
+    conn = FakeConnection(cursor)
+
+    monkeypatch.setattr(meals_module, "get_connection", lambda: conn)
+    monkeypatch.setattr(meals_module, "begin_user_write", lambda *_: 1)
+    monkeypatch.setattr(meals_module, "_load_ingredient_ids", lambda *_: {f"ing-{i}" for i in range(40)})
+
+    event_copy["body"] = json.dumps({
+        "name": "Stew",
+        "ingredients": [{"ingredient_id": f"ing-{i}", "quantity": i + 1} for i in range(40)]
+    })
+    resp = meals_module.create_meal(event_copy)
+
+    assert resp["statusCode"] == 201
+    assert cursor.executemany_calls == []
+    assert len(cursor.executed) == 1
+    _, (user_id, name, _, _, ingredient_ids, quantities) = cursor.executed[0]
+    assert ingredient_ids == [f"ing-{i}" for i in range(40)]
+    assert quantities == list(range(1, 41))
+
+
+def test_create_meal_total_is_computed_in_sql(monkeypatch, event_copy):
+    # Same formula as update_ingredient's recompute, over the exact NUMERIC calories
+    cursor = FakeCursor(fetchall_values=[[("ing-1",)]], fetchone_values=[("meal-1", 125)])
+    conn = FakeConnection(cursor)
+
+    monkeypatch.setattr(meals_module, "get_connection", lambda: conn)
+    monkeypatch.setattr(meals_module, "begin_user_write", lambda *_: 1)
+
+    event_copy["body"] = json.dumps({
+        "name": "Sprinkles",
+        "ingredients": [{"ingredient_id": "ing-1", "quantity": 1000}]
+    })
+    resp = meals_module.create_meal(event_copy)
+
+    query, params = cursor.executed[-1]
+    assert "ROUND(SUM(r.quantity * i.calories_per_unit), 2)" in query
+    assert params[2:4] == (["ing-1"], [1000])
+    assert json.loads(resp["body"])["total_calories"] == 125
+
+
+def test_diff_ingredients():
+    current = {"a": Decimal("1.0"), "b": Decimal("2"), "c": Decimal("3")}
+    ingredients = [
+        {"ingredient_id": "a", "quantity": 1},
+        {"ingredient_id": "b", "quantity": 2.5},
+        {"ingredient_id": "d", "quantity": 4},
+    ]
+    assert meals_module._diff_ingredients(current, ingredients) == (["c"], [("b", 2.5)], [("d", 4)])
+    assert meals_module._diff_ingredients(current, [
+        {"ingredient_id": key, "quantity": value} for key, value in current.items()
+    ]) == ([], [], [])
+
+
+def test_diff_ingredients_compares_exact_quantities():
+    current = {"a": Decimal("1.004"), "b": Decimal("0.1")}
+    ingredients = [
+        {"ingredient_id": "a", "quantity": 1},
+        {"ingredient_id": "b", "quantity": 0.1},
+    ]
+    assert meals_module._diff_ingredients(current, ingredients) == ([], [("a", 1)], [])
+
+
+def test_update_meal_rewrites_a_3_decimal_quantity(monkeypatch, event_copy):
+    # Read under exact numerics, so the stored 1.004 is not rounded to 1.0
+    cursor = FakeCursor(fetchall_values=[[("meal-1", "ing-1", Decimal("1.004"))]], fetchone_values=[(100,)])
+    conn = FakeConnection(cursor)
+
+    monkeypatch.setattr(meals_module, "get_connection", lambda: conn)
+    monkeypatch.setattr(meals_module, "begin_user_write", lambda *_: 1)
+    monkeypatch.setattr(meals_module, "_load_ingredient_ids", lambda *_: {"ing-1"})
+
+    event_copy["pathParameters"] = {"id": "123e4567-e89b-12d3-a456-426614174000"}
+    event_copy["body"] = json.dumps({
+        "name": "Lunch",
+        "ingredients": [{"ingredient_id": "ing-1", "quantity": 1}]
+    })
+    resp = meals_module.update_meal(event_copy)
+
+    assert resp["statusCode"] == 200
+    assert conn.exact_numeric is True
+    query, params = cursor.executed[-1]
+    assert "UPDATE meal_ingredients" in query
+    assert params[6:8] == (["ing-1"], [1])
+
+
+def test_update_meal_locks_the_user_before_the_meal(monkeypatch, event_copy):
+    cursor = FakeCursor(fetchall_values=[[("meal-1", "ing-1", 2)]], fetchone_values=[("user-1",), (200,)])
+    conn = FakeConnection(cursor)
+
+    monkeypatch.setattr(meals_module, "get_connection", lambda: conn)
+    monkeypatch.setattr(meals_module, "_load_ingredient_ids", lambda *_: {"ing-1"})
+
+    event_copy["pathParameters"] = {"id": "123e4567-e89b-12d3-a456-426614174000"}
+    event_copy["body"] = json.dumps({
+        "name": "Lunch",
+        "ingredients": [{"ingredient_id": "ing-1", "quantity": 3}]
+    })
+    resp = meals_module.update_meal(event_copy)
+
+    assert resp["statusCode"] == 200
+    statements = [query for query, _ in cursor.executed]
+    assert statements[0].startswith("UPDATE users SET data_version = data_version + 1")
+    assert "FOR UPDATE OF m" in statements[1]
+
+
+def test_update_meal_name_only_leaves_ingredients_alone(monkeypatch, event_copy):
+    cursor = FakeCursor(fetchall_values=[[("meal-1", "ing-1", 2)]], fetchone_values=[(200,)])
+    conn = FakeConnection(cursor)
+
+    monkeypatch.setattr(meals_module, "get_connection", lambda: conn)
+    monkeypatch.setattr(meals_module, "begin_user_write", lambda *_: 1)
+    monkeypatch.setattr(meals_module, "_load_ingredient_ids", lambda *_: {"ing-1"})
+
+    event_copy["pathParameters"] = {"id": "123e4567-e89b-12d3-a456-426614174000"}
+    event_copy["body"] = json.dumps({
+        "name": "Renamed",
+        "ingredients": [{"ingredient_id": "ing-1", "quantity": 2}]
+    })
+    resp = meals_module.update_meal(event_copy)
+
+    assert resp["statusCode"] == 200
+    assert conn.committed is True
+    statements = [query for query, _ in cursor.executed]
+    assert "FOR UPDATE OF m" in statements[0]
+    assert len(statements) == 2 and "meal_ingredients" not in statements[1]
+
+
 def test_create_meal_failure_rolls_back(monkeypatch, event_copy):
     cursor = FakeCursor(raise_on_execute=RuntimeError("boom"))
     conn = FakeConnection(cursor)
 
     monkeypatch.setattr(meals_module, "get_connection", lambda: conn)
-    monkeypatch.setattr(meals_module, "get_internal_user_id", lambda *_: 1)
+    monkeypatch.setattr(meals_module, "begin_user_write", lambda *_: 1)
 
     event_copy["body"] = json.dumps({
         "name": "Lunch",
@@ -75,23 +205,48 @@ def test_create_meal_failure_rolls_back(monkeypatch, event_copy):
 
 def test_list_meals_success(monkeypatch, event_copy):
     cursor = FakeCursor(fetchall_values=[[
-        ("meal-1", "Lunch", 300, datetime(2024, 1, 1, 12, 0, 0))
+        (1, "meal-1", "Lunch", 300, datetime(2024, 1, 1, 12, 0, 0), 3)
     ]])
     conn = FakeConnection(cursor)
 
     monkeypatch.setattr(meals_module, "get_connection", lambda: conn)
-    monkeypatch.setattr(meals_module, "get_internal_user_id", lambda *_: 1)
 
     resp = meals_module.list_meals(event_copy)
     body = json.loads(resp["body"])
     assert resp["statusCode"] == 200
     assert body["meals"][0]["name"] == "Lunch"
+    # User resolution is folded into the list query: one round trip
+    assert len(cursor.executed) == 1
+
+
+def test_list_meals_empty_vs_user_not_found(monkeypatch, event_copy):
+    cursor = FakeCursor(fetchall_values=[[(1, None, None, None, None, 3)], []])
+    conn = FakeConnection(cursor)
+    monkeypatch.setattr(meals_module, "get_connection", lambda: conn)
+
+    resp = meals_module.list_meals(event_copy)
+    assert resp["statusCode"] == 200
+    assert json.loads(resp["body"])["meals"] == []
+
+    resp = meals_module.list_meals(event_copy)
+    assert resp["statusCode"] == 404
+
+
+def test_list_meals_projects_requested_fields(monkeypatch, event_copy):
+    cursor = FakeCursor(fetchall_values=[[(1, "meal-1", datetime(2024, 1, 1, 12, 0, 0), 3)]])
+    conn = FakeConnection(cursor)
+    monkeypatch.setattr(meals_module, "get_connection", lambda: conn)
+
+    event_copy["queryStringParameters"] = {"fields": "created_at"}
+    resp = meals_module.list_meals(event_copy)
+
+    assert json.loads(resp["body"])["meals"] == [{"created_at": "2024-01-01T12:00:00"}]
 
 
 def test_get_meal_success(monkeypatch, event_copy):
     cursor = FakeCursor(fetchall_values=[[
-        ("meal-1", "Lunch", 300, datetime(2024, 1, 1, 12, 0, 0), 2, "ing-1", "Rice", 150, "g"),
-        ("meal-1", "Lunch", 300, datetime(2024, 1, 1, 12, 0, 0), None, None, None, None, None)
+        ("meal-1", "Lunch", 300, datetime(2024, 1, 1, 12, 0, 0), 2, "ing-1", "Rice", 150, "g", 3),
+        ("meal-1", "Lunch", 300, datetime(2024, 1, 1, 12, 0, 0), None, None, None, None, None, 3)
     ]])
     conn = FakeConnection(cursor)
 
@@ -122,8 +277,8 @@ def test_update_meal_not_found(monkeypatch, event_copy):
     conn = FakeConnection(cursor)
 
     monkeypatch.setattr(meals_module, "get_connection", lambda: conn)
-    monkeypatch.setattr(meals_module, "get_internal_user_id", lambda *_: 1)
-    monkeypatch.setattr(meals_module, "_load_ingredient_calories", lambda *_: {"ing-1": 100})
+    monkeypatch.setattr(meals_module, "begin_user_write", lambda *_: 1)
+    monkeypatch.setattr(meals_module, "_load_ingredient_ids", lambda *_: {"ing-1"})
 
     event_copy["pathParameters"] = {"id": "123e4567-e89b-12d3-a456-426614174000"}
     event_copy["body"] = json.dumps({
@@ -139,7 +294,7 @@ def test_delete_meal_success(monkeypatch, event_copy):
     conn = FakeConnection(cursor)
 
     monkeypatch.setattr(meals_module, "get_connection", lambda: conn)
-    monkeypatch.setattr(meals_module, "get_internal_user_id", lambda *_: 1)
+    monkeypatch.setattr(meals_module, "begin_user_write", lambda *_: 1)
 
     event_copy["pathParameters"] = {"id": "123e4567-e89b-12d3-a456-426614174000"}
     resp = meals_module.delete_meal(event_copy)
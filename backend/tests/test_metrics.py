@@ -1,11 +1,22 @@
+import json
 import pytest
+import threading
 import time
 from unittest.mock import patch, MagicMock
 
 from backend.shared.metrics import (
+    buffered_metrics,
+    cold_start_metrics,
+    flush_metrics,
+    phase,
+    phase_timings,
+    profile_phases,
     put_metric,
+    put_metrics,
     put_count,
     put_latency,
+    record_init_timing,
+    timed_phase,
     timer,
 )
 
@@ -118,6 +129,15 @@ class TestMetrics:
             # Metric should still be published
             mock_put_latency.assert_called_once()
 
+    def test_timer_ignores_wall_clock_changes(self):
+        """Test that timer uses the monotonic clock, not time.time()."""
+        with patch("backend.shared.metrics.put_latency") as mock_put_latency, \
+                patch("time.time", side_effect=[0.0, 3600.0]):
+            with timer("ClockStep"):
+                pass
+
+            assert mock_put_latency.call_args[0][1] < 1000
+
     def test_put_metric_without_dimensions(self):
         """Test that put_metric works without dimensions."""
         with patch("boto3.client") as mock_boto_client:
@@ -156,3 +176,369 @@ class TestMetrics:
             metric_data = call_args.kwargs["MetricData"][0]
 
             assert metric_data["Unit"] == "None"
+
+    def test_put_metrics_batches_into_single_call(self):
+        """Test that put_metrics sends several data points in one call."""
+        with patch("boto3.client") as mock_boto_client:
+            mock_cw = MagicMock()
+            mock_boto_client.return_value = mock_cw
+
+            import backend.shared.metrics as metrics_module
+            metrics_module._cloudwatch_client = None
+
+            put_metrics([
+                ("DatabaseQueryTime", 12.5, "Milliseconds", {"Query": "list_meals.select"}),
+                ("DatabaseQueryCount", 1, "Count", None),
+            ])
+
+            mock_cw.put_metric_data.assert_called_once()
+            metric_data = mock_cw.put_metric_data.call_args.kwargs["MetricData"]
+            assert [m["MetricName"] for m in metric_data] == ["DatabaseQueryTime", "DatabaseQueryCount"]
+            assert metric_data[0]["Dimensions"] == [{"Name": "Query", "Value": "list_meals.select"}]
+            assert "Dimensions" not in metric_data[1]
+
+    def test_put_metrics_splits_at_api_limit(self):
+        """Test that put_metrics respects the per-call data point limit."""
+        with patch("boto3.client") as mock_boto_client:
+            mock_cw = MagicMock()
+            mock_boto_client.return_value = mock_cw
+
+            import backend.shared.metrics as metrics_module
+            metrics_module._cloudwatch_client = None
+
+            put_metrics([("Metric", i, "Count", None) for i in range(metrics_module.MAX_METRIC_DATA_PER_CALL + 1)])
+
+            assert mock_cw.put_metric_data.call_count == 2
+
+
+class TestBufferedMetrics:
+    """Test suite for per-invocation metric buffering."""
+
+    def _client(self, monkeypatch):
+        import backend.shared.metrics as metrics_module
+        mock_cw = MagicMock()
+        monkeypatch.setattr(metrics_module, "_cloudwatch_client", mock_cw)
+        return mock_cw
+
+    def test_buffered_metrics_aggregates_and_flushes_once(self, monkeypatch):
+        """Test that repeated data points collapse into Values/Counts in one call."""
+        mock_cw = self._client(monkeypatch)
+
+        @buffered_metrics
+        def handler():
+            put_count("RequestCount", dimensions={"Lambda": "meals"})
+            put_count("RequestCount", dimensions={"Lambda": "meals"})
+            put_metric("RequestLatency", 12.0, unit="Milliseconds")
+            put_metric("RequestLatency", 15.0, unit="Milliseconds")
+            put_metric("RequestLatency", 12.0, unit="Milliseconds")
+            mock_cw.put_metric_data.assert_not_called()
+
+        handler()
+
+        mock_cw.put_metric_data.assert_called_once()
+        metric_data = mock_cw.put_metric_data.call_args.kwargs["MetricData"]
+        by_name = {m["MetricName"]: m for m in metric_data}
+        assert by_name["RequestCount"]["Values"] == [1]
+        assert by_name["RequestCount"]["Counts"] == [2]
+        assert by_name["RequestCount"]["Dimensions"] == [{"Name": "Lambda", "Value": "meals"}]
+        assert by_name["RequestLatency"]["Values"] == [12.0, 15.0]
+        assert by_name["RequestLatency"]["Counts"] == [2, 1]
+
+    def test_buffered_metrics_flushes_when_handler_raises(self, monkeypatch):
+        """Test that the buffer is flushed even if the handler raises."""
+        mock_cw = self._client(monkeypatch)
+
+        @buffered_metrics
+        def handler():
+            put_count("ErrorCount")
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError):
+            handler()
+
+        mock_cw.put_metric_data.assert_called_once()
+
+    def test_nested_buffered_metrics_flush_with_outermost(self, monkeypatch):
+        """Test that nested decorated calls share one flush."""
+        mock_cw = self._client(monkeypatch)
+
+        @buffered_metrics
+        def inner():
+            put_count("Inner")
+
+        @buffered_metrics
+        def outer():
+            inner()
+            mock_cw.put_metric_data.assert_not_called()
+            put_count("Outer")
+
+        outer()
+
+        mock_cw.put_metric_data.assert_called_once()
+        assert len(mock_cw.put_metric_data.call_args.kwargs["MetricData"]) == 2
+
+    def test_flush_splits_values_per_datum(self, monkeypatch):
+        """Test that a series with many distinct values is split across datums."""
+        import backend.shared.metrics as metrics_module
+        mock_cw = self._client(monkeypatch)
+
+        @buffered_metrics
+        def handler():
+            for i in range(metrics_module.MAX_VALUES_PER_DATUM + 1):
+                put_metric("Latency", float(i), unit="Milliseconds")
+
+        handler()
+
+        metric_data = mock_cw.put_metric_data.call_args.kwargs["MetricData"]
+        assert [len(m["Values"]) for m in metric_data] == [metrics_module.MAX_VALUES_PER_DATUM, 1]
+
+    def test_flush_metrics_outside_buffer_is_noop(self, monkeypatch):
+        """Test that flushing with nothing buffered makes no API call."""
+        mock_cw = self._client(monkeypatch)
+        flush_metrics()
+        mock_cw.put_metric_data.assert_not_called()
+
+    def test_handler_sends_single_put_metric_data(self, monkeypatch, event_copy):
+        """Test that a full handler invocation makes one PutMetricData call."""
+        from backend.lambdas.meals import handler as meals_handler
+        mock_cw = self._client(monkeypatch)
+
+        event_copy["resource"] = "/nope"
+        meals_handler.handler(event_copy, None)
+
+        mock_cw.put_metric_data.assert_called_once()
+
+
+class TestPhases:
+    """Test suite for per-request phase profiling."""
+
+    def _fake_clock(self, monkeypatch, ticks_ms):
+        import backend.shared.metrics as metrics_module
+        ticks = iter(t * 1_000_000 for t in ticks_ms)
+        monkeypatch.setattr(metrics_module.time, "perf_counter_ns", lambda: next(ticks))
+
+    def test_phase_is_noop_outside_profile(self):
+        """Test that phase() records nothing when no request is being profiled."""
+        with phase("parse"):
+            pass
+        assert phase_timings() == {}
+
+    def test_nested_phases_are_exclusive(self, monkeypatch):
+        """Test that time in a nested phase is not counted in the outer one."""
+        self._fake_clock(monkeypatch, [0, 2, 7, 10])
+
+        with patch("backend.shared.metrics.put_latency"):
+            with profile_phases():
+                with phase("user"):
+                    with phase("db"):
+                        pass
+                timings = phase_timings()
+
+        assert timings == {"user": 5_000_000, "db": 5_000_000}
+        assert phase_timings() == {}
+
+    def test_repeated_phase_accumulates(self, monkeypatch):
+        """Test that entering the same phase twice sums the durations."""
+        self._fake_clock(monkeypatch, [0, 1, 5, 8])
+
+        @timed_phase("validate")
+        def check():
+            pass
+
+        with patch("backend.shared.metrics.put_latency"):
+            with profile_phases():
+                check()
+                check()
+                timings = phase_timings()
+
+        assert timings == {"validate": 4_000_000}
+
+    def test_profile_publishes_phase_latency(self, monkeypatch):
+        """Test that each phase is published with a Phase dimension on exit."""
+        self._fake_clock(monkeypatch, [0, 3])
+
+        with patch("backend.shared.metrics.put_latency") as mock_put_latency:
+            with profile_phases(dimensions={"Lambda": "meals"}):
+                with phase("serialize"):
+                    pass
+
+        mock_put_latency.assert_called_once_with(
+            "RequestPhaseLatency",
+            3.0,
+            dimensions={"Lambda": "meals", "Phase": "serialize"},
+        )
+
+
+class TestColdStartMetrics:
+    """Test suite for cold start and init duration metrics."""
+
+    def _published(self, monkeypatch):
+        import backend.shared.metrics as metrics_module
+        published = []
+        monkeypatch.setattr(metrics_module, "put_metrics", published.extend)
+        monkeypatch.setattr(metrics_module, "_cold_start", True)
+        monkeypatch.setattr(metrics_module, "_pending_init_timings", {})
+        return published
+
+    def test_first_invocation_reports_cold_start(self, monkeypatch):
+        """Test that only the first invocation is cold and carries init timings."""
+        published = self._published(monkeypatch)
+
+        @cold_start_metrics("meals")
+        def handler():
+            return "ok"
+
+        assert handler() == "ok"
+        cold = {name: value for name, value, _, _ in published}
+        published.clear()
+        handler()
+        warm = {name: value for name, value, _, _ in published}
+
+        assert cold["ColdStart"] == 1
+        assert cold["InitDuration"] >= 0
+        assert cold["InitToFirstRequest"] >= 0
+        assert warm == {"ColdStart": 0}
+
+    def test_init_timings_published_once_with_dimensions(self, monkeypatch):
+        """Test that recorded init timings go out with the next invocation only."""
+        published = self._published(monkeypatch)
+
+        @cold_start_metrics("users")
+        def handler():
+            pass
+
+        record_init_timing("DbConnectTime", 42.0)
+        record_init_timing("DbConnectTime", 99.0)
+        handler()
+        assert ("DbConnectTime", 42.0, "Milliseconds", {"Lambda": "users"}) in published
+
+        published.clear()
+        handler()
+        assert [name for name, _, _, _ in published] == ["ColdStart"]
+
+
+    def test_concurrent_invocations_publish_each_init_timing_once(self, monkeypatch):
+        """Test that invocations finishing together don't race over pending timings."""
+        published = self._published(monkeypatch)
+        for index in range(50):
+            record_init_timing(f"Timing{index}", float(index))
+        barrier = threading.Barrier(8)
+
+        @cold_start_metrics("api")
+        def handler():
+            barrier.wait()
+
+        threads = [threading.Thread(target=handler) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        timings = sorted(name for name, _, _, _ in published if name.startswith("Timing"))
+        assert timings == sorted(f"Timing{index}" for index in range(50))
+
+def _assert_valid_emf(document):
+    """Check a document against the CloudWatch Embedded Metric Format schema."""
+    metadata = document["_aws"]
+    assert isinstance(metadata["Timestamp"], int)
+    assert metadata["CloudWatchMetrics"]
+    for directive in metadata["CloudWatchMetrics"]:
+        assert directive["Namespace"] == "DietTracker"
+        assert all(isinstance(dimension_set, list) for dimension_set in directive["Dimensions"])
+        for dimension_set in directive["Dimensions"]:
+            assert len(dimension_set) <= 30
+            for key in dimension_set:
+                assert isinstance(document[key], str)
+        assert 0 < len(directive["Metrics"]) <= 100
+        for metric in directive["Metrics"]:
+            assert set(metric) == {"Name", "Unit"}
+            value = document[metric["Name"]]
+            values = value if isinstance(value, list) else [value]
+            assert 0 < len(values) <= 100
+            assert all(isinstance(v, (int, float)) for v in values)
+
+
+class TestEmbeddedMetricFormat:
+    """Test suite for the EMF (stdout) metrics backend."""
+
+    def _emf_lines(self, capsys):
+        return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+    def test_invocation_emits_single_document(self, monkeypatch, capsys):
+        """Test that one invocation's metrics are batched into one EMF document."""
+        import backend.shared.metrics as metrics_module
+        monkeypatch.setattr(metrics_module, "METRICS_BACKEND", "emf")
+        mock_cw = MagicMock()
+        monkeypatch.setattr(metrics_module, "_cloudwatch_client", mock_cw)
+
+        @buffered_metrics
+        def handler():
+            dimensions = {"Lambda": "meals", "Endpoint": "/meals"}
+            put_count("RequestCount", dimensions=dimensions)
+            put_latency("RequestLatency", 12.5, dimensions=dimensions)
+            put_metric("ErrorCount", 1, unit="Count", dimensions={"Lambda": "meals"})
+            with timer("Parse"):
+                pass
+
+        handler()
+
+        documents = self._emf_lines(capsys)
+        assert len(documents) == 1
+        document = documents[0]
+        _assert_valid_emf(document)
+        assert document["Lambda"] == "meals"
+        assert document["Endpoint"] == "/meals"
+        assert document["RequestCount"] == 1
+        assert document["RequestLatency"] == 12.5
+        dimension_sets = sorted(
+            tuple(d["Dimensions"][0]) for d in document["_aws"]["CloudWatchMetrics"]
+        )
+        assert dimension_sets == [(), ("Lambda",), ("Lambda", "Endpoint")]
+        mock_cw.put_metric_data.assert_not_called()
+
+    def test_repeated_values_become_value_arrays(self, monkeypatch, capsys):
+        """Test that repeated data points are emitted as a value array."""
+        import backend.shared.metrics as metrics_module
+        monkeypatch.setattr(metrics_module, "METRICS_BACKEND", "emf")
+
+        @buffered_metrics
+        def handler():
+            put_latency("DatabaseQueryTime", 3.0)
+            put_latency("DatabaseQueryTime", 3.0)
+            put_latency("DatabaseQueryTime", 7.0)
+
+        handler()
+
+        document = self._emf_lines(capsys)[0]
+        _assert_valid_emf(document)
+        assert sorted(document["DatabaseQueryTime"]) == [3.0, 3.0, 7.0]
+
+    def test_conflicting_dimension_values_split_documents(self, monkeypatch, capsys):
+        """Test that differing values for one dimension go to separate documents."""
+        import backend.shared.metrics as metrics_module
+        monkeypatch.setattr(metrics_module, "METRICS_BACKEND", "emf")
+
+        @buffered_metrics
+        def handler():
+            put_latency("DatabaseQueryTime", 3.0, dimensions={"Query": "list_meals.select"})
+            put_latency("DatabaseQueryTime", 5.0, dimensions={"Query": "get_meal.select"})
+
+        handler()
+
+        documents = self._emf_lines(capsys)
+        assert len(documents) == 2
+        for document in documents:
+            _assert_valid_emf(document)
+        assert {d["Query"] for d in documents} == {"list_meals.select", "get_meal.select"}
+
+    def test_unbuffered_put_metric_writes_document(self, monkeypatch, capsys):
+        """Test that put_metric outside a handler writes one EMF line immediately."""
+        import backend.shared.metrics as metrics_module
+        monkeypatch.setattr(metrics_module, "METRICS_BACKEND", "emf")
+
+        put_metric("Standalone", 4, unit="Count", dimensions={"Source": "test"})
+
+        documents = self._emf_lines(capsys)
+        assert len(documents) == 1
+        _assert_valid_emf(documents[0])
+        assert documents[0]["Standalone"] == 4
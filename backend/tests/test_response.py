@@ -23,3 +23,94 @@ def test_response_default_origin(monkeypatch):
 
     resp = response_module.response(200, {"ok": True})
     assert resp["headers"]["Access-Control-Allow-Origin"] == "http://localhost:5173"
+
+
+def test_response_has_no_server_timing_by_default():
+    from backend.shared.response import response
+
+    resp = response(200, {"ok": True})
+    assert "Server-Timing" not in resp["headers"]
+
+
+def test_response_reports_server_timing_while_profiling(monkeypatch):
+    from backend.shared import metrics
+    from backend.shared.response import response
+
+    monkeypatch.setattr(metrics, "put_latency", lambda *args, **kwargs: None)
+    with metrics.profile_phases():
+        with metrics.phase("db"):
+            pass
+        resp = response(200, {"ok": True})
+
+    entries = [entry.split(";dur=") for entry in resp["headers"]["Server-Timing"].split(", ")]
+    assert [name for name, _ in entries] == ["db", "serialize"]
+    assert all(float(duration) >= 0 for _, duration in entries)
+    assert resp["headers"]["Timing-Allow-Origin"] == resp["headers"]["Access-Control-Allow-Origin"]
+
+
+def test_response_rounds_decimals_with_either_encoder():
+    import json
+    from decimal import Decimal
+    from backend.shared import response as response_module
+
+    body = {"total_calories": Decimal("1234.5678"), "items": [{"quantity": 1.5, "name": "Crème"}]}
+    # orjson rejects integers wider than 64 bits, so this one takes the stdlib path
+    wide = {**body, "id": 2 ** 70}
+
+    fast = response_module.response(200, body)["body"]
+    stdlib = response_module.response(200, wide)["body"]
+
+    assert json.loads(fast) == {"total_calories": 1234.57, "items": [{"quantity": 1.5, "name": "Crème"}]}
+    assert stdlib == fast[:-1] + ',"id":' + str(2 ** 70) + "}"
+
+
+def _gzip_event(accept_encoding="gzip, deflate"):
+    return {"headers": {"accept-encoding": accept_encoding}}
+
+
+def _large_body():
+    return {"items": [{"id": i, "name": f"Ingredient {i}"} for i in range(200)]}
+
+
+def test_response_gzips_large_bodies_when_accepted():
+    import base64
+    import gzip
+    import json
+    from backend.shared.response import negotiate_encoding, response
+
+    with negotiate_encoding(_gzip_event()):
+        resp = response(200, _large_body(), etag='"3-abc"')
+
+    assert resp["isBase64Encoded"] is True
+    assert resp["headers"]["Content-Encoding"] == "gzip"
+    assert resp["headers"]["Vary"] == "Accept-Encoding"
+    assert resp["headers"]["ETag"] == '"3-abc-gzip"'
+    assert json.loads(gzip.decompress(base64.b64decode(resp["body"]))) == _large_body()
+
+
+def test_response_leaves_small_or_unnegotiated_bodies_alone():
+    from backend.shared.response import negotiate_encoding, response
+
+    with negotiate_encoding(_gzip_event()):
+        small = response(200, {"ok": True})
+    with negotiate_encoding(_gzip_event("identity")):
+        refused = response(200, _large_body())
+    outside = response(200, _large_body())
+
+    for resp in (small, refused, outside):
+        assert "isBase64Encoded" not in resp
+        assert "Content-Encoding" not in resp["headers"]
+    assert refused["headers"]["Vary"] == "Accept-Encoding"
+
+
+def test_accepted_codings_honours_q_values(monkeypatch):
+    from backend.shared import response as response_module
+
+    monkeypatch.setattr(response_module, "brotli", None)
+    assert response_module._accepted_codings("gzip;q=0, *") == ()
+    assert response_module._accepted_codings("*") == ("gzip",)
+    assert response_module._accepted_codings("br") == ()
+
+    monkeypatch.setattr(response_module, "brotli", object())
+    assert response_module._accepted_codings("gzip, br") == ("br", "gzip")
+    assert response_module._accepted_codings("gzip;q=1.0, br;q=0.5") == ("gzip", "br")
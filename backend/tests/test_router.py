@@ -0,0 +1,62 @@
+import pytest
+
+from backend.shared import router as router_module
+from backend.shared.router import Router
+
+
+@pytest.fixture
+def error_counts(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(
+        router_module, "put_metric",
+        lambda name, value, unit=None, dimensions=None: recorded.append((name, dimensions))
+    )
+    return recorded
+
+
+def test_dispatches_on_resource_and_method(event_copy, error_counts):
+    router = Router("test")
+    router.add("GET", "/meals", lambda event: {"statusCode": 200, "route": "list"})
+    router.add("POST", "/meals", lambda event: {"statusCode": 201, "route": "create"})
+
+    assert router.handler(event_copy, None)["route"] == "list"
+    event_copy["httpMethod"] = "POST"
+    assert router.handler(event_copy, None)["route"] == "create"
+    assert error_counts == []
+
+
+@pytest.mark.parametrize("resource,method,status", [
+    ("/nope", "GET", 404),
+    ("/meals", "PATCH", 404),
+    (None, "GET", 400),
+])
+def test_unroutable_requests_count_an_error(event_copy, error_counts, resource, method, status):
+    router = Router("test")
+    router.add("GET", "/meals", lambda event: {"statusCode": 200})
+
+    event_copy["resource"] = resource
+    event_copy["httpMethod"] = method
+    assert router.handler(event_copy, None)["statusCode"] == status
+    assert error_counts == [("ErrorCount", {"Lambda": "test"})]
+
+
+def test_endpoint_exceptions_are_counted_and_reraised(event_copy, error_counts):
+    def broken(event):
+        raise RuntimeError("boom")
+
+    router = Router("test")
+    router.add("GET", "/meals", broken)
+
+    with pytest.raises(RuntimeError):
+        router.handler(event_copy, None)
+    assert error_counts == [("ErrorCount", {"Lambda": "test"})]
+
+
+def test_match_prefers_literal_segments():
+    router = Router("test")
+    router.add("PUT", "/ingredients/{id}", lambda event: None)
+    router.add("POST", "/ingredients/bulk", lambda event: None)
+
+    assert router.match("/ingredients/bulk") == ("/ingredients/bulk", None)
+    assert router.match("/ingredients/abc") == ("/ingredients/{id}", {"id": "abc"})
+    assert router.match("/nope") == ("/nope", None)
@@ -1,3 +1,4 @@
+import json
 from datetime import date
 
 from backend.lambdas.summary import summary as summary_module
@@ -29,27 +30,49 @@ def test_get_range_summary_invalid_date(event_copy):
 
 
 def test_get_daily_summary_success(monkeypatch, event_copy):
-    cursor = FakeCursor(fetchone_values=[(450,)])
+    cursor = FakeCursor(fetchone_values=[(1, None, 450, 3)])
     conn = FakeConnection(cursor)
 
     monkeypatch.setattr(summary_module, "get_connection", lambda: conn)
-    monkeypatch.setattr(summary_module, "get_internal_user_id", lambda *_: 1)
 
     event_copy["queryStringParameters"] = {"date": "2024-01-02"}
     resp = summary_module.get_daily_summary(event_copy)
     assert resp["statusCode"] == 200
+    assert json.loads(resp["body"])["total_calories"] == 450
+    # Cache lookup, live fallback and user resolution share one statement
+    assert len(cursor.executed) == 1
+
+
+def test_get_daily_summary_prefers_cached_total(monkeypatch, event_copy):
+    cursor = FakeCursor(fetchone_values=[(1, 1200, None, 3)])
+    conn = FakeConnection(cursor)
+    monkeypatch.setattr(summary_module, "get_connection", lambda: conn)
+
+    event_copy["queryStringParameters"] = {"date": "2024-01-02"}
+    resp = summary_module.get_daily_summary(event_copy)
+    assert json.loads(resp["body"])["total_calories"] == 1200
+
+
+def test_get_daily_summary_user_not_found(monkeypatch, event_copy):
+    conn = FakeConnection(FakeCursor())
+    monkeypatch.setattr(summary_module, "get_connection", lambda: conn)
+
+    event_copy["queryStringParameters"] = {"date": "2024-01-02"}
+    resp = summary_module.get_daily_summary(event_copy)
+    assert resp["statusCode"] == 404
 
 
 def test_get_range_summary_success(monkeypatch, event_copy):
     cursor = FakeCursor(fetchall_values=[[
-        (date(2024, 1, 2), 450),
-        (date(2024, 1, 3), 300)
+        (1, date(2024, 1, 2), 450, 3),
+        (1, date(2024, 1, 3), 300, 3)
     ]])
     conn = FakeConnection(cursor)
 
     monkeypatch.setattr(summary_module, "get_connection", lambda: conn)
-    monkeypatch.setattr(summary_module, "get_internal_user_id", lambda *_: 1)
 
     event_copy["queryStringParameters"] = {"from": "2024-01-02", "to": "2024-01-03"}
     resp = summary_module.get_range_summary(event_copy)
     assert resp["statusCode"] == 200
+    assert len(json.loads(resp["body"])["days"]) == 2
+    assert len(cursor.executed) == 1
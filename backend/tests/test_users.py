@@ -1,6 +1,7 @@
 from datetime import datetime
 
 from backend.lambdas.users import users as users_module
+from backend.shared import db as db_module
 from backend.tests.conftest import FakeConnection, FakeCursor
 
 
@@ -13,7 +14,18 @@ def test_bootstrap_user_returns_ok(event_copy, monkeypatch):
 
     assert resp["statusCode"] == 200
     assert conn.committed is True
-    assert conn.closed is True
+    assert conn.closed is False
+
+
+def test_bootstrap_user_caches_new_user_id(event_copy, monkeypatch):
+    cursor = FakeCursor(fetchone_values=[("user-uuid",)])
+    conn = FakeConnection(cursor)
+    monkeypatch.setattr(users_module, "get_connection", lambda: conn)
+    db_module.cache_user_id("test-cognito-user-id", None)
+
+    users_module.bootstrap_user(event_copy)
+
+    assert db_module.get_internal_user_id(FakeConnection(FakeCursor()), "test-cognito-user-id") == "user-uuid"
 
 
 def test_get_current_user_not_found(event_copy, monkeypatch):
@@ -24,7 +36,7 @@ def test_get_current_user_not_found(event_copy, monkeypatch):
     resp = users_module.get_current_user(event_copy)
 
     assert resp["statusCode"] == 404
-    assert conn.closed is True
+    assert conn.closed is False
 
 
 def test_get_current_user_success(event_copy, monkeypatch):
@@ -37,4 +49,4 @@ def test_get_current_user_success(event_copy, monkeypatch):
 
     assert resp["statusCode"] == 200
     assert resp["body"] is not None
-    assert conn.closed is True
+    assert conn.closed is False
@@ -1,5 +1,7 @@
+import base64
+
 import pytest
-from backend.shared.validation import is_valid_date, is_valid_uuid, validate_calories
+from backend.shared.validation import get_body, get_header, is_valid_date, is_valid_uuid, parse_fields, validate_calories
 
 
 class TestIsValidUuid:
@@ -64,3 +66,44 @@ class TestIsValidDate:
     ])
     def test_is_valid_date(self, value, expected):
         assert is_valid_date(value) == expected
+
+
+class TestGetHeader:
+    def test_case_insensitive(self):
+        event = {"headers": {"if-none-match": '"1-abc"'}}
+        assert get_header(event, "If-None-Match") == '"1-abc"'
+
+    def test_missing_headers(self):
+        assert get_header({"headers": None}, "If-None-Match") is None
+        assert get_header({}, "If-None-Match") is None
+
+
+class TestGetBody:
+    def test_plain_body(self):
+        assert get_body({"body": '{"a": 1}', "isBase64Encoded": False}) == '{"a": 1}'
+        assert get_body({"body": None}) is None
+
+    def test_decodes_base64_body(self):
+        encoded = base64.b64encode('{"name": "Crème"}'.encode()).decode()
+        assert get_body({"body": encoded, "isBase64Encoded": True}) == '{"name": "Crème"}'
+
+    def test_invalid_base64_body(self):
+        with pytest.raises(ValueError):
+            get_body({"body": "not base64!", "isBase64Encoded": True})
+
+
+class TestParseFields:
+    ALLOWED = {"id": "id", "name": "name", "unit": "unit"}
+
+    def test_defaults_to_all_fields(self):
+        assert parse_fields({}, self.ALLOWED) == (("id", "name", "unit"), None)
+
+    def test_returns_allowlist_order(self):
+        assert parse_fields({"fields": "name, id"}, self.ALLOWED) == (("id", "name"), None)
+
+    @pytest.mark.parametrize("value,error", [
+        ("", "fields must name at least one field"),
+        ("id,password", "Unknown fields: password"),
+    ])
+    def test_rejects_invalid_values(self, value, error):
+        assert parse_fields({"fields": value}, self.ALLOWED) == (None, error)
@@ -0,0 +1,58 @@
+-- Per-user data version for conditional GETs (ETag / If-None-Match).
+--
+-- users.data_version is bumped once per statement that touches any of the
+-- user's ingredients, meals, meal ingredients, meal logs or daily summaries,
+-- so an unchanged version means every GET response for that user is
+-- unchanged too.
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS data_version BIGINT NOT NULL DEFAULT 0;
+
+CREATE OR REPLACE FUNCTION bump_data_version_from_rows() RETURNS trigger AS $$
+BEGIN
+  UPDATE users
+  SET data_version = data_version + 1
+  WHERE id IN (SELECT user_id FROM changed_rows);
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- meal_ingredients has no user_id; resolve it through the parent meal
+CREATE OR REPLACE FUNCTION bump_data_version_from_meal_rows() RETURNS trigger AS $$
+BEGIN
+  UPDATE users
+  SET data_version = data_version + 1
+  WHERE id IN (
+    SELECT m.user_id FROM meals m WHERE m.id IN (SELECT meal_id FROM changed_rows)
+  );
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Statement-level triggers with transition tables: a bulk write bumps each
+-- affected user once instead of once per row.
+DO $$
+DECLARE
+  tbl TEXT;
+  fn TEXT;
+BEGIN
+  FOREACH tbl IN ARRAY ARRAY['ingredients', 'meals', 'meal_logs', 'daily_summaries', 'meal_ingredients'] LOOP
+    fn := CASE WHEN tbl = 'meal_ingredients'
+               THEN 'bump_data_version_from_meal_rows'
+               ELSE 'bump_data_version_from_rows' END;
+
+    EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', tbl || '_version_ins', tbl);
+    EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', tbl || '_version_upd', tbl);
+    EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', tbl || '_version_del', tbl);
+
+    EXECUTE format(
+      'CREATE TRIGGER %I AFTER INSERT ON %I REFERENCING NEW TABLE AS changed_rows '
+      'FOR EACH STATEMENT EXECUTE FUNCTION %I()', tbl || '_version_ins', tbl, fn);
+    EXECUTE format(
+      'CREATE TRIGGER %I AFTER UPDATE ON %I REFERENCING NEW TABLE AS changed_rows '
+      'FOR EACH STATEMENT EXECUTE FUNCTION %I()', tbl || '_version_upd', tbl, fn);
+    EXECUTE format(
+      'CREATE TRIGGER %I AFTER DELETE ON %I REFERENCING OLD TABLE AS changed_rows '
+      'FOR EACH STATEMENT EXECUTE FUNCTION %I()', tbl || '_version_del', tbl, fn);
+  END LOOP;
+END;
+$$;
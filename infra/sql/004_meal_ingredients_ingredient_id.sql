@@ -0,0 +1,6 @@
+-- Meals that use an ingredient, for recomputing their total_calories when
+-- the ingredient's calories_per_unit changes (update_ingredient). Also serves
+-- the in-use check in delete_ingredient and the ON DELETE CASCADE from
+-- ingredients.
+
+CREATE INDEX IF NOT EXISTS meal_ingredients_ingredient_id_idx ON meal_ingredients(ingredient_id);
@@ -0,0 +1,22 @@
+-- users.data_version is now bumped by the application, once per write request,
+-- as its first statement (begin_user_write() in backend/shared/db.py). The
+-- row-table triggers from 003_data_version.sql took the users row lock after
+-- the child rows they fired on, so a request that locked a meal and then
+-- wrote it could deadlock with one that wrote an ingredient and then
+-- recomputed that meal. Taking the users lock first everywhere gives every
+-- write the same lock order: users, then the user's other rows.
+
+DO $$
+DECLARE
+  tbl TEXT;
+BEGIN
+  FOREACH tbl IN ARRAY ARRAY['ingredients', 'meals', 'meal_logs', 'daily_summaries', 'meal_ingredients'] LOOP
+    EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', tbl || '_version_ins', tbl);
+    EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', tbl || '_version_upd', tbl);
+    EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', tbl || '_version_del', tbl);
+  END LOOP;
+END;
+$$;
+
+DROP FUNCTION IF EXISTS bump_data_version_from_rows();
+DROP FUNCTION IF EXISTS bump_data_version_from_meal_rows();
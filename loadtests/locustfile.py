@@ -17,6 +17,8 @@ Environment variables:
     LOCUST_HOST          API base URL (alternative to --host)
     AUTH_TOKEN           Valid Cognito id_token for authenticated requests
     AUTH_BYPASS_TOKEN    If the staging API accepts bypass tokens, set this
+    STUB_AUTH            Against backend.local_server: give each simulated user
+                         its own identity through the stub authorizer
 """
 
 import json
@@ -72,6 +74,9 @@ class DietTrackerUser(HttpUser):
         if token:
             token = token.strip()
             self.client.headers.update({"Authorization": f"Bearer {token}"})
+        elif os.environ.get("STUB_AUTH"):
+            # The local server's stub authorizer uses a plain token as the Cognito sub
+            self.client.headers.update({"Authorization": f"Bearer {random_name('load-user', 10)}"})
 
         # Track created resource IDs for cleanup
         self._ingredient_ids = []